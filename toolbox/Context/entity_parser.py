@@ -2,16 +2,17 @@ import json
 import uuid
 from datetime import datetime
 from enum import Enum
-from typing import Type, Union
+from typing import TYPE_CHECKING, Type, Union
 
 import numpy as np
-from ngsildclient import Entity
-from ngsildclient.utils.uuid import uuidshortener
 
 from toolbox.DataModels import BaseModel
 from toolbox.DataModels.DataModelsCatalog import data_models_catalog
 from toolbox.Structures import BoundingBox, Image, Keypoints, SegmentationMask
 
+if TYPE_CHECKING:
+    from ngsildclient import Entity
+
 
 def create_random_id(
     entity_type: str = "",
@@ -33,6 +34,8 @@ def create_random_id(
     Returns:
         str: A random id.
     """
+    from ngsildclient.utils.uuid import uuidshortener
+
     _uuid = uuid.uuid4() if uuid4 else uuid.uuid1()
     _uuid = uuidshortener(_uuid) if shortener else str(_uuid)
     return (
@@ -42,7 +45,7 @@ def create_random_id(
     )
 
 
-def set_entity_field(entity: Entity, field: any, name: str):
+def set_entity_field(entity: "Entity", field: any, name: str):
     """Parse and add a new field to an NGSI-LD entity.
 
     Args:
@@ -72,6 +75,9 @@ def data_model_to_json(data_model: Type[BaseModel]) -> dict:
     Returns:
         dict: The parsed data model as a NGSI-LD entity JSON.
     """
+    # ngsildclient is slow to import, it is only loaded when used
+    from ngsildclient import Entity
+
     if not data_model.id:
         data_model.id = create_random_id(entity_type=data_model.type)
     entity = Entity(data_model.type, data_model.id)
@@ -0,0 +1,409 @@
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple, \
+    Union
+
+import numpy as np
+
+from toolbox.utils.utils import get_logger
+
+logger = get_logger("toolbox.Autotuner")
+
+# Tunable models. For each model name:
+#   threads: parameter with the number of intra-op threads.
+#   batch_size: parameter with the maximum batch size.
+#   backends: values of the ``backend`` parameter to the name of the
+#       inference backend and the weights format that it runs.
+#   threaded: values of ``backend`` that use the threads parameter. The
+#       threads of the other backends (PyTorch, OpenCV) are global to the
+#       process and set by the ``runtime`` config.
+#   weights: parameters with the paths of the weights files.
+#   image_size: default (width, height) of the synthetic images.
+TUNABLE_MODELS = {
+    "age_gender": {
+        "threads": "num_threads",
+        "batch_size": "max_batch_size",
+        "backends": {"opencv": ("opencv", None),
+                     "onnxruntime": ("onnxruntime", None)},
+        "threaded": ("onnxruntime",),
+        "weights": ("age_model_path", "gender_model_path"),
+        "image_size": (224, 224)
+    },
+    "emotions_hse": {
+        "threads": "num_threads",
+        "batch_size": "max_batch_size",
+        "backends": {"keras": ("tensorflow", "keras"),
+                     "tflite": ("tensorflow", "tflite"),
+                     "onnxruntime": ("onnxruntime", None),
+                     "opencv": ("opencv", None)},
+        "threaded": ("keras", "tflite", "onnxruntime"),
+        "weights": ("model_path",),
+        "image_size": (224, 224)
+    },
+    "face_detector_ultraface": {
+        "threads": "intra_op_num_threads",
+        "batch_size": "batch_size",
+        "backends": {"onnxruntime": ("onnxruntime", None),
+                     "opencv": ("opencv", None)},
+        "threaded": ("onnxruntime",),
+        "weights": ("model_path",),
+        "image_size": (640, 480)
+    },
+    "face_detector_retinaface": {
+        "threads": "num_threads",
+        "batch_size": "batch_size",
+        "backends": {"torch": ("torch", None),
+                     "onnx": ("onnxruntime", None),
+                     "opencv": ("opencv", None)},
+        "threaded": ("onnx",),
+        "weights": ("weights_path",),
+        "image_size": (640, 480)
+    }
+}
+
+
+class Autotuner:
+    """Find the backend, threads and batch size of a model that predict
+    the fastest on this host, and cache them in a file so the next starts
+    reuse them.
+
+    The candidates are benchmarked on synthetic images of the configured
+    size, in two stages: the backends and threads with the largest batch
+    size, then the batch sizes with the best backend and threads. Only the
+    backends that can load the configured weights files are tried, e.g.
+    ``onnxruntime`` and ``opencv`` for .onnx files.
+
+    The cache key depends on the model name, the other parameters of the
+    model, the image size, the objective and the CPU of the host, so a
+    change of any of them runs the benchmark again.
+
+    Example:
+
+    .. code-block:: python
+
+        tuner = Autotuner("face_detector_retinaface", params,
+                          cache_path="data/autotune.json")
+        model = model_catalog["face_detector_retinaface"](
+            **tuner.get_params())
+    """
+
+    def __init__(self, model_name: str, model_params: dict,
+                 cache_path: Optional[Union[str, Path]] = None,
+                 image_size: Optional[Tuple[int, int]] = None,
+                 objective: Literal["throughput", "latency"] = "throughput",
+                 backends: Optional[Sequence[str]] = None,
+                 threads: Optional[Sequence[Optional[int]]] = None,
+                 batch_sizes: Sequence[int] = (1, 4, 8, 16),
+                 num_images: int = 16, num_runs: int = 3):
+        """Create the autotuner.
+
+        Args:
+            model_name (str): Name of the model in ``model_catalog``.
+            model_params (dict): Parameters of the model class.
+            cache_path (Optional[Union[str, Path]], optional): JSON file of
+                the tuned settings. None to not cache them.
+                Defaults to None.
+            image_size (Optional[Tuple[int, int]], optional): Width and
+                height of the synthetic images, e.g. the size of the camera
+                frames or of the face crops. None to use a default size of
+                the model. Defaults to None.
+            objective (Literal["throughput", "latency"], optional): Minimize
+                the time per image of batches of ``num_images`` images
+                ("throughput") or of single images ("latency"). The batch
+                size is not tuned for the latency. Defaults to "throughput".
+            backends (Optional[Sequence[str]], optional): Values of the
+                ``backend`` parameter to try. None to try all the backends
+                that can load the weights. Defaults to None.
+            threads (Optional[Sequence[Optional[int]]], optional): Numbers
+                of intra-op threads to try. None to try the powers of two up
+                to the number of available CPUs. Defaults to None.
+            batch_sizes (Sequence[int], optional): Batch sizes to try.
+                Defaults to (1, 4, 8, 16).
+            num_images (int, optional): Number of synthetic images predicted
+                on each run. Defaults to 16.
+            num_runs (int, optional): Number of timed runs of each candidate,
+                after a warm-up run. Defaults to 3.
+
+        Raises:
+            ValueError: If the model can not be tuned, the objective is not
+                valid or no backend can load the weights.
+        """
+        if model_name not in TUNABLE_MODELS:
+            raise ValueError(f"Model {model_name} can not be tuned. "
+                             f"Supported models: {list(TUNABLE_MODELS)}")
+        if objective not in ("throughput", "latency"):
+            raise ValueError("``objective`` should be one of 'throughput' "
+                             "or 'latency'")
+        self.model_name = model_name
+        self.model_params = dict(model_params)
+        self.cache_path = Path(cache_path) if cache_path is not None \
+            else None
+        self._spec = TUNABLE_MODELS[model_name]
+        self.image_size = tuple(image_size or self._spec["image_size"])
+        self.objective = objective
+        self.backends = self._get_backends(backends)
+        self.threads = list(threads) if threads is not None \
+            else _default_threads()
+        self.batch_sizes = sorted(set(max(b, 1) for b in batch_sizes))
+        self.num_images = max(num_images, 1)
+        self.num_runs = max(num_runs, 1)
+
+    def _get_backends(self, backends: Optional[Sequence[str]]) -> List[str]:
+        """Get the backends to try that can load the weights files.
+        """
+        from toolbox.Models.backends import get_backend_class
+
+        names = list(backends) if backends is not None \
+            else list(self._spec["backends"])
+        valid = []
+        for name in names:
+            if name not in self._spec["backends"]:
+                raise ValueError(
+                    f"Unknown backend '{name}' of {self.model_name}, it "
+                    f"should be one of {list(self._spec['backends'])}")
+            backend_name, model_format = self._spec["backends"][name]
+            formats = get_backend_class(backend_name).formats
+            suffixes = [Path(self.model_params[p]).suffix.lower()
+                        for p in self._spec["weights"]
+                        if self.model_params.get(p) is not None]
+            if all(suffix in formats and model_format in
+                   (None, formats[suffix]) for suffix in suffixes):
+                valid.append(name)
+        if not valid:
+            raise ValueError(f"None of the backends {names} can load the "
+                             f"weights of {self.model_name}")
+        return valid
+
+    def get_key(self) -> str:
+        """Get the cache key of the model, its parameters and the host.
+
+        Returns:
+            str: The hexadecimal key.
+        """
+        tuned = (self._spec["threads"], self._spec["batch_size"], "backend")
+        params = {k: v for k, v in self.model_params.items()
+                  if k not in tuned}
+        data = json.dumps({
+            "model_name": self.model_name,
+            "params": params,
+            "image_size": self.image_size,
+            "objective": self.objective,
+            "backends": self.backends,
+            "threads": self.threads,
+            "batch_sizes": self.batch_sizes,
+            "host": _host_info()
+        }, sort_keys=True, default=str)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def get_candidates(self) -> List[Dict[str, Any]]:
+        """Get the backend and threads parameters of the first stage.
+
+        Returns:
+            List[Dict[str, Any]]: The parameters of each candidate.
+        """
+        candidates = []
+        for backend in self.backends:
+            threads = self.threads if backend in self._spec["threaded"] \
+                else [None]
+            for num_threads in threads:
+                candidates.append({"backend": backend,
+                                   self._spec["threads"]: num_threads})
+        return candidates
+
+    def _create_images(self) -> List[np.ndarray]:
+        rng = np.random.RandomState(0)
+        w, h = self.image_size
+        return [rng.randint(0, 256, (h, w, 3), dtype=np.uint8)
+                for _ in range(self.num_images)]
+
+    def benchmark(self, params: Dict[str, Any],
+                  images: Optional[List[np.ndarray]] = None) -> float:
+        """Measure the time per image of the model with some parameters.
+
+        Args:
+            params (Dict[str, Any]): Parameters that replace the ones of the
+                model.
+            images (Optional[List[np.ndarray]], optional): The images to
+                predict. None to create synthetic images. Defaults to None.
+
+        Returns:
+            float: The median time per image in seconds.
+        """
+        from toolbox.Models import model_catalog
+
+        if images is None:
+            images = self._create_images()
+        model = model_catalog[self.model_name](
+            **{**self.model_params, **params})
+        if self.objective == "latency":
+            def run():
+                for image in images:
+                    model.predict(image)
+        elif hasattr(model, "predict_batch"):
+            def run():
+                model.predict_batch(images)
+        else:
+            def run():
+                model.predict(images)
+        run()
+        times = []
+        for _ in range(self.num_runs):
+            ti = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - ti)
+        return float(np.median(times)) / len(images)
+
+    def tune(self) -> Dict[str, Any]:
+        """Benchmark the candidates and get the fastest parameters.
+
+        Returns:
+            Dict[str, Any]: The best parameters ("params"), their time per
+                image ("time_per_image") and the time of each benchmarked
+                candidate ("results").
+        """
+        images = self._create_images()
+        results = []
+
+        def run(params):
+            try:
+                t = self.benchmark(params, images)
+            except Exception as e:
+                # A backend may not be installed or support the model
+                logger.warning(f"Unable to benchmark {params}: {e}")
+                return float("inf")
+            logger.debug(f"{params}: {t * 1000:.2f} ms/image")
+            results.append({"params": params, "time_per_image": t})
+            return t
+
+        batch_param = self._spec["batch_size"]
+        largest = {batch_param: self.batch_sizes[-1]} \
+            if self.objective == "throughput" else {}
+        best, best_time = None, float("inf")
+        for params in self.get_candidates():
+            t = run({**params, **largest})
+            if t < best_time:
+                best, best_time = {**params, **largest}, t
+        if best is None:
+            raise RuntimeError(f"No candidate of {self.model_name} could "
+                               "be benchmarked")
+        if self.objective == "throughput":
+            for batch_size in self.batch_sizes[:-1]:
+                params = {**best, batch_param: batch_size}
+                t = run(params)
+                if t < best_time:
+                    best, best_time = params, t
+        return {"params": best, "time_per_image": best_time,
+                "results": results}
+
+    def _read_cache(self) -> Dict[str, Any]:
+        if self.cache_path is None or not self.cache_path.is_file():
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unable to read the autotune cache: {e}")
+            return {}
+
+    def _write_cache(self, key: str, entry: Dict[str, Any]):
+        """Add an entry to the cache file. The file is replaced atomically,
+        so other processes never read a partial file.
+        """
+        cache = self._read_cache()
+        cache[key] = entry
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_path.parent,
+                                        suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Unable to write the autotune cache: {e}")
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+    def get_best_params(self, force: bool = False) -> Dict[str, Any]:
+        """Get the tuned parameters from the cache or, if they are not
+        cached, by running the benchmark.
+
+        Args:
+            force (bool, optional): Run the benchmark even if the parameters
+                are cached. Defaults to False.
+
+        Returns:
+            Dict[str, Any]: The tuned parameters of the model.
+        """
+        key = self.get_key()
+        if not force:
+            entry = self._read_cache().get(key)
+            if entry is not None:
+                logger.info(f"Using the autotuned {self.model_name} "
+                            f"parameters: {entry['params']}")
+                return dict(entry["params"])
+        logger.info(f"Autotuning {self.model_name}, it may take a while")
+        result = self.tune()
+        logger.info(f"Autotuned {self.model_name} parameters: "
+                    f"{result['params']} "
+                    f"({result['time_per_image'] * 1000:.2f} ms/image)")
+        if self.cache_path is not None:
+            self._write_cache(key, {
+                "model_name": self.model_name,
+                "params": result["params"],
+                "time_per_image": result["time_per_image"],
+                "date": datetime.now().isoformat()
+            })
+        return dict(result["params"])
+
+    def get_params(self, force: bool = False) -> dict:
+        """Get the model parameters with the tuned backend, threads and
+        batch size.
+
+        Args:
+            force (bool, optional): Run the benchmark even if the parameters
+                are cached. Defaults to False.
+
+        Returns:
+            dict: The parameters of the model class.
+        """
+        return {**self.model_params, **self.get_best_params(force)}
+
+
+def _default_threads() -> List[int]:
+    """Get the powers of two up to the number of available CPUs, and the
+    number of CPUs.
+    """
+    num_cpus = _num_cpus()
+    threads = [2 ** i for i in range(num_cpus.bit_length())
+               if 2 ** i <= num_cpus]
+    if threads[-1] != num_cpus:
+        threads.append(num_cpus)
+    return threads
+
+
+def _num_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _host_info() -> Dict[str, Any]:
+    """Get the CPU and the number of available CPUs of the host.
+    """
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return {"machine": platform.machine(), "cpu": cpu, "cpus": _num_cpus()}
@@ -0,0 +1,287 @@
+import functools
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, List, Optional, Union
+
+import numpy as np
+
+from toolbox.Structures import Image, SharedImage, SharedImagePool
+from toolbox.utils import runtime
+
+# Model of the worker process
+_model = None
+
+
+def _init_worker(model_name: str, model_params: dict,
+                 runtime_config: Optional[dict], warmup: Optional[dict]):
+    """Create the model of a worker process.
+    """
+    global _model
+    from toolbox.Models import model_catalog, warmup_model
+
+    runtime.configure_runtime(runtime_config)
+    _model = model_catalog[model_name](**model_params)
+    if warmup is not None:
+        warmup_model(_model, **warmup)
+
+
+def _ping() -> bool:
+    return True
+
+
+def _unshare(obj: Any, shared: List[SharedImage]) -> Any:
+    """Replace the SharedImage objects of the arguments by their arrays.
+    """
+    if isinstance(obj, SharedImage):
+        shared.append(obj)
+        return obj.image
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_unshare(o, shared) for o in obj)
+    return obj
+
+
+def _call(method: str, args: tuple, kwargs: dict) -> Any:
+    """Call a method of the worker model.
+    """
+    shared = []
+    args = _unshare(args, shared)
+    kwargs = {k: _unshare(v, shared) for k, v in kwargs.items()}
+    try:
+        return getattr(_model, method)(*args, **kwargs)
+    finally:
+        for image in shared:
+            image.close()
+
+
+def _get_attribute(name: str) -> tuple:
+    """Get an attribute of the worker model. Methods are not returned, only
+    flagged as such.
+    """
+    value = getattr(_model, name)
+    if callable(value):
+        return True, None
+    return False, value
+
+
+class ModelExecutor:
+    """Run a ``model_catalog`` model on a pool of worker processes.
+
+    Each worker process creates its own copy of the model, so several
+    images can be predicted in parallel without being limited by the GIL.
+    The images are passed to the workers through shared memory and the
+    results are returned as the model returns them (e.g. lists of
+    ``Instance``).
+
+    The executor has the same interface as the model: ``predict(image)``
+    blocks until the result is ready and any other method or attribute of
+    the model is forwarded to a worker. ``submit`` returns a ``Future``
+    instead.
+
+    Models whose state is modified after they are created (e.g. the
+    features of a face recognition model) should not be run in an executor,
+    as each worker has its own copy of the state.
+
+    Example:
+
+    .. code-block:: python
+
+        with ModelExecutor("face_detector_retinaface", params,
+                           num_workers=4) as executor:
+            futures = [executor.submit(image) for image in images]
+            results = [f.result() for f in futures]
+    """
+
+    def __init__(self, model_name: str, model_params: dict,
+                 num_workers: int = 2, max_pending: Optional[int] = None,
+                 runtime_config: Optional[dict] = None,
+                 warmup: Optional[dict] = None):
+        """Start the worker processes.
+
+        Args:
+            model_name (str): Name of the model in ``model_catalog``.
+            model_params (dict): Parameters of the model class.
+            num_workers (int, optional): Number of worker processes.
+                Defaults to 2.
+            max_pending (Optional[int], optional): Maximum number of
+                shared memory segments of the images being predicted.
+                ``submit`` blocks when all of them are in use, and the other
+                arrays of a call with several ones are pickled. None to use
+                4 times ``num_workers``. Defaults to None.
+            runtime_config (Optional[dict], optional): ``runtime`` config
+                of the workers. None to use the config of this process.
+                Defaults to None.
+            warmup (Optional[dict], optional): Arguments of
+                ``warmup_model`` to warm up the model of each worker. The
+                workers are then started and warmed up before the executor
+                is returned. None to start them on the first predictions.
+                Defaults to None.
+
+        Raises:
+            ValueError: If ``num_workers`` is lower than 1.
+        """
+        if num_workers < 1:
+            raise ValueError("``num_workers`` must be greater than 0")
+        if runtime_config is None:
+            runtime_config = runtime.get_runtime_config()
+        self.num_workers = num_workers
+        self._images_pool = SharedImagePool(
+            max_segments=max_pending or 4 * num_workers)
+        # Spawn the workers, the frameworks can not be safely forked
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, model_params, runtime_config, warmup)
+        )
+        self._methods = set()
+        if warmup is not None:
+            # The workers are started on demand, one for each call submitted
+            # while the others are busy
+            futures = [self._executor.submit(_ping)
+                       for _ in range(num_workers)]
+            for future in futures:
+                future.result()
+
+    def _share(self, obj: Any, shared: List[SharedImage]) -> Any:
+        """Copy the arrays and images of the arguments to shared memory.
+
+        Only the first array of a call waits for a free segment. A call that
+        waits while holding segments could block the calls that would
+        release them, so the next arrays are pickled if the pool is full.
+        """
+        if isinstance(obj, SharedImage):
+            return obj
+        if isinstance(obj, (np.ndarray, Image)):
+            # The workers receive the arrays of the images
+            array = obj if isinstance(obj, np.ndarray) else obj.image
+            try:
+                image = SharedImage.from_array(
+                    array, pool=self._images_pool,
+                    timeout=0 if shared else None)
+            except TimeoutError:
+                return array
+            shared.append(image)
+            return image
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(self._share(o, shared) for o in obj)
+        return obj
+
+    def submit_call(self, method: str, *args, **kwargs) -> Future:
+        """Call a method of the model on a worker. The numpy arrays and
+        ``Image`` objects of the arguments, also inside lists or tuples,
+        are passed through shared memory.
+
+        Args:
+            method (str): Name of the method.
+            *args: Arguments of the method.
+            **kwargs: Keyword arguments of the method.
+
+        Returns:
+            Future: The future result of the method.
+        """
+        shared = []
+        args = self._share(args, shared)
+        kwargs = {k: self._share(v, shared) for k, v in kwargs.items()}
+        try:
+            future = self._executor.submit(_call, method, args, kwargs)
+        except BaseException:
+            for image in shared:
+                image.close()
+            raise
+
+        def release(_):
+            for image in shared:
+                image.close()
+
+        future.add_done_callback(release)
+        return future
+
+    def submit(self, image: Union[np.ndarray, Image]) -> Future:
+        """Predict an image on a worker.
+
+        Args:
+            image (Union[np.ndarray, Image]): The input of the model
+                ``predict`` method.
+
+        Returns:
+            Future: The future result of the model ``predict`` method.
+        """
+        return self.submit_call("predict", image)
+
+    def predict(self, image: Union[np.ndarray, Image]) -> Any:
+        """Predict an image on a worker and wait for the result.
+
+        Args:
+            image (Union[np.ndarray, Image]): The input of the model
+                ``predict`` method.
+
+        Returns:
+            Any: The result of the model ``predict`` method.
+        """
+        return self.submit(image).result()
+
+    def predict_batch(self, images: List[Union[np.ndarray, Image]]
+                      ) -> List[Any]:
+        """Predict multiple images, split between the workers. Each worker
+        uses the ``predict_batch`` method of the model if it has one. The
+        chunks sent to the workers are not larger than the shared memory
+        pool.
+
+        Args:
+            images (List[Union[np.ndarray, Image]]): The input images.
+
+        Returns:
+            List[Any]: The result of each image.
+        """
+        if not images:
+            return []
+        if self._has_method("predict_batch"):
+            size = min(-(-len(images) // self.num_workers),
+                       self._images_pool.max_segments)
+            futures = [
+                self.submit_call("predict_batch", images[i:i + size])
+                for i in range(0, len(images), size)
+            ]
+            return [r for f in futures for r in f.result()]
+        futures = [self.submit(image) for image in images]
+        return [f.result() for f in futures]
+
+    def _has_method(self, name: str) -> bool:
+        if name in self._methods:
+            return True
+        try:
+            is_method, _ = self._executor.submit(
+                _get_attribute, name).result()
+        except AttributeError:
+            return False
+        if is_method:
+            self._methods.add(name)
+        return is_method
+
+    def __getattr__(self, name: str) -> Any:
+        # Forward the other methods and attributes to the model
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._methods:
+            return functools.partial(self._call_method, name)
+        is_method, value = self._executor.submit(
+            _get_attribute, name).result()
+        if not is_method:
+            return value
+        self._methods.add(name)
+        return functools.partial(self._call_method, name)
+
+    def _call_method(self, name: str, *args, **kwargs) -> Any:
+        return self.submit_call(name, *args, **kwargs).result()
+
+    def close(self):
+        """Wait for the pending predictions and stop the workers.
+        """
+        self._executor.shutdown(wait=True)
+        self._images_pool.close()
+
+    def __enter__(self) -> "ModelExecutor":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,160 @@
+import contextlib
+import functools
+import queue
+from typing import Any, Callable, Iterator, Optional
+
+
+class ModelPool:
+    """Thread-safe pool of replicas of a model.
+
+    Each replica is used by one thread at a time: it is checked out of the
+    pool, used and checked back in. With a single replica the pool is a
+    lock-guarded model. Methods and attributes of the model can be used
+    directly on the pool, each method call checks out a replica for the
+    duration of the call.
+
+    Some models are not safe to run from several threads at once (e.g. an
+    OpenCV DNN network with ``setInput`` and ``forward``, or shared
+    TensorFlow sessions), so the APIs, which predict on a threadpool, use a
+    pool for each model.
+
+    The replicas are independent copies, so methods that modify the state
+    of a model (e.g. ``add_features`` of a face recognition model) only
+    modify one of them. Such models should use a single replica. Models
+    that load their graph in a process-wide TensorFlow graph or session
+    (FaceNet and the Keras backend of HSE) should also use one replica.
+
+    Example:
+
+    .. code-block:: python
+
+        pool = ModelPool.from_catalog("age_gender", params, size=4)
+        with pool.use() as model:
+            instances = model.predict(images)
+        # Or equivalently
+        instances = pool.predict(images)
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 1):
+        """Create the replicas of the model.
+
+        Args:
+            factory (Callable[[], Any]): Function that creates a replica.
+            size (int, optional): Number of replicas. Defaults to 1.
+
+        Raises:
+            ValueError: If ``size`` is lower than 1.
+        """
+        if size < 1:
+            raise ValueError("``size`` must be greater than 0")
+        self._replicas = [factory() for _ in range(size)]
+        # The last checked in replica is used first, to keep its caches warm
+        self._free = queue.LifoQueue()
+        for replica in self._replicas:
+            self._free.put(replica)
+
+    @classmethod
+    def from_catalog(cls, model_name: str, model_params: dict,
+                     size: int = 1, warmup: Optional[dict] = None
+                     ) -> "ModelPool":
+        """Create a pool of a ``model_catalog`` model.
+
+        Args:
+            model_name (str): Name of the model in ``model_catalog``.
+            model_params (dict): Parameters of the model class.
+            size (int, optional): Number of replicas. Defaults to 1.
+            warmup (Optional[dict], optional): Arguments of
+                ``warmup_model`` to warm up each replica when it is created.
+                None to not warm them up. Defaults to None.
+
+        Returns:
+            ModelPool: The pool.
+        """
+        from toolbox.Models import model_catalog, warmup_model
+
+        model_cls = model_catalog[model_name]
+
+        def factory():
+            model = model_cls(**model_params)
+            if warmup is not None:
+                warmup_model(model, **warmup)
+            return model
+
+        return cls(factory, size)
+
+    @property
+    def size(self) -> int:
+        """Number of replicas of the pool.
+        """
+        return len(self._replicas)
+
+    @property
+    def num_free(self) -> int:
+        """Number of replicas that are not checked out.
+        """
+        return self._free.qsize()
+
+    def checkout(self, timeout: Optional[float] = None) -> Any:
+        """Take a replica from the pool. Blocks until one is free.
+
+        Args:
+            timeout (Optional[float], optional): Maximum time in seconds to
+                wait for a replica. None to wait forever. Defaults to None.
+
+        Raises:
+            TimeoutError: If no replica is checked in within ``timeout``.
+
+        Returns:
+            Any: A replica of the model. It must be returned with
+                ``checkin``.
+        """
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No free model replica")
+
+    def checkin(self, model: Any):
+        """Return a replica to the pool.
+
+        Args:
+            model (Any): A replica taken with ``checkout``.
+
+        Raises:
+            ValueError: If the model is not a replica of the pool.
+        """
+        if not any(model is replica for replica in self._replicas):
+            raise ValueError("The model is not a replica of this pool")
+        self._free.put(model)
+
+    @contextlib.contextmanager
+    def use(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Context manager that checks out a replica and checks it in at
+        the end.
+
+        Args:
+            timeout (Optional[float], optional): Maximum time in seconds to
+                wait for a replica. None to wait forever. Defaults to None.
+
+        Yields:
+            Any: A replica of the model.
+        """
+        model = self.checkout(timeout)
+        try:
+            yield model
+        finally:
+            self.checkin(model)
+
+    def __getattr__(self, name: str) -> Any:
+        # Forward the methods and attributes to a replica
+        if name.startswith("_"):
+            raise AttributeError(name)
+        value = getattr(self._replicas[0], name)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def call(*args, **kwargs):
+            with self.use() as model:
+                return getattr(model, name)(*args, **kwargs)
+
+        return call
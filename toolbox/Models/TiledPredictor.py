@@ -0,0 +1,293 @@
+from typing import Any, Iterator, List, Tuple
+
+import numpy as np
+
+from toolbox.Structures import BoundingBox, Instance
+from toolbox.utils.nms import batched_nms
+
+
+class TiledPredictor:
+    """Predict large images by splitting them into overlapping tiles.
+
+    Each tile is predicted by the model at its full resolution, so small
+    objects of very large images (e.g. faces on panoramas or orthophotos)
+    are detected without running the model on the whole image. The tiles
+    are predicted in batches of ``batch_size`` and are views of the image,
+    so the memory used by the model only depends on the tile size. The
+    instances of all the tiles are moved to the image coordinates and the
+    duplicated detections of the overlapping areas are merged with NMS.
+
+    The bounding boxes, landmarks, keypoints and segmentation masks of the
+    instances are moved to the image. The overlap should be larger than the
+    objects to detect, so that each one is complete in at least one tile:
+    the truncated detections that touch the inner border of a tile are
+    removed if they are mostly covered by a complete detection. Images that
+    fit in a single tile are predicted as usual.
+
+    Example:
+
+    .. code-block:: python
+
+        model = TiledPredictor.from_catalog(
+            "face_detector_retinaface", params, tile_size=1024, overlap=128)
+        instances = model.predict(image)
+    """
+
+    def __init__(self, model: Any, tile_size: int = 1024, overlap: int = 128,
+                 nms_threshold: float = 0.5, batch_size: int = 4):
+        """Wrap a model.
+
+        Args:
+            model (Any): A model whose ``predict`` method returns a list of
+                ``Instance`` with a ``bounding_box`` and a ``confidence``.
+                Its ``predict_batch`` method is used if it has one.
+            tile_size (int, optional): Width and height of the tiles.
+                Defaults to 1024.
+            overlap (int, optional): Number of pixels shared by adjacent
+                tiles. Defaults to 128.
+            nms_threshold (float, optional): IoU threshold of the NMS that
+                merges the instances of different tiles. Instances with a
+                different ``label_id`` are not merged. Defaults to 0.5.
+            batch_size (int, optional): Number of tiles predicted at once.
+                Defaults to 4.
+
+        Raises:
+            ValueError: If ``overlap`` is not lower than ``tile_size`` or
+                ``batch_size`` is lower than 1.
+        """
+        if not 0 <= overlap < tile_size:
+            raise ValueError("``overlap`` must be between 0 and "
+                             "``tile_size``")
+        if batch_size < 1:
+            raise ValueError("``batch_size`` must be greater than 0")
+        self._model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.nms_threshold = nms_threshold
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_catalog(cls, model_name: str, model_params: dict, **kwargs
+                     ) -> "TiledPredictor":
+        """Create a tiled predictor of a ``model_catalog`` model.
+
+        Args:
+            model_name (str): Name of the model in ``model_catalog``.
+            model_params (dict): Parameters of the model class.
+            **kwargs: Tiling arguments of ``TiledPredictor``.
+
+        Returns:
+            TiledPredictor: The tiled predictor.
+        """
+        from toolbox.Models import model_catalog
+
+        return cls(model_catalog[model_name](**model_params), **kwargs)
+
+    def _get_offsets(self, size: int) -> List[int]:
+        """Get the start positions of the tiles along an image side. The last
+        tile ends at the image border, so all the tiles have the same size.
+        """
+        if size <= self.tile_size:
+            return [0]
+        stride = self.tile_size - self.overlap
+        offsets = list(range(0, size - self.tile_size, stride))
+        offsets.append(size - self.tile_size)
+        return offsets
+
+    def get_tiles(self, height: int, width: int
+                  ) -> List[Tuple[int, int, int, int]]:
+        """Get the tiles of an image.
+
+        Args:
+            height (int): Height of the image.
+            width (int): Width of the image.
+
+        Returns:
+            List[Tuple[int, int, int, int]]: The (x, y, width, height) of
+                each tile.
+        """
+        tile_w = min(width, self.tile_size)
+        tile_h = min(height, self.tile_size)
+        return [
+            (x, y, tile_w, tile_h)
+            for y in self._get_offsets(height)
+            for x in self._get_offsets(width)
+        ]
+
+    def _predict_tiles(self, tiles: Iterator[np.ndarray]
+                       ) -> Iterator[List[Instance]]:
+        """Predict the tiles in batches of ``batch_size``.
+        """
+        has_batch = hasattr(self._model, "predict_batch")
+        batch = []
+        for tile in tiles:
+            batch.append(tile)
+            if len(batch) < self.batch_size:
+                continue
+            yield from self._predict_chunk(batch, has_batch)
+            batch = []
+        if batch:
+            yield from self._predict_chunk(batch, has_batch)
+
+    def _predict_chunk(self, tiles: List[np.ndarray], has_batch: bool
+                       ) -> List[List[Instance]]:
+        if has_batch:
+            return self._model.predict_batch(tiles)
+        return [self._model.predict(tile) for tile in tiles]
+
+    def _is_truncated(self, box: np.ndarray,
+                      tile: Tuple[int, int, int, int], width: int,
+                      height: int) -> bool:
+        """Check if a box touches a border of its tile that is not a border
+        of the image.
+        """
+        x, y, tile_w, tile_h = tile
+        x1, y1, x2, y2 = box
+        return bool(
+            (x > 0 and x1 <= x + 1) or
+            (y > 0 and y1 <= y + 1) or
+            (x + tile_w < width and x2 >= x + tile_w - 1) or
+            (y + tile_h < height and y2 >= y + tile_h - 1)
+        )
+
+    def _remove_truncated(self, keep: np.ndarray, boxes: np.ndarray,
+                          labels: np.ndarray, truncated: np.ndarray
+                          ) -> np.ndarray:
+        """Remove the kept truncated boxes whose area is mostly covered by a
+        kept complete box of the same label. Their IoU can be low, so the
+        NMS does not remove them.
+        """
+        is_truncated = truncated[keep]
+        trunc = keep[is_truncated]
+        complete = keep[~is_truncated]
+        if len(trunc) == 0 or len(complete) == 0:
+            return keep
+        b1 = boxes[trunc][:, None]
+        b2 = boxes[complete][None]
+        w = np.minimum(b1[..., 2], b2[..., 2]) - \
+            np.maximum(b1[..., 0], b2[..., 0])
+        h = np.minimum(b1[..., 3], b2[..., 3]) - \
+            np.maximum(b1[..., 1], b2[..., 1])
+        inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+        area = (b1[..., 2] - b1[..., 0]) * (b1[..., 3] - b1[..., 1])
+        covered = inter / np.maximum(area, 1e-6) > self.nms_threshold
+        covered &= labels[trunc][:, None] == labels[complete][None]
+        removed = set(trunc[covered.any(axis=1)].tolist())
+        return np.array([i for i in keep if i not in removed], dtype=int)
+
+    def _move_instance(self, instance: Instance,
+                       tile: Tuple[int, int, int, int], box: np.ndarray,
+                       width: int, height: int) -> Instance:
+        """Move an instance of a tile to the image coordinates.
+
+        Args:
+            instance (Instance): An instance predicted on the tile.
+            tile (Tuple[int, int, int, int]): The (x, y, width, height) of
+                the tile.
+            box (np.ndarray): The absolute image box (x1, y1, x2, y2) of the
+                instance.
+            width (int): Width of the image.
+            height (int): Height of the image.
+
+        Returns:
+            Instance: A new instance with the image coordinates.
+        """
+        x, y, tile_w, tile_h = tile
+        moved = Instance({name: instance.get(name)
+                          for name in instance.fields})
+        moved.set("bounding_box", BoundingBox.from_absolute(
+            *box, image_width=width, image_height=height))
+        if instance.has("landmarks"):
+            landmarks = np.array(instance.landmarks, dtype=np.float32)
+            landmarks[0::2] += x
+            landmarks[1::2] += y
+            moved.set("landmarks", landmarks)
+        if instance.has("keypoints"):
+            kp = instance.keypoints
+            points = np.array(kp.keypoints, dtype=float)
+            points[:, 0] = (points[:, 0] * tile_w + x) / width
+            points[:, 1] = (points[:, 1] * tile_h + y) / height
+            moved.set("keypoints", type(kp)(
+                points, confidence_threshold=kp.confidence_threshold))
+        if instance.has("mask"):
+            moved.set("mask", instance.mask.paste(x, y, width, height))
+        return moved
+
+    def predict_batch(self, images: List[np.ndarray]
+                      ) -> List[List[Instance]]:
+        """Predict multiple images. The tiles of all the images are
+        predicted in batches of ``batch_size``.
+
+        Args:
+            images (List[np.ndarray]): A list of BGR uint8 images of shape
+                (H, W, 3).
+
+        Returns:
+            List[List[Instance]]: The instances of each image, with the same
+                fields as the model, sorted by descending confidence if the
+                image has several tiles.
+        """
+        image_tiles = [self.get_tiles(*image.shape[:2]) for image in images]
+        tiles = (
+            image[y:y + h, x:x + w]
+            for image, tiles in zip(images, image_tiles)
+            for x, y, w, h in tiles
+        )
+        tiles_instances = self._predict_tiles(tiles)
+
+        results = []
+        for image, tiles in zip(images, image_tiles):
+            if len(tiles) == 1:
+                results.append(next(tiles_instances))
+                continue
+            height, width = image.shape[:2]
+            candidates = []
+            boxes = []
+            truncated = []
+            for tile in tiles:
+                x, y, tile_w, tile_h = tile
+                for instance in next(tiles_instances):
+                    box = instance.bounding_box.get_xyxy()
+                    box = box * (tile_w, tile_h, tile_w, tile_h) + \
+                        (x, y, x, y)
+                    boxes.append(box)
+                    truncated.append(
+                        self._is_truncated(box, tile, width, height))
+                    candidates.append((instance, tile))
+            if not candidates:
+                results.append([])
+                continue
+            boxes = np.array(boxes, dtype=np.float32)
+            scores = np.array([float(ins.confidence) for ins, _ in candidates],
+                              dtype=np.float32)
+            labels = np.array([ins.get("label_id") or 0
+                               for ins, _ in candidates])
+            truncated = np.array(truncated)
+            # Keep the complete detections over the truncated ones
+            ranks = scores + ~truncated * (np.ptp(scores) + 1)
+            keep = batched_nms(boxes, ranks, labels, self.nms_threshold)
+            keep = self._remove_truncated(keep, boxes, labels, truncated)
+            keep = keep[np.argsort(-scores[keep], kind="stable")]
+            results.append([
+                self._move_instance(*candidates[i], boxes[i], width, height)
+                for i in keep
+            ])
+        return results
+
+    def predict(self, image: np.ndarray) -> List[Instance]:
+        """Predict an image by tiles.
+
+        Args:
+            image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
+
+        Returns:
+            List[Instance]: The instances of the image, with the same fields
+                as the model.
+        """
+        return self.predict_batch([image])[0]
+
+    def __getattr__(self, name: str) -> Any:
+        # Forward the other methods and attributes to the model
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._model, name)
@@ -1,21 +1,191 @@
-from .age_gender import AgeGenderPredictor as age_gender
-from .emotions_hse import EmotionsClassifier as emotions_hse
-from .face_detector_retinaface import FaceDetector as face_detector_retinaface
-from .face_detector_ultraface import FaceDetector as face_detector_ultraface
-from .face_recognition_facenet import \
-    FaceRecognition as face_recognition_facenet
-
-try:
-    from .detectron2 import Detectron2
-except:
-    print("Warning: Detectron2 not found.")
-    Detectron2 = None
-
-model_catalog = {
-    "age_gender": age_gender,
-    "face_detector_ultraface": face_detector_ultraface,
-    "detectron2": Detectron2,
-    "emotions_hse": emotions_hse,
-    "face_recognition_facenet": face_recognition_facenet,
-    "face_detector_retinaface": face_detector_retinaface
-}
+import importlib
+import sys
+import types
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+class _ModelCatalog(Mapping):
+    """Read-only mapping of model names to model classes. The model modules
+    are imported on the first lookup of their name, so only the frameworks
+    of the used models (TensorFlow, PyTorch, detectron2...) are loaded.
+    """
+
+    def __init__(self, entries: Dict[str, Tuple[str, str]],
+                 optional: Tuple[str, ...] = ()):
+        """Create the catalog.
+
+        Args:
+            entries (Dict[str, Tuple[str, str]]): Model names to a tuple with
+                the module relative to this package and the class name.
+            optional (Tuple[str, ...], optional): Names of the models whose
+                dependencies may not be installed. They are None if their
+                module can not be imported. Defaults to ().
+        """
+        self._entries = entries
+        self._optional = optional
+        self._classes = {}
+
+    def __getitem__(self, name: str) -> Optional[type]:
+        if name not in self._classes:
+            module_name, class_name = self._entries[name]
+            try:
+                module = importlib.import_module(module_name, __name__)
+            except ImportError:
+                if name not in self._optional:
+                    raise
+                print(f"Warning: {class_name} not found.")
+                self._classes[name] = None
+            else:
+                self._classes[name] = getattr(module, class_name)
+        return self._classes[name]
+
+    def __contains__(self, name: object) -> bool:
+        # Do not import the model, unlike the default implementation
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+model_catalog = _ModelCatalog({
+    "age_gender": (".age_gender", "AgeGenderPredictor"),
+    "face_detector_ultraface": (".face_detector_ultraface", "FaceDetector"),
+    "detectron2": (".detectron2", "Detectron2"),
+    "emotions_hse": (".emotions_hse", "EmotionsClassifier"),
+    "face_recognition_facenet": (".face_recognition_facenet",
+                                 "FaceRecognition"),
+    "face_detector_retinaface": (".face_detector_retinaface", "FaceDetector"),
+    "face_detector_cascade": (".face_detector_cascade", "FaceDetector")
+}, optional=("detectron2",))
+
+
+def create_model(model_name: str, model_params: dict,
+                 num_workers: int = 0, num_replicas: Optional[int] = 1,
+                 tiling: Optional[dict] = None,
+                 autotune: Optional[dict] = None,
+                 warmup: Optional[dict] = None) -> Any:
+    """Create a model of the catalog that can be used from several
+    threads, optionally running on worker processes or predicting large
+    images by tiles.
+
+    Args:
+        model_name (str): Name of the model in ``model_catalog``.
+        model_params (dict): Parameters of the model class.
+        num_workers (int, optional): Number of worker processes of a
+            ``ModelExecutor`` that runs the model. 0 to create the model in
+            this process. Defaults to 0.
+        num_replicas (Optional[int], optional): Number of replicas of the
+            ``ModelPool`` of the model, when it is created in this process.
+            None to use the model without a pool, e.g. if it is only used
+            by one thread. Defaults to 1.
+        tiling (Optional[dict], optional): Arguments of a
+            ``TiledPredictor`` that splits the images into tiles, e.g.
+            ``{"tile_size": 1024, "overlap": 128}``. None to predict the
+            whole images. Defaults to None.
+        autotune (Optional[dict], optional): Arguments of an ``Autotuner``
+            that sets the fastest backend, threads and batch size of the
+            model on this host, e.g. ``{"cache_path": "autotune.json"}``.
+            None to use the given parameters. Defaults to None.
+        warmup (Optional[dict], optional): Arguments of ``warmup_model``
+            to run each copy of the model on dummy images when it is
+            created, e.g. ``{"image_size": [640, 480]}``. None to not warm
+            it up. Defaults to None.
+
+    Returns:
+        Any: A ``TiledPredictor``, a ``ModelPool``, a ``ModelExecutor`` or
+            the model, all with the interface of the model.
+    """
+    if autotune is not None:
+        from .Autotuner import Autotuner
+        model_params = Autotuner(model_name, model_params,
+                                 **autotune).get_params()
+    if num_workers > 0:
+        from .ModelExecutor import ModelExecutor
+        model = ModelExecutor(model_name, model_params, num_workers,
+                              warmup=warmup)
+    elif num_replicas is not None:
+        from .ModelPool import ModelPool
+        model = ModelPool.from_catalog(model_name, model_params,
+                                       num_replicas, warmup)
+    else:
+        model = model_catalog[model_name](**model_params)
+        if warmup is not None:
+            warmup_model(model, **warmup)
+    if tiling is not None:
+        from .TiledPredictor import TiledPredictor
+        model = TiledPredictor(model, **tiling)
+    return model
+
+
+def warmup_model(model: Any, image_size: Tuple[int, int] = (640, 480),
+                 batch_size: int = 1, num_runs: int = 1):
+    """Run a model on dummy images, so that the first requests do not pay
+    for the lazy initializations of the runtimes (memory allocations,
+    kernel selection, graph optimizations...).
+
+    The images are random, so that the postprocessing of the detectors also
+    runs. The model is run with ``predict_batch`` or
+    ``predict_features_batch`` if it has them, otherwise with ``predict`` on
+    each image.
+
+    Args:
+        model (Any): A model of the catalog.
+        image_size (Tuple[int, int], optional): Width and height of the
+            dummy images, e.g. the size of the camera frames or of the face
+            crops. Defaults to (640, 480).
+        batch_size (int, optional): Number of images of each run.
+            Defaults to 1.
+        num_runs (int, optional): Number of runs. Defaults to 1.
+    """
+    rng = np.random.RandomState(0)
+    w, h = image_size
+    images = [rng.randint(0, 256, (h, w, 3), dtype=np.uint8)
+              for _ in range(max(batch_size, 1))]
+    for _ in range(num_runs):
+        if hasattr(model, "predict_batch"):
+            model.predict_batch(images)
+        elif hasattr(model, "predict_features_batch"):
+            model.predict_features_batch(images)
+        else:
+            for image in images:
+                model.predict(image)
+
+
+# Names of the catalog whose attribute of this package is the model class,
+# e.g. ``Models.face_detector_retinaface(**params)``, instead of the
+# subpackage. ``Models.detectron2`` is the subpackage and
+# ``Models.Detectron2`` the class.
+_CLASS_ATTRIBUTES = tuple(name for name in model_catalog
+                          if name != "detectron2")
+
+
+class _ModelsModule(types.ModuleType):
+    """Module type of this package. The import system sets each imported
+    subpackage as an attribute of its parent package, which would hide the
+    model classes returned by ``__getattr__``.
+    """
+
+    def __setattr__(self, name: str, value: Any):
+        if name in _CLASS_ATTRIBUTES and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _ModelsModule
+
+
+def __getattr__(name: str):
+    # Import the models on their first access
+    if name in _CLASS_ATTRIBUTES:
+        return model_catalog[name]
+    if name == "Detectron2":
+        return model_catalog["detectron2"]
+    if name == "detectron2" and model_catalog["detectron2"] is not None:
+        return importlib.import_module(".detectron2", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,11 @@
 from pathlib import Path
-from typing import List, Optional, Tuple, Union
+from typing import List, Literal, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 from scipy.special import softmax
 
+from toolbox.Models.backends import InferenceBackend, create_backend
 from toolbox.Structures import Gender, Instance
 
 
@@ -14,7 +15,11 @@ class AgeGenderPredictor:
 
     def __init__(self, age_model_path: Optional[Path] = None,
                  gender_model_path: Optional[Path] = None, do_age: bool = True,
-                 do_gender: bool = True, use_cuda: bool = False):
+                 do_gender: bool = True, use_cuda: bool = False,
+                 max_batch_size: int = 32,
+                 backend: Literal["opencv", "onnxruntime"] = "opencv",
+                 num_threads: Optional[int] = None,
+                 backend_options: Optional[dict] = None):
         """Create and load the age and gender models.
 
         Args:
@@ -28,27 +33,58 @@ class AgeGenderPredictor:
                 Defaults to True.
             use_cuda (bool, optional): If True, execute the model on a CUDA
                 device. Defaults to False.
+            max_batch_size (int, optional): Maximum number of images run in
+                one forward pass. Larger inputs are split in chunks.
+                Defaults to 32.
+            backend (Literal["opencv", "onnxruntime"], optional): Name of
+                the backend that runs the models, e.g. OpenCV DNN or ONNX
+                Runtime. Defaults to "opencv".
+            num_threads (Optional[int], optional): Number of threads used by
+                the backend to run each operator. None to use the runtime
+                config. Defaults to None.
+            backend_options (Optional[dict], optional): Other arguments of
+                the backend, e.g. the ``model_format`` of the weights.
+                Defaults to None.
+
+        Raises:
+            ValueError: If ``do_age`` and ``do_gender`` are False or
+                ``backend`` is not a valid backend.
         """
         if not do_age and not do_gender:
             raise ValueError("``do_age`` or ``do_gender`` must be True")
         self._do_age = do_age
         self._do_gender = do_gender
+        backend_options = dict(backend_options or {})
+        backend_options.setdefault("intra_op_threads", num_threads)
 
         if do_age:
-            self._age_model = cv2.dnn.readNetFromONNX(str(age_model_path))
-            if use_cuda:
-                self._enable_cuda_model(self._age_model)
+            self._age_model = self._load_model(
+                backend, age_model_path, use_cuda, max_batch_size,
+                backend_options)
         if do_gender:
-            self._gender_model = cv2.dnn.readNetFromONNX(
-                str(gender_model_path))
-            if use_cuda:
-                self._enable_cuda_model(self._gender_model)
+            self._gender_model = self._load_model(
+                backend, gender_model_path, use_cuda, max_batch_size,
+                backend_options)
+
+    def _load_model(self, backend: str, model_path: Path, use_cuda: bool,
+                    max_batch_size: int, backend_options: dict
+                    ) -> InferenceBackend:
+        """Load a model with the selected backend.
 
-    def _enable_cuda_model(self, model: cv2.dnn.Net):
-        """Set the model preferable execution device to cuda.
+        Args:
+            backend (str): Name of the backend.
+            model_path (Path): Path to the model weights.
+            use_cuda (bool): Execute the model on a CUDA device.
+            max_batch_size (int): Maximum number of images of each run.
+            backend_options (dict): Other arguments of the backend.
+
+        Returns:
+            InferenceBackend: The loaded model.
         """
-        model.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
-        model.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+        return create_backend(
+            backend, model_path, use_cuda=use_cuda,
+            max_batch_size=max(max_batch_size, 1), **backend_options
+        ).load()
 
     def _preprocess_image(self, images: Union[List[np.ndarray], np.ndarray]
                           ) -> np.ndarray:
@@ -59,16 +95,27 @@ class AgeGenderPredictor:
                 a single image, BGR uint8 of shape (H, W, 3).
 
         Returns:
-            np.ndarray: A preprocessed array of shape (B, 3, 224, 224)
+            np.ndarray: A float32 preprocessed array of shape
+                (B, 3, 224, 224)
         """
         if isinstance(images, np.ndarray) and images.ndim == 3:
             images = [images]
+        if len(images) == 0:
+            return np.zeros((0, 3, 224, 224), np.float32)
+        return cv2.dnn.blobFromImages(images, size=(224, 224))
 
-        input_blob = np.zeros((len(images), 3, 224, 224))
-        for i, img in enumerate(images):
-            img = cv2.resize(img, (224, 224))
-            input_blob[i] = img.transpose(2, 0, 1)
-        return input_blob
+    def _run_model(self, model: InferenceBackend, input_blob: np.ndarray
+                   ) -> np.ndarray:
+        """Run a model on chunks of up to ``max_batch_size`` images.
+
+        Args:
+            model (InferenceBackend): The model.
+            input_blob (np.ndarray): Input blob of shape (B, 3, 224, 224).
+
+        Returns:
+            np.ndarray: The model output of shape (B, C).
+        """
+        return model.run_batch(input_blob)[0]
 
     def _predict_age(self, input_blob: np.ndarray) -> List[float]:
         """Predict the age.
@@ -79,8 +126,7 @@ class AgeGenderPredictor:
         Returns:
             List[float]: List of ages.
         """
-        self._age_model.setInput(input_blob)
-        ages = self._age_model.forward()
+        ages = self._run_model(self._age_model, input_blob)
         ages = softmax(ages, axis=1)
         ages = ages * np.arange(101, dtype=np.float32)
         ages = np.sum(ages, axis=1)
@@ -97,11 +143,10 @@ class AgeGenderPredictor:
             Tuple[List[Gender], np.ndarray]: List of genders and list of
                 confidences.
         """
-        self._gender_model.setInput(input_blob)
-        output = self._gender_model.forward()
+        output = self._run_model(self._gender_model, input_blob)
         output = softmax(output, axis=1)
         genders = np.argmax(output, axis=1)
-        confidences = output[:, genders].flatten()
+        confidences = output[np.arange(len(output)), genders]
         genders = [
             Gender.MALE if g else
             Gender.FEMALE
@@ -128,6 +173,8 @@ class AgeGenderPredictor:
                 "Age model is not loaded because ``do_age`` was set to False"
             )
         input_blob = self._preprocess_image(images)
+        if len(input_blob) == 0:
+            return []
         ages = self._predict_age(input_blob)
         return [Instance().set("age", age) for age in ages]
 
@@ -153,6 +200,8 @@ class AgeGenderPredictor:
                 "to False"
             )
         input_blob = self._preprocess_image(images)
+        if len(input_blob) == 0:
+            return []
         genders, confidences = self._predict_gender(input_blob)
         return [
             Instance().set("gender", gen).set("confidence", conf)
@@ -176,6 +225,8 @@ class AgeGenderPredictor:
         """
         input_blob = self._preprocess_image(images)
         instances = [Instance() for _ in range(len(input_blob))]
+        if not instances:
+            return instances
 
         if self._do_age:
             ages = self._predict_age(input_blob)
@@ -0,0 +1,229 @@
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from toolbox.utils import runtime
+
+
+class TensorSpec(NamedTuple):
+    """Name, shape and type of an input or output of a model. The dynamic
+    dimensions of the shape are None.
+    """
+    name: str
+    shape: Tuple[Optional[int], ...]
+    dtype: np.dtype
+
+
+class InferenceBackend:
+    """Base class of the runtimes that run the networks of the models.
+
+    A backend loads a network from a weights file and runs it on numpy
+    batches, so a model can move to another runtime by changing its
+    ``backend`` parameter. The weights format is inferred from the file
+    extension if it is not given.
+
+    Subclasses implement ``_load``, ``run`` and the ``inputs`` and
+    ``outputs`` properties. The threads of the backends that support them
+    are set from the arguments or from the ``runtime`` config.
+
+    Attributes to override:
+        - name (str): Name of the backend, also the name of its section of
+          the ``runtime`` config.
+        - formats (Dict[str, str]): File extensions to the weights formats
+          that the backend can load.
+    """
+
+    name: str = ""
+    formats: Dict[str, str] = {}
+
+    def __init__(self, model_path: Optional[Union[str, Path]] = None,
+                 model_format: Optional[str] = None, use_cuda: bool = False,
+                 intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None,
+                 max_batch_size: Optional[int] = None):
+        """Create the backend. The network is loaded by ``load``.
+
+        Args:
+            model_path (Optional[Union[str, Path]], optional): Path to the
+                weights file. Defaults to None.
+            model_format (Optional[str], optional): Format of the weights,
+                one of the values of ``formats``. None to infer it from the
+                file extension. Defaults to None.
+            use_cuda (bool, optional): Run the network on a CUDA device.
+                Defaults to False.
+            intra_op_threads (Optional[int], optional): Number of threads
+                used to run each operator. None to use the runtime config.
+                Defaults to None.
+            inter_op_threads (Optional[int], optional): Number of threads
+                used to run operators in parallel. None to use the runtime
+                config. Defaults to None.
+            max_batch_size (Optional[int], optional): Maximum number of
+                samples of each network call of ``run_batch``. None for no
+                limit. Defaults to None.
+
+        Raises:
+            ValueError: If the weights format is not supported.
+        """
+        self.model_path = Path(model_path) if model_path is not None \
+            else None
+        if model_format is None and self.model_path is not None:
+            model_format = self.formats.get(self.model_path.suffix.lower())
+        if model_format not in self.supported_formats:
+            raise ValueError(
+                f"Unsupported weights format '{model_format}' of "
+                f"'{self.model_path}' for the {self.name} backend, it should "
+                f"be one of {sorted(self.supported_formats)}")
+        self.model_format = model_format
+        self.use_cuda = use_cuda
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.max_batch_size = max_batch_size
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    @property
+    def supported_formats(self) -> Set[str]:
+        """Weights formats that the backend can load.
+        """
+        return set(self.formats.values())
+
+    def get_num_threads(self) -> Tuple[Optional[int], Optional[int]]:
+        """Get the intra-op and inter-op threads of the backend.
+
+        Returns:
+            Tuple[Optional[int], Optional[int]]: The threads of the
+                arguments or, if they are None, of the runtime config.
+        """
+        intra, inter = runtime.get_num_threads(self.name) \
+            if self.name in ("onnxruntime", "torch", "tensorflow") \
+            else (None, None)
+        if self.intra_op_threads is not None:
+            intra = self.intra_op_threads
+        if self.inter_op_threads is not None:
+            inter = self.inter_op_threads
+        return intra, inter
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the network has been loaded.
+        """
+        return self._loaded
+
+    def load(self) -> "InferenceBackend":
+        """Load the network if it is not loaded yet.
+
+        Returns:
+            InferenceBackend: self
+        """
+        with self._load_lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+        return self
+
+    def _load(self):
+        """Load the network.
+
+        Raises:
+            NotImplementedError
+        """
+        raise NotImplementedError
+
+    @property
+    def inputs(self) -> List[TensorSpec]:
+        """Specs of the inputs of the network.
+
+        Raises:
+            NotImplementedError
+        """
+        raise NotImplementedError
+
+    @property
+    def outputs(self) -> List[TensorSpec]:
+        """Specs of the outputs of the network.
+
+        Raises:
+            NotImplementedError
+        """
+        raise NotImplementedError
+
+    def run(self, inputs: Union[np.ndarray, Dict[str, np.ndarray]]
+            ) -> List[np.ndarray]:
+        """Run the network on a batch.
+
+        Args:
+            inputs (Union[np.ndarray, Dict[str, np.ndarray]]): The batch of
+                the first input or a batch for each input name.
+
+        Raises:
+            NotImplementedError
+
+        Returns:
+            List[np.ndarray]: The outputs of the network.
+        """
+        raise NotImplementedError
+
+    def run_batch(self, inputs: Union[np.ndarray, Dict[str, np.ndarray]]
+                  ) -> List[np.ndarray]:
+        """Run the network on a batch of any size, split in chunks of up to
+        ``max_batch_size`` samples.
+
+        Args:
+            inputs (Union[np.ndarray, Dict[str, np.ndarray]]): The batch of
+                the first input or a batch for each input name.
+
+        Returns:
+            List[np.ndarray]: The outputs of the network for the whole
+                batch.
+        """
+        feeds = inputs if isinstance(inputs, dict) else {None: inputs}
+        size = len(next(iter(feeds.values())))
+        step = self.max_batch_size or size
+        if size <= step:
+            return self.run(inputs)
+        chunks = []
+        for i in range(0, size, step):
+            chunk = {k: v[i:i + step] for k, v in feeds.items()}
+            chunks.append(self.run(chunk if isinstance(inputs, dict)
+                                   else chunk[None]))
+        return [np.concatenate(outputs) for outputs in zip(*chunks)]
+
+    def _get_input(self, inputs: Union[np.ndarray, Dict[str, np.ndarray]]
+                   ) -> Dict[str, np.ndarray]:
+        """Get the batch of each input name.
+        """
+        if isinstance(inputs, dict):
+            return inputs
+        return {self.inputs[0].name: inputs}
+
+    def warmup(self, batch_size: int = 1, num_runs: int = 1,
+               shapes: Optional[Dict[str, Tuple[int, ...]]] = None):
+        """Run the network on zero inputs, so that the first predictions
+        do not pay for the lazy initializations of the runtime.
+
+        Args:
+            batch_size (int, optional): Size of the batch dimension.
+                Defaults to 1.
+            num_runs (int, optional): Number of runs. Defaults to 1.
+            shapes (Optional[Dict[str, Tuple[int, ...]]], optional): Shape
+                of the inputs with dynamic dimensions other than the batch.
+                Defaults to None.
+
+        Raises:
+            ValueError: If an input has unknown dimensions and no shape.
+        """
+        self.load()
+        shapes = shapes or {}
+        feeds = {}
+        for spec in self.inputs:
+            shape = shapes.get(spec.name)
+            if shape is None:
+                shape = (batch_size,) + tuple(spec.shape[1:])
+            if any(d is None for d in shape):
+                raise ValueError(f"The input '{spec.name}' has dynamic "
+                                 f"dimensions {spec.shape}, set its shape")
+            feeds[spec.name] = np.zeros(shape, spec.dtype)
+        for _ in range(num_runs):
+            self.run(feeds)
@@ -0,0 +1,167 @@
+import threading
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Union
+
+import numpy as np
+
+from toolbox.utils.runtime import ort_session_options
+
+from .InferenceBackend import InferenceBackend, TensorSpec
+
+_GRAPH_OPTIMIZATION_LEVELS = ("disable", "basic", "extended", "all")
+_EXECUTION_MODES = ("sequential", "parallel")
+
+# ONNX Runtime tensor types
+_DTYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int8)": np.int8,
+    "tensor(uint8)": np.uint8,
+    "tensor(int32)": np.int32,
+    "tensor(int64)": np.int64,
+    "tensor(bool)": np.bool_
+}
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """Run ONNX models with ONNX Runtime.
+    """
+
+    name = "onnxruntime"
+    formats = {".onnx": "onnx", ".ort": "ort"}
+
+    def __init__(self, *args,
+                 graph_optimization_level: Literal[
+                     "disable", "basic", "extended", "all"] = "all",
+                 execution_mode: Literal["sequential",
+                                         "parallel"] = "sequential",
+                 io_binding: bool = False,
+                 optimized_model_path: Optional[Union[str, Path]] = None,
+                 **kwargs):
+        """Create the backend.
+
+        Args:
+            *args: Arguments of ``InferenceBackend``.
+            graph_optimization_level (Literal["disable", "basic",
+                "extended", "all"], optional): Graph optimization level of
+                the session. Defaults to "all".
+            execution_mode (Literal["sequential", "parallel"], optional):
+                Run the operators of the graph sequentially or in parallel.
+                Defaults to "sequential".
+            io_binding (bool, optional): Bind the inputs to the session
+                instead of passing them on each call. Defaults to False.
+            optimized_model_path (Optional[Union[str, Path]], optional):
+                Path where the optimized graph is saved the first time the
+                model is loaded. The next loads read it and skip the graph
+                optimizations. With a ".ort" suffix it is saved in the ORT
+                format, which is used without copying its weights. None to
+                optimize the graph on each load. Defaults to None.
+            **kwargs: Keyword arguments of ``InferenceBackend``.
+
+        Raises:
+            ValueError: If ``graph_optimization_level`` or
+                ``execution_mode`` are not valid.
+        """
+        super().__init__(*args, **kwargs)
+        if graph_optimization_level not in _GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError("``graph_optimization_level`` should be one of "
+                             f"{list(_GRAPH_OPTIMIZATION_LEVELS)}")
+        if execution_mode not in _EXECUTION_MODES:
+            raise ValueError("``execution_mode`` should be one of "
+                             f"{list(_EXECUTION_MODES)}")
+        self.graph_optimization_level = graph_optimization_level
+        self.execution_mode = execution_mode
+        self.io_binding = io_binding
+        self.optimized_model_path = None if optimized_model_path is None \
+            else Path(optimized_model_path)
+
+    def _load(self):
+        import onnxruntime as ort
+
+        ort.set_default_logger_severity(3)
+        options = ort_session_options(*self.get_num_threads())
+        options.graph_optimization_level = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        }[self.graph_optimization_level]
+        options.execution_mode = {
+            "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+            "parallel": ort.ExecutionMode.ORT_PARALLEL
+        }[self.execution_mode]
+        model_path = self.model_path
+        if self.optimized_model_path is not None:
+            model_path = self._set_optimized_model(ort, options)
+        provider = "CUDAExecutionProvider" if self.use_cuda \
+            else "CPUExecutionProvider"
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=options,
+            providers=[provider]
+        )
+        self._inputs = [self._spec(i) for i in self.session.get_inputs()]
+        self._outputs = [self._spec(o) for o in self.session.get_outputs()]
+        self._output_names = [o.name for o in self._outputs]
+        self._binding = self.session.io_binding() if self.io_binding \
+            else None
+        # A binding can not be used by several threads at once
+        self._binding_lock = threading.Lock()
+
+    def _set_optimized_model(self, ort, options) -> Path:
+        """Set the session options to save the optimized model, or to load
+        it if it was already saved.
+
+        Returns:
+            Path: Path to the model to load.
+        """
+        path = self.optimized_model_path
+        is_ort = path.suffix == ".ort"
+        if path.is_file() and \
+                path.stat().st_mtime >= Path(self.model_path).stat().st_mtime:
+            options.graph_optimization_level = \
+                ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            if is_ort:
+                options.add_session_config_entry(
+                    "session.use_ort_model_bytes_directly", "1")
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        options.optimized_model_filepath = str(path)
+        if is_ort:
+            options.add_session_config_entry("session.save_model_format",
+                                             "ORT")
+        return self.model_path
+
+    @staticmethod
+    def _spec(node) -> TensorSpec:
+        shape = tuple(d if isinstance(d, int) else None for d in node.shape)
+        return TensorSpec(node.name, shape,
+                          np.dtype(_DTYPES.get(node.type, np.float32)))
+
+    @property
+    def inputs(self) -> List[TensorSpec]:
+        self.load()
+        return self._inputs
+
+    @property
+    def outputs(self) -> List[TensorSpec]:
+        self.load()
+        return self._outputs
+
+    def run(self, inputs: Union[np.ndarray, Dict[str, np.ndarray]]
+            ) -> List[np.ndarray]:
+        self.load()
+        feeds = self._get_input(inputs)
+        if self._binding is None:
+            return self.session.run(None, feeds)
+        with self._binding_lock:
+            for name, value in feeds.items():
+                self._binding.bind_cpu_input(name, value)
+            # The outputs are allocated by ONNX Runtime, their shape
+            # depends on the batch size
+            self._binding.clear_binding_outputs()
+            for name in self._output_names:
+                self._binding.bind_output(name)
+            self.session.run_with_iobinding(self._binding)
+            return self._binding.copy_outputs_to_cpu()
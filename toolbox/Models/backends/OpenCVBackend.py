@@ -0,0 +1,65 @@
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import cv2
+import numpy as np
+
+from .InferenceBackend import InferenceBackend, TensorSpec
+
+
+class OpenCVBackend(InferenceBackend):
+    """Run models with the OpenCV DNN module.
+
+    The networks have a single input, whose shape is not known. The threads
+    of OpenCV are global to the process, so they are set from the
+    ``opencv_threads`` setting of the ``runtime`` config.
+    """
+
+    name = "opencv"
+    formats = {".onnx": "onnx", ".pb": "tensorflow",
+               ".caffemodel": "caffe", ".xml": "openvino",
+               ".weights": "darknet", ".tflite": "tflite"}
+
+    def __init__(self, *args, config_path: Optional[Union[str, Path]] = None,
+                 **kwargs):
+        """Create the backend.
+
+        Args:
+            *args: Arguments of ``InferenceBackend``.
+            config_path (Optional[Union[str, Path]], optional): The network
+                description of the formats that need it (e.g. the .prototxt
+                of a Caffe model). Defaults to None.
+            **kwargs: Keyword arguments of ``InferenceBackend``.
+        """
+        super().__init__(*args, **kwargs)
+        self.config_path = config_path
+        # setInput and forward can not be used by several threads at once
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self.net = cv2.dnn.readNet(str(self.model_path),
+                                   str(self.config_path or ""))
+        if self.use_cuda:
+            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+        self._output_names = list(self.net.getUnconnectedOutLayersNames())
+
+    @property
+    def inputs(self) -> List[TensorSpec]:
+        return [TensorSpec("input", (None, None, None, None),
+                           np.dtype("float32"))]
+
+    @property
+    def outputs(self) -> List[TensorSpec]:
+        self.load()
+        return [TensorSpec(name, (), np.dtype("float32"))
+                for name in self._output_names]
+
+    def run(self, inputs: Union[np.ndarray, Dict[str, np.ndarray]]
+            ) -> List[np.ndarray]:
+        self.load()
+        batch = next(iter(self._get_input(inputs).values()))
+        with self._lock:
+            self.net.setInput(batch)
+            return list(self.net.forward(self._output_names))
@@ -0,0 +1,194 @@
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from toolbox.utils.runtime import tf_session_config
+
+from .InferenceBackend import InferenceBackend, TensorSpec
+
+
+class TensorFlowBackend(InferenceBackend):
+    """Run TensorFlow models: Keras models (.h5 files or SavedModel
+    folders), TFLite models, or TF1 checkpoints with their meta graph.
+
+    The TFLite models use the standalone TFLite runtime if it is installed.
+    Keras models are loaded in the TF1 session of the Keras backend, so a
+    process should not load several of them from different threads.
+    """
+
+    name = "tensorflow"
+    formats = {".h5": "keras", ".keras": "keras", ".tflite": "tflite",
+               ".meta": "checkpoint"}
+
+    def __init__(self, *args, input_names: Optional[List[str]] = None,
+                 output_names: Optional[List[str]] = None,
+                 feeds: Optional[Dict[str, Any]] = None,
+                 meta_path: Optional[Union[str, Path]] = None, **kwargs):
+        """Create the backend.
+
+        Args:
+            *args: Arguments of ``InferenceBackend``.
+            input_names (Optional[List[str]], optional): Names of the input
+                tensors of a "checkpoint" graph. Defaults to None.
+            output_names (Optional[List[str]], optional): Names of the output
+                tensors of a "checkpoint" graph. Defaults to None.
+            feeds (Optional[Dict[str, Any]], optional): Constant values of
+                other tensors of a "checkpoint" graph, e.g. the training
+                flag. Defaults to None.
+            meta_path (Optional[Union[str, Path]], optional): Meta graph file
+                of a "checkpoint". None to use the checkpoint path with the
+                ".meta" extension. Defaults to None.
+            **kwargs: Keyword arguments of ``InferenceBackend``.
+
+        Raises:
+            ValueError: If a "checkpoint" does not have ``input_names`` and
+                ``output_names``.
+        """
+        super().__init__(*args, **kwargs)
+        if self.model_format == "checkpoint" and \
+                (not input_names or not output_names):
+            raise ValueError("The checkpoints need ``input_names`` and "
+                             "``output_names``")
+        self.input_names = input_names
+        self.output_names = output_names
+        self.feeds = feeds or {}
+        self.meta_path = meta_path
+        # The TFLite tensors can not be used by several threads at once
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not self.use_cuda and self.model_format != "tflite":
+            os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+        if self.model_format == "keras":
+            self._load_keras()
+        elif self.model_format == "tflite":
+            self._load_tflite()
+        else:
+            self._load_checkpoint()
+
+    def _session_config(self):
+        import tensorflow as tf
+
+        intra, inter = self.get_num_threads()
+        kwargs = {}
+        if intra is not None:
+            kwargs["intra_op_parallelism_threads"] = intra
+        if inter is not None:
+            kwargs["inter_op_parallelism_threads"] = inter
+        # Prevent the allocation of all the available GPU memory
+        return tf_session_config(
+            gpu_options=tf.compat.v1.GPUOptions(allow_growth=True), **kwargs)
+
+    def _load_keras(self):
+        import tensorflow as tf
+        from tensorflow.compat.v1.keras.backend import set_session
+        from tensorflow.keras.models import load_model
+
+        self.session = tf.compat.v1.Session(config=self._session_config())
+        set_session(self.session)
+        self.model = load_model(str(self.model_path))
+        self._inputs = [self._spec(t) for t in self.model.inputs]
+        self._outputs = [self._spec(t) for t in self.model.outputs]
+
+    def _load_tflite(self):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.model = Interpreter(model_path=str(self.model_path),
+                                 num_threads=self.get_num_threads()[0])
+        self.model.allocate_tensors()
+        self._input_details = self.model.get_input_details()
+        self._output_details = self.model.get_output_details()
+        self._input_shapes = None
+
+        def spec(details):
+            # The signature has -1 on the dynamic dimensions
+            shape = details.get("shape_signature", details["shape"])
+            return TensorSpec(
+                details["name"],
+                tuple(int(d) if d >= 0 else None for d in shape),
+                np.dtype(details["dtype"]))
+
+        self._inputs = [spec(d) for d in self._input_details]
+        self._outputs = [spec(d) for d in self._output_details]
+
+    def _load_checkpoint(self):
+        import tensorflow as tf
+
+        tf.compat.v1.disable_eager_execution()
+        checkpoint = str(self.model_path.with_suffix("")) \
+            if self.model_path.suffix == ".meta" else str(self.model_path)
+        meta_path = self.meta_path or Path(checkpoint).with_suffix(".meta")
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.session = tf.compat.v1.Session(
+                graph=self.graph, config=self._session_config())
+            saver = tf.compat.v1.train.import_meta_graph(str(meta_path))
+            saver.restore(self.session, checkpoint)
+        self._input_tensors = [self.graph.get_tensor_by_name(name)
+                               for name in self.input_names]
+        self._output_tensors = [self.graph.get_tensor_by_name(name)
+                                for name in self.output_names]
+        self._feeds = {self.graph.get_tensor_by_name(name): value
+                       for name, value in self.feeds.items()}
+        self._inputs = [self._spec(t) for t in self._input_tensors]
+        self._outputs = [self._spec(t) for t in self._output_tensors]
+
+    @staticmethod
+    def _spec(tensor) -> TensorSpec:
+        shape = tensor.shape
+        shape = tuple(shape.as_list()) if shape.rank is not None else ()
+        return TensorSpec(tensor.name, shape,
+                          np.dtype(tensor.dtype.as_numpy_dtype))
+
+    @property
+    def inputs(self) -> List[TensorSpec]:
+        self.load()
+        return self._inputs
+
+    @property
+    def outputs(self) -> List[TensorSpec]:
+        self.load()
+        return self._outputs
+
+    def _run_tflite(self, feeds: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        """Run the TFLite interpreter, resizing its input tensors if the
+        batch size changes.
+        """
+        with self._lock:
+            shapes = [feeds[d["name"]].shape for d in self._input_details]
+            if self._input_shapes != shapes:
+                for details, shape in zip(self._input_details, shapes):
+                    self.model.resize_tensor_input(details["index"], shape)
+                self.model.allocate_tensors()
+                self._input_shapes = shapes
+            for details in self._input_details:
+                self.model.set_tensor(details["index"],
+                                      feeds[details["name"]])
+            self.model.invoke()
+            return [self.model.get_tensor(d["index"]).copy()
+                    for d in self._output_details]
+
+    def run(self, inputs: Union[np.ndarray, Dict[str, np.ndarray]]
+            ) -> List[np.ndarray]:
+        self.load()
+        feeds = self._get_input(inputs)
+        if self.model_format == "tflite":
+            return self._run_tflite(feeds)
+        if self.model_format == "keras":
+            batch = [feeds[spec.name] for spec in self._inputs]
+            outputs = self.model.predict_on_batch(
+                batch[0] if len(batch) == 1 else batch)
+            if not isinstance(outputs, (list, tuple)):
+                outputs = [outputs]
+            return [np.asarray(out) for out in outputs]
+        feed_dict = dict(self._feeds)
+        for spec, tensor in zip(self._inputs, self._input_tensors):
+            feed_dict[tensor] = feeds[spec.name]
+        return self.session.run(self._output_tensors, feed_dict=feed_dict)
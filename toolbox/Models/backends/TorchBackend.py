@@ -0,0 +1,107 @@
+from typing import Any, Dict, List, Optional, Set, Union
+
+import numpy as np
+
+from toolbox.utils.runtime import configure_torch
+
+from .InferenceBackend import InferenceBackend, TensorSpec
+
+
+class TorchBackend(InferenceBackend):
+    """Run TorchScript models, or modules created in Python, with PyTorch.
+
+    The threads of PyTorch are global to the process, so they are only set
+    from the ``torch`` section of the ``runtime`` config.
+    """
+
+    name = "torch"
+    formats = {".pt": "torchscript", ".pth": "torchscript",
+               ".torchscript": "torchscript"}
+
+    def __init__(self, *args, module: Optional[Any] = None,
+                 inputs: Optional[List[TensorSpec]] = None,
+                 channels_last: bool = False, **kwargs):
+        """Create the backend.
+
+        Args:
+            *args: Arguments of ``InferenceBackend``.
+            module (Optional[torch.nn.Module], optional): A module to run
+                instead of loading a TorchScript file. Defaults to None.
+            inputs (Optional[List[TensorSpec]], optional): Specs of the
+                inputs, as the modules do not store them. None for a single
+                float32 input of unknown shape. Defaults to None.
+            channels_last (bool, optional): Pass the 4D inputs in the
+                channels_last memory format. Defaults to False.
+            **kwargs: Keyword arguments of ``InferenceBackend``.
+        """
+        if module is not None:
+            kwargs.setdefault("model_format", "module")
+        super().__init__(*args, **kwargs)
+        self.module = module
+        self.channels_last = channels_last
+        self._inputs = inputs or [
+            TensorSpec("input", (None, None, None, None), np.dtype("float32"))
+        ]
+
+    def _load(self):
+        import torch
+
+        configure_torch()
+        self.device = torch.device("cuda" if self.use_cuda else "cpu")
+        if self.module is None:
+            self.module = torch.jit.load(str(self.model_path),
+                                         map_location=self.device)
+        self.module = self.module.to(self.device).eval()
+        # torch < 1.9 does not have inference_mode
+        self._inference_mode = getattr(torch, "inference_mode",
+                                       torch.no_grad)
+
+    @property
+    def supported_formats(self) -> Set[str]:
+        # Modules created in Python do not have a weights file
+        return super().supported_formats | {"module"}
+
+    @property
+    def inputs(self) -> List[TensorSpec]:
+        return self._inputs
+
+    @property
+    def outputs(self) -> List[TensorSpec]:
+        # The outputs of the modules are only known when they are run
+        return []
+
+    def forward(self, *tensors) -> Any:
+        """Run the module on tensors of the backend device.
+
+        Args:
+            *tensors (torch.Tensor): The inputs of the module.
+
+        Returns:
+            Any: The outputs of the module, kept on the device.
+        """
+        self.load()
+        if self.channels_last:
+            import torch
+            tensors = tuple(
+                t.contiguous(memory_format=torch.channels_last)
+                if t.dim() == 4 else t for t in tensors)
+        with self._inference_mode():
+            return self.module(*tensors)
+
+    def run(self, inputs: Union[np.ndarray, Dict[str, np.ndarray]]
+            ) -> List[np.ndarray]:
+        import torch
+
+        self.load()
+        feeds = self._get_input(inputs)
+        tensors = [
+            torch.from_numpy(np.ascontiguousarray(feeds[spec.name]))
+            .to(self.device)
+            for spec in self.inputs
+        ]
+        outputs = self.forward(*tensors)
+        if isinstance(outputs, dict):
+            outputs = list(outputs.values())
+        elif not isinstance(outputs, (list, tuple)):
+            outputs = [outputs]
+        return [out.cpu().numpy() for out in outputs]
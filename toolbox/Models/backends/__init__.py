@@ -0,0 +1,58 @@
+import importlib
+from pathlib import Path
+from typing import Optional, Union
+
+from .InferenceBackend import InferenceBackend, TensorSpec
+
+# Backend names to their module and class. The modules are imported when the
+# backend is created, so only the used runtimes are loaded.
+_BACKENDS = {
+    "onnxruntime": (".OnnxRuntimeBackend", "OnnxRuntimeBackend"),
+    "torch": (".TorchBackend", "TorchBackend"),
+    "tensorflow": (".TensorFlowBackend", "TensorFlowBackend"),
+    "opencv": (".OpenCVBackend", "OpenCVBackend")
+}
+
+
+def get_backend_class(name: str) -> type:
+    """Get the class of a backend.
+
+    Args:
+        name (str): Name of the backend, one of "onnxruntime", "torch",
+            "tensorflow" or "opencv".
+
+    Raises:
+        ValueError: If the backend does not exist.
+
+    Returns:
+        type: The ``InferenceBackend`` subclass.
+    """
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', it should be one of "
+                         f"{list(_BACKENDS)}")
+    module_name, class_name = _BACKENDS[name]
+    module = importlib.import_module(module_name, __name__)
+    return getattr(module, class_name)
+
+
+def create_backend(name: str,
+                   model_path: Optional[Union[str, Path]] = None,
+                   **kwargs) -> InferenceBackend:
+    """Create a backend by its name. The network is not loaded until
+    ``load`` is called or it is first run.
+
+    Args:
+        name (str): Name of the backend, one of "onnxruntime", "torch",
+            "tensorflow" or "opencv".
+        model_path (Optional[Union[str, Path]], optional): Path to the
+            weights file. Defaults to None.
+        **kwargs: Other arguments of the backend class.
+
+    Raises:
+        ValueError: If the backend does not exist or can not load the
+            weights format.
+
+    Returns:
+        InferenceBackend: The backend.
+    """
+    return get_backend_class(name)(model_path, **kwargs)
@@ -1,13 +1,15 @@
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 
 import numpy as np
+import torch
 from detectron2.config import get_cfg
 from detectron2.data import MetadataCatalog
 from detectron2.engine.defaults import DefaultPredictor
 
 from toolbox.Structures import BoundingBox, Instance, SegmentationMask
 from toolbox.Structures.Keypoints import COCOKeypoints
+from toolbox.utils.runtime import configure_torch
 
 
 class Detectron2:
@@ -20,7 +22,9 @@ class Detectron2:
     def __init__(self, model_config: Path,
                  model_weights: Optional[str] = None,
                  confidence_threshold: Optional[float] = 0.5,
-                 use_cuda: bool = False):
+                 use_cuda: bool = False,
+                 classes: Optional[List[Union[str, int]]] = None,
+                 max_batch_size: int = 4):
         """Create and load a detectron2 model.
 
         Args:
@@ -31,10 +35,22 @@ class Detectron2:
                 detection confidence of the instances. Defaults to 0.5.
             use_cuda (bool, optional): Execute the model on a CUDA device.
                 Defaults to False.
+            classes (Optional[List[Union[str, int]]], optional): Names or ids
+                of the classes to return. None to return all the classes.
+                Defaults to None.
+            max_batch_size (int, optional): Maximum number of images run in
+                one forward pass by ``predict_batch``. Defaults to 4.
+
+        Raises:
+            ValueError: If a class of ``classes`` is not a class of the
+                model dataset.
         """
-        self._setup_cfg(model_config, model_weights, use_cuda)
-        self._predictor = DefaultPredictor(self.cfg)
+        configure_torch()
         self._conf_thr = confidence_threshold
+        self._setup_cfg(model_config, model_weights, use_cuda,
+                        confidence_threshold)
+        self._predictor = DefaultPredictor(self.cfg)
+        self._max_batch_size = max(max_batch_size, 1)
 
         self._dataset_metadata = MetadataCatalog.get(
             self.cfg.DATASETS.TEST[0]
@@ -43,24 +59,89 @@ class Detectron2:
         )
         self.dataset_classes = self._dataset_metadata.get(
             "thing_classes", None)
+        self._class_ids = self._get_class_ids(classes)
 
-    def predict(self, image: np.ndarray) -> List[Instance]:
-        """Predict an image.
+    def _get_class_ids(self, classes: Optional[List[Union[str, int]]]
+                       ) -> Optional[List[int]]:
+        """Convert a list of class names or ids to a list of class ids.
+
+        Args:
+            classes (Optional[List[Union[str, int]]]): Class names or ids.
+
+        Raises:
+            ValueError: If a class name is not a class of the model dataset.
+
+        Returns:
+            Optional[List[int]]: The class ids or None if ``classes`` is None.
+        """
+        if classes is None:
+            return None
+        class_ids = []
+        for c in classes:
+            if isinstance(c, int):
+                class_ids.append(c)
+            elif self.dataset_classes is not None and \
+                    c in self.dataset_classes:
+                class_ids.append(self.dataset_classes.index(c))
+            else:
+                raise ValueError(f"Unknown class: {c}")
+        return class_ids
+
+    def _prepare_input(self, image: np.ndarray) -> Dict:
+        """Create the model input of an image, as ``DefaultPredictor`` does.
 
         Args:
             image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
 
         Returns:
-            List[Instance]: List of instances, depending on the model it will
-                have the following fields:
-                - confidence (float): The confidence level of the detection.
-                - label (str): Predicted label string.
-                - label_id (int): Id of the predicted label.
-                - bounding_box (BoundingBox): A bounding box of the object.
-                - mask (SegmentationMask): A segmentation mask of the object.
-                - keypoints (COCOKeypoints): Person keypoints.
+            Dict: A dict with the transformed "image" tensor (3, H, W) and
+                the original "height" and "width".
         """
-        predictions = self._predictor(image)
+        if self._predictor.input_format == "RGB":
+            image = image[:, :, ::-1]
+        height, width = image.shape[:2]
+        image = self._predictor.aug.get_transform(image).apply_image(image)
+        image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+        return {"image": image, "height": height, "width": width}
+
+    def _filter_instances(self, det_instances):
+        """Discard the detections below the confidence threshold or whose
+        class is not in the allowed classes, before moving their masks and
+        keypoints to the CPU.
+
+        Args:
+            det_instances (detectron2.structures.Instances): The predicted
+                instances of an image.
+
+        Returns:
+            detectron2.structures.Instances: The kept instances.
+        """
+        keep = None
+        if self._conf_thr is not None and det_instances.has("scores"):
+            keep = det_instances.scores >= self._conf_thr
+        if self._class_ids is not None and det_instances.has("pred_classes"):
+            class_ids = torch.as_tensor(
+                self._class_ids, device=det_instances.pred_classes.device)
+            class_keep = (det_instances.pred_classes[:, None] ==
+                          class_ids[None, :]).any(dim=1)
+            keep = class_keep if keep is None else keep & class_keep
+        return det_instances if keep is None else det_instances[keep]
+
+    def _create_instances(self, image: np.ndarray, predictions: Dict
+                          ) -> List[Instance]:
+        """Create the output Instances of an image from the model
+        predictions.
+
+        Args:
+            image (np.ndarray): The input image.
+            predictions (Dict): The model output of the image.
+
+        Returns:
+            List[Instance]: The predicted instances.
+        """
+        if "instances" not in predictions:
+            return []
+        det_instances = self._filter_instances(predictions["instances"])
 
         boxes = None
         scores = None
@@ -68,69 +149,109 @@ class Detectron2:
         labels = None
         keypoints = None
         masks = None
+
+        # Convert tensors to numpy arrays
+        if det_instances.has("scores"):
+            scores = det_instances.scores.cpu().numpy()
+        if det_instances.has("pred_boxes"):
+            boxes = det_instances.pred_boxes.tensor.cpu().numpy()
+        if det_instances.has("pred_classes"):
+            labels_id = det_instances.pred_classes.tolist()
+            labels = self._create_text_labels(labels_id)
+        if det_instances.has("pred_keypoints"):
+            keypoints = det_instances.pred_keypoints.cpu().numpy()
+        if det_instances.has("pred_masks"):
+            # Encode the masks on the device, without copying them to numpy
+            masks = SegmentationMask.from_tensors(det_instances.pred_masks)
+
+        # Parse the detection results
         ret_instances = []
+        for i in range(len(det_instances)):
+            ins = Instance()
 
-        if "instances" in predictions:
-
-            # Convert tensors to numpy arrays
-            det_instances = predictions["instances"]
-            if det_instances.has("scores"):
-                scores = det_instances.scores.cpu().numpy()
-            if det_instances.has("pred_boxes"):
-                boxes = det_instances.pred_boxes.tensor.cpu().numpy()
-            if det_instances.has("pred_classes"):
-                labels_id = det_instances.pred_classes.tolist()
-                labels = self._create_text_labels(labels_id)
-            if det_instances.has("pred_keypoints"):
-                keypoints = det_instances.pred_keypoints.cpu().numpy()
-            if det_instances.has("pred_masks"):
-                masks = np.asarray(det_instances.pred_masks.cpu().numpy())
-
-            # Parse the detection results
-            for i in range(len(det_instances)):
-                ins = Instance()
-
-                # Confidence
-                if scores is not None:
-                    if scores[i] < self._conf_thr:
-                        continue
-                    ins.set("confidence", scores[i])
-
-                # Classification
-                if labels_id is not None:
-                    ins.set("label_id", labels_id[i])
-                    ins.set("label", labels[i])
-
-                # Bounding boxes
-                if boxes is not None:
-                    ins.set(
-                        "bounding_box",
-                        BoundingBox.from_absolute(
-                            boxes[i][0],
-                            boxes[i][1],
-                            boxes[i][2],
-                            boxes[i][3],
-                            image_width=image.shape[1],
-                            image_height=image.shape[0]
-                        )
+            # Confidence
+            if scores is not None:
+                ins.set("confidence", scores[i])
+
+            # Classification
+            if labels_id is not None:
+                ins.set("label_id", labels_id[i])
+                ins.set("label", labels[i])
+
+            # Bounding boxes
+            if boxes is not None:
+                ins.set(
+                    "bounding_box",
+                    BoundingBox.from_absolute(
+                        boxes[i][0],
+                        boxes[i][1],
+                        boxes[i][2],
+                        boxes[i][3],
+                        image_width=image.shape[1],
+                        image_height=image.shape[0]
                     )
+                )
 
-                # Segmentation mask
-                if masks is not None:
-                    ins.set("mask", SegmentationMask(masks[i]))
+            # Segmentation mask
+            if masks is not None:
+                ins.set("mask", masks[i])
 
-                # Keypoints
-                if keypoints is not None:
-                    ins.set("keypoints", COCOKeypoints.from_absolute_keypoints(
-                        keypoints[i],
-                        image.shape[1],
-                        image.shape[0]
-                    ))
+            # Keypoints
+            if keypoints is not None:
+                ins.set("keypoints", COCOKeypoints.from_absolute_keypoints(
+                    keypoints[i],
+                    image.shape[1],
+                    image.shape[0]
+                ))
 
-                ret_instances.append(ins)
+            ret_instances.append(ins)
 
         return ret_instances
 
+    def predict(self, image: np.ndarray) -> List[Instance]:
+        """Predict an image.
+
+        Args:
+            image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
+
+        Returns:
+            List[Instance]: List of instances, depending on the model it will
+                have the following fields:
+                - confidence (float): The confidence level of the detection.
+                - label (str): Predicted label string.
+                - label_id (int): Id of the predicted label.
+                - bounding_box (BoundingBox): A bounding box of the object.
+                - mask (SegmentationMask): A segmentation mask of the object.
+                - keypoints (COCOKeypoints): Person keypoints.
+        """
+        predictions = self._predictor(image)
+        return self._create_instances(image, predictions)
+
+    def predict_batch(self, images: List[np.ndarray]
+                      ) -> List[List[Instance]]:
+        """Predict multiple images. The images are run in batches of up to
+        ``max_batch_size`` images in one forward pass.
+
+        Args:
+            images (List[np.ndarray]): A list of BGR uint8 images of shape
+                (H, W, 3).
+
+        Returns:
+            List[List[Instance]]: The instances of each image, with the same
+                fields as ``predict``.
+        """
+        results = []
+        for i in range(0, len(images), self._max_batch_size):
+            chunk = images[i:i + self._max_batch_size]
+            inputs = [self._prepare_input(image) for image in chunk]
+            with torch.no_grad():
+                predictions = self._predictor.model(inputs)
+            results.extend(
+                self._create_instances(image, pred)
+                for image, pred in zip(chunk, predictions)
+            )
+        return results
+
     def _create_text_labels(self, classes: List[int]) -> List[str]:
         """Convert a list of class IDs to a list of class names using the
         dataset metadata. If the class names are not available, a string of the
@@ -148,7 +269,8 @@ class Detectron2:
             return [str(i) for i in classes]
 
     def _setup_cfg(self, config_path: Path,
-                   model_weights: Optional[str] = None, use_cuda: bool = False):
+                   model_weights: Optional[str] = None, use_cuda: bool = False,
+                   confidence_threshold: Optional[float] = None):
         """Create the model cfg.
 
         Args:
@@ -157,6 +279,10 @@ class Detectron2:
                 the model weights file. Defaults to None.
             use_cuda (bool, optional): Execute the model on a CUDA device.
                 Defaults to False.
+            confidence_threshold (Optional[float], optional): Minimum
+                detection confidence. It is set as the test score threshold
+                of the model heads, so the masks and keypoints of the
+                discarded detections are not predicted. Defaults to None.
         """
         self.cfg = get_cfg()
         self.cfg.merge_from_file(str(config_path))
@@ -166,4 +292,10 @@ class Detectron2:
             self.cfg.MODEL.DEVICE = "cuda"
         else:
             self.cfg.MODEL.DEVICE = "cpu"
+        if confidence_threshold is not None:
+            for head in ("ROI_HEADS", "RETINANET"):
+                head_cfg = self.cfg.MODEL.get(head)
+                if head_cfg is not None and "SCORE_THRESH_TEST" in head_cfg:
+                    head_cfg.SCORE_THRESH_TEST = max(
+                        head_cfg.SCORE_THRESH_TEST, confidence_threshold)
         self.cfg.freeze()
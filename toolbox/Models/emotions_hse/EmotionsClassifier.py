@@ -1,39 +1,66 @@
-import os
 from pathlib import Path
-from typing import List, Union
+from typing import List, Literal, Optional, Union
 
 import cv2
 import numpy as np
-import tensorflow as tf
-from tensorflow.compat.v1.keras.backend import set_session
-from tensorflow.keras.models import load_model
 
+from toolbox.Models.backends import create_backend
 from toolbox.Structures import Emotion, Instance
 
+# Names of the backends of previous versions, to the backend name and the
+# weights format
+_BACKEND_ALIASES = {
+    "keras": ("tensorflow", "keras"),
+    "tflite": ("tensorflow", "tflite")
+}
+
 
 class EmotionsClassifier:
     """Perform classification of emotions on face images.
     """
 
-    def __init__(self, model_path: Path, use_cuda: bool = False):
+    def __init__(self, model_path: Path, use_cuda: bool = False,
+                 backend: Literal["keras", "onnxruntime", "tflite"] = "keras",
+                 max_batch_size: int = 32,
+                 num_threads: Optional[int] = None,
+                 backend_options: Optional[dict] = None):
         """Load the emotions classifier.
 
         Args:
-            model_path (Path): Path to the .h5 model file.
+            model_path (Path): Path to the model file: a .h5 file for the
+                "keras" backend, a .onnx file for the "onnxruntime" backend
+                or a .tflite file for the "tflite" backend. The .onnx and
+                .tflite files can be created with
+                ``toolbox/tools/convert_emotions_hse.py``.
             use_cuda (bool, optional): If True, execute the model on
-                a CUDA device. Defaults to False.
+                a CUDA device. Not supported by the "tflite" backend.
+                Defaults to False.
+            backend (Literal["keras", "onnxruntime", "tflite"], optional):
+                Run the model with TensorFlow Keras, ONNX Runtime or the
+                TFLite interpreter. The other backends, e.g. "opencv", can
+                also be used. Defaults to "keras".
+            max_batch_size (int, optional): Maximum number of images run in
+                one forward pass. Larger inputs are split in chunks.
+                Defaults to 32.
+            num_threads (Optional[int], optional): Number of threads used by
+                the backend to run each operator. None to use the runtime
+                config. Defaults to None.
+            backend_options (Optional[dict], optional): Other arguments of
+                the backend. Defaults to None.
+
+        Raises:
+            ValueError: If ``backend`` is not a valid backend or can not load
+                the model file.
         """
-        if not use_cuda:
-            os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
-
-        # Prevent the allocation of all the available GPU memory
-        gpu_options = tf.compat.v1.GPUOptions(allow_growth=True)
-        self._session = tf.compat.v1.Session(
-            config=tf.compat.v1.ConfigProto(gpu_options=gpu_options)
-        )
-
-        set_session(self._session)
-        self._model = load_model(str(model_path))
+        backend_options = dict(backend_options or {})
+        if backend in _BACKEND_ALIASES:
+            backend, model_format = _BACKEND_ALIASES[backend]
+            backend_options.setdefault("model_format", model_format)
+        backend_options.setdefault("intra_op_threads", num_threads)
+        self._model = create_backend(
+            backend, model_path, use_cuda=use_cuda,
+            max_batch_size=max(max_batch_size, 1), **backend_options
+        ).load()
 
         self.idx_to_class = {
             0: Emotion.ANGER,
@@ -68,6 +95,18 @@ class EmotionsClassifier:
         batch[..., 2] -= 123.68
         return batch
 
+    def _run_model(self, batch: np.ndarray) -> np.ndarray:
+        """Run the model on chunks of up to ``max_batch_size`` images.
+
+        Args:
+            batch (np.ndarray): A preprocessed batch of shape
+                (B, 224, 224, 3).
+
+        Returns:
+            np.ndarray: The probabilities of each emotion of shape (B, 7).
+        """
+        return self._model.run_batch(batch)[0]
+
     def predict(self, images: Union[List[np.ndarray], np.ndarray]
                 ) -> List[Instance]:
         """Predict the emotion of a face image.
@@ -79,10 +118,12 @@ class EmotionsClassifier:
         Returns:
             List[Instance]: List of Instances with an "emotion" field storing
                 a ``Emotion`` enum and a "confidence" field storing the
-                classification confidence. 
+                classification confidence.
         """
         batch = self._preprocess_image(images)
-        output = self._model.predict(batch)
+        if len(batch) == 0:
+            return []
+        output = self._run_model(batch)
         instances = []
         for out in output:
             emotion_id = np.argmax(out)
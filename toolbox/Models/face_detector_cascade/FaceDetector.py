@@ -0,0 +1,239 @@
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from toolbox.Structures import Instance
+from toolbox.utils.nms import box_iou
+from toolbox.utils.utils import get_logger
+
+logger = get_logger("toolbox.FaceDetectorCascade")
+
+
+class FaceDetector:
+    """Cascade of a light and a heavy face detector.
+
+    Each image is first predicted by the light detector (e.g. UltraFace or
+    RetinaFace mobile0.25). Its detections with a confidence above the
+    upper bound of ``uncertainty_band`` are accepted. If it finds a
+    candidate inside the band, the image is predicted again by the heavy
+    detector (e.g. RetinaFace resnet50) and its detections are returned.
+    Images without faces or with only confident ones do not run the heavy
+    detector.
+
+    A fraction ``sampling_rate`` of the other images is also sent to the
+    heavy detector. These sampled images measure the faces that the light
+    detector misses, which are reported by ``get_stats`` with the share of
+    images resolved by each stage.
+
+    Example:
+
+    .. code-block:: python
+
+        detector = FaceDetector(
+            light_model={"model_name": "face_detector_ultraface",
+                         "params": {"model_path": "version-RFB-320.onnx",
+                                    "input_size": [320, 240]}},
+            heavy_model={"model_name": "face_detector_retinaface",
+                         "params": {"weights_path": "Resnet50_Final.pth",
+                                    "model_name": "resnet50"}},
+            uncertainty_band=(0.3, 0.9))
+        instances = detector.predict(image)
+    """
+
+    def __init__(self, light_model: dict, heavy_model: dict,
+                 uncertainty_band: Tuple[float, float] = (0.3, 0.9),
+                 sampling_rate: float = 0.0, iou_threshold: float = 0.5,
+                 stats_interval: Optional[int] = None):
+        """Create the cascade and load its detectors.
+
+        Args:
+            light_model (dict): ``model_name`` and ``params`` of the light
+                face detector of ``model_catalog``. Its
+                ``confidence_threshold`` is set to the lower bound of
+                ``uncertainty_band``.
+            heavy_model (dict): ``model_name`` and ``params`` of the heavy
+                face detector of ``model_catalog``.
+            uncertainty_band (Tuple[float, float], optional): Confidence
+                range of the light detections that are sent to the heavy
+                detector. The light detections below it are discarded and
+                the ones above it are accepted. Defaults to (0.3, 0.9).
+            sampling_rate (float, optional): Fraction of the images that
+                are sent to the heavy detector even if the light one is
+                confident. They are evenly spaced, e.g. one of each 100
+                images with 0.01. Defaults to 0.0.
+            iou_threshold (float, optional): Minimum IoU of a heavy
+                detection with a light one to be counted as found by the
+                light detector in the sampled images. Defaults to 0.5.
+            stats_interval (Optional[int], optional): Log the stats every
+                ``stats_interval`` images. None to not log them.
+                Defaults to None.
+
+        Raises:
+            ValueError: If ``uncertainty_band`` is not an increasing range
+                of confidences or ``sampling_rate`` is not between 0 and 1.
+        """
+        from toolbox.Models import model_catalog
+
+        low, high = uncertainty_band
+        if not 0 <= low <= high <= 1:
+            raise ValueError("``uncertainty_band`` should be a (low, high) "
+                             "range with 0 <= low <= high <= 1")
+        if not 0 <= sampling_rate <= 1:
+            raise ValueError("``sampling_rate`` should be between 0 and 1")
+        self._low = low
+        self._high = high
+        self._sampling_rate = sampling_rate
+        self._iou_threshold = iou_threshold
+        self._stats_interval = stats_interval
+
+        light_params = {**light_model["params"], "confidence_threshold": low}
+        self._light = model_catalog[light_model["model_name"]](
+            **light_params)
+        self._heavy = model_catalog[heavy_model["model_name"]](
+            **heavy_model["params"])
+
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the counters of ``get_stats``.
+        """
+        with self._lock:
+            self._num_images = 0
+            self._num_uncertain = 0
+            self._num_sampled = 0
+            self._sampled_faces = 0
+            self._sampled_missed = 0
+
+    def get_stats(self) -> dict:
+        """Get the counters of the predicted images. With worker processes,
+        each worker has its own counters.
+
+        Returns:
+            dict: A dict with the following keys:
+                - images (int): Number of predicted images.
+                - light (int): Images resolved by the light detector.
+                - uncertain (int): Images sent to the heavy detector because
+                    of an uncertain light detection.
+                - sampled (int): Images sent to the heavy detector by the
+                    sampling.
+                - light_rate (float): Fraction of the images resolved by the
+                    light detector.
+                - heavy_rate (float): Fraction of the images predicted by
+                    the heavy detector.
+                - sampled_miss_rate (Optional[float]): Fraction of the faces
+                    detected by the heavy detector on the sampled images that
+                    the light detector did not find confidently. None if
+                    there are no such faces yet.
+        """
+        with self._lock:
+            images = self._num_images
+            heavy = self._num_uncertain + self._num_sampled
+            return {
+                "images": images,
+                "light": images - heavy,
+                "uncertain": self._num_uncertain,
+                "sampled": self._num_sampled,
+                "light_rate": (images - heavy) / images if images else 0.0,
+                "heavy_rate": heavy / images if images else 0.0,
+                "sampled_miss_rate": (
+                    self._sampled_missed / self._sampled_faces
+                    if self._sampled_faces else None)
+            }
+
+    def _is_sampled(self) -> bool:
+        """Check if the next image is sampled. The lock must be held.
+        """
+        n = self._num_images
+        return int((n + 1) * self._sampling_rate) > \
+            int(n * self._sampling_rate)
+
+    def _count_missed(self, confident: List[Instance],
+                      heavy: List[Instance]) -> int:
+        """Count the heavy detections without a confident light detection
+        that overlaps them.
+        """
+        if not heavy:
+            return 0
+        if not confident:
+            return len(heavy)
+        iou = box_iou(
+            np.array([i.bounding_box.get_xyxy() for i in heavy]),
+            np.array([i.bounding_box.get_xyxy() for i in confident])
+        )
+        return int((iou.max(axis=1) < self._iou_threshold).sum())
+
+    def _predict_heavy(self, images: List[np.ndarray]
+                       ) -> List[List[Instance]]:
+        if not images:
+            return []
+        if hasattr(self._heavy, "predict_batch"):
+            return self._heavy.predict_batch(images)
+        return [self._heavy.predict(image) for image in images]
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[List[Instance]]:
+        """Detect faces on multiple images. The images that need the heavy
+        detector are predicted together.
+
+        Args:
+            images (List[np.ndarray]): A list of BGR uint8 images of shape
+                (H, W, 3).
+
+        Returns:
+            List[List[Instance]]: The detected faces of each image, with the
+                fields of the detector that resolved it (at least
+                ``bounding_box`` and ``confidence``).
+        """
+        if hasattr(self._light, "predict_batch"):
+            results = self._light.predict_batch(images)
+        else:
+            results = [self._light.predict(image) for image in images]
+
+        uncertain = []
+        sampled = []
+        confident = {}
+        log_stats = False
+        with self._lock:
+            for i, instances in enumerate(results):
+                if any(ins.confidence < self._high for ins in instances):
+                    uncertain.append(i)
+                    self._num_uncertain += 1
+                elif self._is_sampled():
+                    sampled.append(i)
+                    confident[i] = instances
+                    self._num_sampled += 1
+                self._num_images += 1
+                if self._stats_interval and \
+                        self._num_images % self._stats_interval == 0:
+                    log_stats = True
+
+        # The other images only have confident light detections
+        escalated = uncertain + sampled
+        heavy = self._predict_heavy([images[i] for i in escalated])
+        for i, instances in zip(escalated, heavy):
+            results[i] = instances
+
+        if sampled:
+            missed = sum(self._count_missed(confident[i], results[i])
+                         for i in sampled)
+            faces = sum(len(results[i]) for i in sampled)
+            with self._lock:
+                self._sampled_faces += faces
+                self._sampled_missed += missed
+        if log_stats:
+            logger.info(f"Cascade stats: {self.get_stats()}")
+        return results
+
+    def predict(self, image: np.ndarray) -> List[Instance]:
+        """Detect faces on an image.
+
+        Args:
+            image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
+
+        Returns:
+            List[Instance]: The detected faces, with the fields of the
+                detector that resolved the image (at least ``bounding_box``
+                and ``confidence``).
+        """
+        return self.predict_batch([image])[0]
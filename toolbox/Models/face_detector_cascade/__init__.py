@@ -0,0 +1 @@
+from .FaceDetector import FaceDetector
@@ -1,17 +1,23 @@
+import hashlib
+import pickle
+from collections import OrderedDict
 from pathlib import Path
-from typing import Literal, Optional
+from typing import List, Literal, Optional, Tuple
 
 import cv2
 import numpy as np
 import torch
 import torch.nn as nn
 
+from toolbox.Models.backends import create_backend
+from toolbox.Models.backends.TorchBackend import TorchBackend
 from toolbox.Structures import BoundingBox, Instance
+from toolbox.utils.nms import nms
+from toolbox.utils.runtime import configure_torch
 
 from .box_utils import decode, decode_landm
 from .config import cfg_mnet, cfg_re50
 from .prior_box import PriorBox
-from .py_cpu_nms import py_cpu_nms
 from .retinaface import RetinaFace
 
 
@@ -27,12 +33,24 @@ class FaceDetector:
         landmarks: bool = False,
         nms_threshold: Optional[float] = 0.4,
         max_input_size: Optional[int] = None,
-        use_cuda: bool = False
+        use_cuda: bool = False,
+        priors_cache_size: int = 16,
+        top_k: Optional[int] = 5000,
+        batch_size: int = 8,
+        bucket_stride: int = 128,
+        backend: Literal["torch", "onnx"] = "torch",
+        num_threads: Optional[int] = None,
+        optimize: bool = False,
+        optimized_cache_dir: Optional[Path] = None,
+        backend_options: Optional[dict] = None
     ):
         """Create the face detector.
 
         Args:
-            weights_path (Path): Path to the model weights file.
+            weights_path (Path): Path to the model weights file. A .pth file
+                for the "torch" backend or a .onnx file exported with
+                ``toolbox/tools/export_retinaface_onnx.py`` for the "onnx"
+                backend.
             model_name (Literal["mobile0.25", "resnet50"]): The model backbone
                 name. One of "mobile0.25" or "resnet50".
             confidence_threshold (float, optional): The minimum detection
@@ -46,17 +64,51 @@ class FaceDetector:
                 image larger side. If None it is ignored. Defaults to None. 
             use_cuda (bool, optional): Run the model on a CUDA device.
                 Defaults to False.
+            priors_cache_size (int, optional): Maximum number of input
+                resolutions whose prior boxes are kept in memory. 0 to disable
+                the cache. Defaults to 16.
+            top_k (Optional[int], optional): Maximum number of boxes, with the
+                highest scores, that are decoded and passed to the NMS. None
+                to keep all the boxes above the confidence threshold.
+                Defaults to 5000.
+            batch_size (int, optional): Maximum number of images per forward
+                pass in ``predict_batch``. Defaults to 8.
+            bucket_stride (int, optional): The images of ``predict_batch`` are
+                grouped and padded to sizes multiple of this value.
+                Defaults to 128.
+            backend (Literal["torch", "onnx"], optional): Run the model with
+                PyTorch or with ONNX Runtime. The name of another backend
+                that can run the exported model, e.g. "opencv", can also be
+                used. Defaults to "torch".
+            num_threads (Optional[int], optional): Number of threads used by
+                the ONNX Runtime session to run each operator. None to use the
+                runtime config. Defaults to None.
+            optimize (bool, optional): Trace and freeze the torch model at load
+                time, folding the batch norms into the convolutions, and run it
+                with channels_last tensors. Only used by the "torch" backend.
+                Defaults to False.
+            optimized_cache_dir (Optional[Path], optional): Folder where the
+                optimized model is saved, so later starts with the same
+                weights skip the tracing. None to disable the cache.
+                Defaults to None.
+            backend_options (Optional[dict], optional): Other arguments of
+                the backend of the exported model. Defaults to None.
 
         Raises:
             ValueError: If ``model_name`` is not one of "mobile0.25" or
-                "resnet50".
+                "resnet50", or ``backend`` is not a valid backend.
         """
         torch.set_grad_enabled(False)
 
         self._confidence_threshold = confidence_threshold
         self._parse_landmarks = landmarks
         self._nms_threshold = nms_threshold
+        self._top_k = top_k
         self._max_input_size = max_input_size
+        self._priors_cache_size = priors_cache_size
+        self._priors_cache = OrderedDict()
+        self._batch_size = batch_size
+        self._bucket_stride = bucket_stride
 
         if model_name == "mobile0.25":
             self._cfg = cfg_mnet
@@ -66,11 +118,104 @@ class FaceDetector:
             raise ValueError("``model_name`` should be one of 'mobile0.25' "
                              "or 'resnet50'")
 
-        self._net = RetinaFace(cfg=self._cfg, phase="test")
-        self._net = self._load_model(self._net, weights_path, use_cuda)
-        self._net.eval()
-        self._device = torch.device("cuda" if use_cuda else "cpu")
-        self._net = self._net.to(self._device)
+        self._backend = backend
+        self._optimized = optimize and backend == "torch"
+        if backend == "torch":
+            configure_torch()
+            self._net = RetinaFace(cfg=self._cfg, phase="test")
+            self._net = self._load_model(self._net, weights_path, use_cuda)
+            self._net.eval()
+            self._device = torch.device("cuda" if use_cuda else "cpu")
+            self._net = self._net.to(self._device)
+            module = self._net
+            if optimize:
+                module = self._optimize_model(
+                    self._net, weights_path, optimized_cache_dir)
+            self._model = TorchBackend(module=module, use_cuda=use_cuda,
+                                       channels_last=self._optimized).load()
+        else:
+            # "onnx" was the name of the ONNX Runtime backend
+            self._model = create_backend(
+                "onnxruntime" if backend == "onnx" else backend,
+                weights_path, use_cuda=use_cuda, intra_op_threads=num_threads,
+                **(backend_options or {})
+            ).load()
+            self._device = torch.device("cpu")
+
+    def _optimize_model(self, model: nn.Module, weights_path: Path,
+                        cache_dir: Optional[Path] = None
+                        ) -> torch.jit.ScriptModule:
+        """Trace, freeze and optimize the model for inference. If
+        ``cache_dir`` is set, the optimized model is loaded from it or saved
+        to it. The cached file is identified by the hash of the weights, the
+        model name, the torch version and the device.
+
+        Args:
+            model (nn.Module): The loaded model.
+            weights_path (Path): Path to the model weights file.
+            cache_dir (Optional[Path], optional): Folder of the optimized
+                models. Defaults to None.
+
+        Returns:
+            torch.jit.ScriptModule: The optimized model.
+        """
+        cache_path = None
+        if cache_dir is not None:
+            sha1 = hashlib.sha1()
+            with open(weights_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    sha1.update(chunk)
+            sha1.update(
+                f"{self._cfg['name']}-{torch.__version__}-"
+                f"{self._device.type}".encode()
+            )
+            cache_path = Path(cache_dir) / \
+                f"retinaface_{Path(weights_path).stem}_{sha1.hexdigest()}.pt"
+            if cache_path.is_file():
+                frozen = torch.jit.load(str(cache_path),
+                                        map_location=self._device)
+                return self._optimize_frozen(frozen)
+
+        model = model.to(memory_format=torch.channels_last)
+        example = torch.zeros((1, 3, 640, 640), device=self._device)
+        example = example.contiguous(memory_format=torch.channels_last)
+        with torch.no_grad():
+            frozen = torch.jit.freeze(torch.jit.trace(model, example))
+
+        if cache_path is not None:
+            # The graph rewritten by optimize_for_inference can not be
+            # serialized, so the frozen graph is cached instead
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            torch.jit.save(frozen, str(tmp_path))
+            tmp_path.replace(cache_path)
+        return self._optimize_frozen(frozen)
+
+    def _optimize_frozen(self, frozen: torch.jit.ScriptModule
+                         ) -> torch.jit.ScriptModule:
+        """Apply the ``torch.jit.optimize_for_inference`` passes to a frozen
+        module if they are available (torch >= 1.9).
+        """
+        if hasattr(torch.jit, "optimize_for_inference"):
+            return torch.jit.optimize_for_inference(frozen)
+        return frozen
+
+    def _run_network(self, batch: torch.Tensor
+                     ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Run the network on a preprocessed batch.
+
+        Args:
+            batch (torch.Tensor): A normalized batch of shape (B, 3, H, W).
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor, torch.Tensor]: The box
+                regressions (B, N, 4), the class probabilities (B, N, 2) and
+                the landmark regressions (B, N, 10).
+        """
+        if self._backend != "torch":
+            outputs = self._model.run(batch.numpy())
+            return tuple(torch.from_numpy(out) for out in outputs)
+        return self._model.forward(batch)
 
     def _preprocess_image(self, image: np.ndarray) -> torch.tensor:
         """Preprocess an image for the model.
@@ -88,6 +233,31 @@ class FaceDetector:
         image = image.to(self._device)
         return image
 
+    def _get_priors(self, height: int, width: int) -> torch.Tensor:
+        """Get the prior boxes for an input resolution. The priors are cached
+        per resolution, discarding the least recently used ones when the cache
+        is full.
+
+        Args:
+            height (int): Height of the input image.
+            width (int): Width of the input image.
+
+        Returns:
+            torch.Tensor: The prior boxes of shape (N, 4) on the model device.
+        """
+        key = (self._cfg["name"], height, width)
+        priors = self._priors_cache.get(key)
+        if priors is not None:
+            self._priors_cache.move_to_end(key)
+            return priors
+        priors = PriorBox(self._cfg, image_size=(height, width)).forward()
+        priors = priors.to(self._device)
+        if self._priors_cache_size > 0:
+            self._priors_cache[key] = priors
+            if len(self._priors_cache) > self._priors_cache_size:
+                self._priors_cache.popitem(last=False)
+        return priors
+
     def _scale_input_image(self, image: np.ndarray) -> np.ndarray:
         """Scale down an image if its larger side is greater than
         ``self._max_input_size``.
@@ -110,78 +280,86 @@ class FaceDetector:
             image = cv2.resize(image, None, fx=f, fy=f)
         return image
 
-    def predict(self, image: np.ndarray):
-        """Detect faces on an image and return its bounding boxes and landmarks.
+    def _postprocess(self, loc: torch.Tensor, conf: torch.Tensor,
+                     landmarks: torch.Tensor, priors: torch.Tensor,
+                     height: int, width: int
+                     ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """Filter and decode the raw outputs of the network for one image.
+
+        The confidence threshold and the top-k selection are applied before
+        decoding, so only the surviving boxes are decoded and passed to the
+        NMS. The landmarks are decoded only for the final detections.
 
         Args:
-            image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
+            loc (torch.Tensor): Box regressions of shape (N, 4).
+            conf (torch.Tensor): Class probabilities of shape (N, 2).
+            landmarks (torch.Tensor): Landmark regressions of shape (N, 10).
+            priors (torch.Tensor): Prior boxes of shape (N, 4).
+            height (int): Height of the network input.
+            width (int): Width of the network input.
 
         Returns:
-            List[Instance]: List of Instances with the following fields:
-                - bounding_box (BoundingBox): A BoundingBox object with the
-                    position of the detected face.
-                - confidence (float): The detection confidence.
-                - landmarks (np.ndarray): Predicted face landmarks if
-                    ``self.landmarks`` is set to True.
+            Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]: The absolute
+                boxes (K, 4), their scores (K) sorted from highest to lowest
+                and the absolute landmarks (K, 10) or None if
+                ``landmarks`` is disabled.
         """
-        image = self._scale_input_image(image)
-        h, w, _ = image.shape
-        scale = torch.Tensor([w, h, w, h])
-        scale = scale.to(self._device)
-        input_img = self._preprocess_image(image)
-
-        loc, conf, landmarks = self._net(input_img)
-
-        # Parse boxes
-        prior_box = PriorBox(self._cfg, image_size=(h, w))
-        priors = prior_box.forward()
-        priors = priors.to(self._device)
-        prior_data = priors.data
-        boxes = decode(loc.data.squeeze(0), prior_data, self._cfg['variance'])
-        boxes = boxes * scale
-        boxes = boxes.cpu().numpy()
-
-        # Parse score
-        scores = conf.squeeze(0).data.cpu().numpy()[:, 1]
-
         # Filter scores
-        score_keep = np.where(scores > self._confidence_threshold)[0]
-        boxes = boxes[score_keep]
-        scores = scores[score_keep]
-
-        # Parse landmarks
-        if self._parse_landmarks:
-            landmarks = decode_landm(
-                landmarks.data.squeeze(0),
-                prior_data,
-                self._cfg['variance']
-            )
-
-            scale_lm = torch.Tensor([
-                input_img.shape[3], input_img.shape[2], input_img.shape[3],
-                input_img.shape[2], input_img.shape[3], input_img.shape[2],
-                input_img.shape[3], input_img.shape[2], input_img.shape[3],
-                input_img.shape[2]
-            ])
-
-            scale_lm = scale_lm.to(self._device)
-            landmarks = landmarks * scale_lm
-            landmarks = landmarks.cpu().numpy()
-            landmarks = landmarks[score_keep]
+        scores = conf[:, 1]
+        keep = torch.nonzero(scores > self._confidence_threshold).squeeze(1)
+        scores = scores[keep]
+        order = torch.argsort(scores, descending=True)
+        if self._top_k is not None:
+            order = order[:self._top_k]
+        keep = keep[order]
+        scores = scores[order]
+
+        # Decode the remaining boxes
+        variance = self._cfg["variance"]
+        scale = torch.tensor([width, height] * 2, dtype=loc.dtype,
+                             device=loc.device)
+        boxes = decode(loc[keep], priors[keep], variance) * scale
 
         # NMS
-        if self._nms_threshold is not None:
-            order = scores.argsort()[::-1]
-            boxes = boxes[order]
-            scores = scores[order]
-            bs = np.hstack(
-                (boxes, scores[:, np.newaxis])).astype(np.float32, copy=False)
-            nms_keep = py_cpu_nms(bs, self._nms_threshold)
+        if self._nms_threshold is not None and len(keep) > 0:
+            # Use inclusive pixel coordinates for the areas, as the original
+            # RetinaFace implementation
+            nms_keep = nms(boxes, scores, self._nms_threshold, offset=1.,
+                           backend="torchvision")
+            keep = keep[nms_keep]
             boxes = boxes[nms_keep]
             scores = scores[nms_keep]
-            if self._parse_landmarks:
-                landmarks = landmarks[order][nms_keep]
 
+        # Decode the landmarks of the kept boxes
+        landmarks_out = None
+        if self._parse_landmarks:
+            scale_lm = torch.tensor([width, height] * 5, dtype=loc.dtype,
+                                    device=loc.device)
+            landmarks_out = decode_landm(
+                landmarks[keep],
+                priors[keep],
+                variance
+            ) * scale_lm
+            landmarks_out = landmarks_out.cpu().numpy()
+
+        return boxes.cpu().numpy(), scores.cpu().numpy(), landmarks_out
+
+    def _create_instances(self, boxes: np.ndarray, scores: np.ndarray,
+                          landmarks: Optional[np.ndarray], width: int,
+                          height: int) -> List[Instance]:
+        """Create the output Instances of an image.
+
+        Args:
+            boxes (np.ndarray): Absolute boxes of shape (K, 4).
+            scores (np.ndarray): Scores of shape (K).
+            landmarks (Optional[np.ndarray]): Absolute landmarks of shape
+                (K, 10) or None.
+            width (int): Width of the predicted image.
+            height (int): Height of the predicted image.
+
+        Returns:
+            List[Instance]: List of Instances.
+        """
         instances = []
         for i, score in enumerate(scores):
             box = BoundingBox.from_absolute(
@@ -189,8 +367,8 @@ class FaceDetector:
                 round(boxes[i, 1]),
                 round(boxes[i, 2]),
                 round(boxes[i, 3]),
-                image_width=w,
-                image_height=h
+                image_width=width,
+                image_height=height
             )
             inst = Instance().set("bounding_box", box).set("confidence", score)
             if self._parse_landmarks:
@@ -200,6 +378,101 @@ class FaceDetector:
 
         return instances
 
+    def predict(self, image: np.ndarray) -> List[Instance]:
+        """Detect faces on an image and return its bounding boxes and landmarks.
+
+        Args:
+            image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
+
+        Returns:
+            List[Instance]: List of Instances with the following fields:
+                - bounding_box (BoundingBox): A BoundingBox object with the
+                    position of the detected face.
+                - confidence (float): The detection confidence.
+                - landmarks (np.ndarray): Predicted face landmarks if
+                    ``self.landmarks`` is set to True.
+        """
+        image = self._scale_input_image(image)
+        h, w, _ = image.shape
+        input_img = self._preprocess_image(image)
+
+        loc, conf, landmarks = self._run_network(input_img)
+
+        priors = self._get_priors(h, w)
+        boxes, scores, landmarks = self._postprocess(
+            loc[0], conf[0], landmarks[0], priors, h, w)
+        return self._create_instances(boxes, scores, landmarks, w, h)
+
+    def _preprocess_batch(self, images: List[np.ndarray], height: int,
+                          width: int) -> torch.Tensor:
+        """Letterbox a list of images into a single normalized batch. Each
+        image is placed on the top-left corner and the remaining area is
+        filled with the mean value.
+
+        Args:
+            images (List[np.ndarray]): BGR uint8 images of shape (H, W, 3)
+                not larger than ``height`` x ``width``.
+            height (int): Height of the batch.
+            width (int): Width of the batch.
+
+        Returns:
+            torch.Tensor: The normalized batch of shape (B, 3, height, width).
+        """
+        batch = np.zeros((len(images), height, width, 3), np.float32)
+        for i, image in enumerate(images):
+            h, w, _ = image.shape
+            np.subtract(image, (104, 117, 123), out=batch[i, :h, :w],
+                        dtype=np.float32)
+        batch = torch.from_numpy(batch.transpose(0, 3, 1, 2))
+        return batch.to(self._device)
+
+    def _get_bucket(self, height: int, width: int) -> Tuple[int, int]:
+        """Get the batch shape where an image of the given size is placed,
+        rounding up its size to a multiple of ``self._bucket_stride``.
+        """
+        def f(x): return -(-x // self._bucket_stride) * self._bucket_stride
+        return f(height), f(width)
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[List[Instance]]:
+        """Detect faces on multiple images.
+
+        The images are grouped in buckets of similar size and each bucket is
+        run as a single batch, with the images letterboxed to the size of the
+        bucket. The results may differ slightly from ``predict`` due to the
+        padding.
+
+        Args:
+            images (List[np.ndarray]): A list of BGR uint8 images of shape
+                (H, W, 3).
+
+        Returns:
+            List[List[Instance]]: A list of Instances for each image, with the
+                same fields as ``predict``.
+        """
+        images = [self._scale_input_image(image) for image in images]
+        buckets = {}
+        for i, image in enumerate(images):
+            bucket = self._get_bucket(*image.shape[:2])
+            buckets.setdefault(bucket, []).append(i)
+
+        results = [None] * len(images)
+        for (height, width), indices in buckets.items():
+            priors = self._get_priors(height, width)
+            for b in range(0, len(indices), self._batch_size):
+                batch_indices = indices[b:b + self._batch_size]
+                batch = self._preprocess_batch(
+                    [images[i] for i in batch_indices], height, width)
+
+                loc, conf, landmarks = self._run_network(batch)
+
+                for j, i in enumerate(batch_indices):
+                    h, w, _ = images[i].shape
+                    boxes, scores, lms = self._postprocess(
+                        loc[j], conf[j], landmarks[j], priors, height, width)
+                    results[i] = self._create_instances(
+                        boxes, scores, lms, w, h)
+        return results
+
     def _remove_model_prefix(self, state_dict: dict, prefix: str) -> dict:
         """Remove prefix from the state dict parameter names.
 
@@ -233,10 +506,7 @@ class FaceDetector:
                 map_location=lambda storage, loc: storage.cuda(device_id)
             )
         else:
-            pretrained_dict = torch.load(
-                pretrained_path,
-                map_location=lambda storage, loc: storage
-            )
+            pretrained_dict = self._load_mmap(pretrained_path)
         if "state_dict" in pretrained_dict.keys():
             pretrained_dict = self._remove_model_prefix(
                 pretrained_dict['state_dict'],
@@ -247,5 +517,33 @@ class FaceDetector:
                 pretrained_dict,
                 'module.'
             )
-        model.load_state_dict(pretrained_dict, strict=False)
+        try:
+            # Use the loaded tensors as the parameters instead of copying
+            # them (torch >= 2.1), so the mapped weights are not duplicated
+            model.load_state_dict(pretrained_dict, strict=False,
+                                  assign=not use_cuda)
+        except TypeError:
+            model.load_state_dict(pretrained_dict, strict=False)
         return model
+
+    def _load_mmap(self, path: Path) -> dict:
+        """Load a state dict on the CPU memory-mapping its tensors, so they
+        are read from the disk cache on demand instead of being copied.
+        The weights saved in the zipfile format by
+        ``toolbox/tools/serialize_weights.py`` can be mapped (torch >= 2.1);
+        other files are loaded normally.
+
+        Args:
+            path (Path): Path to the weights file.
+
+        Returns:
+            dict: The state dict.
+        """
+        try:
+            return torch.load(path, map_location="cpu", mmap=True,
+                              weights_only=True)
+        except (TypeError, RuntimeError, pickle.UnpicklingError):
+            # Old torch versions, legacy (non zipfile) files, or
+            # checkpoints with other objects than tensors
+            return torch.load(path,
+                              map_location=lambda storage, loc: storage)
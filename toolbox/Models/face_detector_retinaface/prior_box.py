@@ -1,5 +1,4 @@
 import torch
-from itertools import product as product
 import numpy as np
 from math import ceil
 
@@ -15,20 +14,32 @@ class PriorBox(object):
         self.name = "s"
 
     def forward(self):
+        """Generate the anchors of all the feature maps.
+
+        Return:
+            (tensor) Prior boxes in center-size form, Shape: [num_priors,4].
+                The anchors are ordered by feature map, row, column and
+                anchor size.
+        """
+        img_h, img_w = self.image_size
         anchors = []
-        for k, f in enumerate(self.feature_maps):
-            min_sizes = self.min_sizes[k]
-            for i, j in product(range(f[0]), range(f[1])):
-                for min_size in min_sizes:
-                    s_kx = min_size / self.image_size[1]
-                    s_ky = min_size / self.image_size[0]
-                    dense_cx = [x * self.steps[k] / self.image_size[1] for x in [j + 0.5]]
-                    dense_cy = [y * self.steps[k] / self.image_size[0] for y in [i + 0.5]]
-                    for cy, cx in product(dense_cy, dense_cx):
-                        anchors += [cx, cy, s_kx, s_ky]
+        for k, (f_h, f_w) in enumerate(self.feature_maps):
+            min_sizes = np.asarray(self.min_sizes[k], dtype=np.float32)
+            step = self.steps[k]
+            cx = (np.arange(f_w, dtype=np.float32) + 0.5) * step / img_w
+            cy = (np.arange(f_h, dtype=np.float32) + 0.5) * step / img_h
+            cy, cx = np.meshgrid(cy, cx, indexing="ij")
+
+            # (f_h, f_w, num_sizes, 4)
+            priors = np.empty((f_h, f_w, len(min_sizes), 4), np.float32)
+            priors[..., 0] = cx[..., None]
+            priors[..., 1] = cy[..., None]
+            priors[..., 2] = min_sizes / img_w
+            priors[..., 3] = min_sizes / img_h
+            anchors.append(priors.reshape(-1, 4))
 
         # back to torch land
-        output = torch.Tensor(anchors).view(-1, 4)
+        output = torch.from_numpy(np.concatenate(anchors))
         if self.clip:
             output.clamp_(max=1, min=0)
         return output
@@ -1,21 +1,35 @@
+import threading
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Literal, Optional, Tuple
 
 import cv2
 import numpy as np
-import onnxruntime as ort
 
+from toolbox.Models.backends import create_backend
 from toolbox.Structures import BoundingBox, Instance
-
-ort.set_default_logger_severity(3)
+from toolbox.utils.nms import nms
 
 
 class FaceDetector:
     """UltraFace face detector.
     """
 
-    def __init__(self, model_path: Path, input_size: Tuple[int, int],
-                 confidence_threshold: float = 0.7, use_cuda: bool = False):
+    def __init__(
+        self,
+        model_path: Path,
+        input_size: Tuple[int, int],
+        confidence_threshold: float = 0.7,
+        use_cuda: bool = False,
+        batch_size: int = 8,
+        intra_op_num_threads: Optional[int] = None,
+        inter_op_num_threads: Optional[int] = None,
+        graph_optimization_level: Literal["disable", "basic", "extended",
+                                          "all"] = "all",
+        execution_mode: Literal["sequential", "parallel"] = "sequential",
+        io_binding: bool = True,
+        backend: Literal["onnxruntime", "opencv"] = "onnxruntime",
+        backend_options: Optional[dict] = None
+    ):
         """Create the face predictor and load the model.
 
         Args:
@@ -26,89 +40,76 @@ class FaceDetector:
                 Defaults to 0.7.
             use_cuda (bool, optional): If True, execute the model on a CUDA
                 device. Defaults to False.
+            batch_size (int, optional): Maximum number of images run in one
+                session call by ``predict_batch``. Only used if the batch
+                dimension of the model is dynamic, otherwise the images are
+                run one by one. Defaults to 8.
+            intra_op_num_threads (Optional[int], optional): Number of threads
+                used to run each operator. None to use the runtime config.
+                Defaults to None.
+            inter_op_num_threads (Optional[int], optional): Number of threads
+                used to run operators in parallel, with the "parallel"
+                ``execution_mode``. None to use the runtime config.
+                Defaults to None.
+            graph_optimization_level (Literal["disable", "basic", "extended",
+                "all"], optional): ONNX Runtime graph optimization level.
+                Defaults to "all".
+            execution_mode (Literal["sequential", "parallel"], optional):
+                Run the operators of the graph sequentially or in parallel.
+                Defaults to "sequential".
+            io_binding (bool, optional): Bind a preallocated input buffer to
+                the session instead of passing a new input array on each
+                call. Defaults to True.
+            backend (Literal["onnxruntime", "opencv"], optional): Name of the
+                backend that runs the model. The ONNX Runtime options are
+                only used by the "onnxruntime" backend.
+                Defaults to "onnxruntime".
+            backend_options (Optional[dict], optional): Other arguments of
+                the backend. Defaults to None.
+
+        Raises:
+            ValueError: If ``graph_optimization_level``, ``execution_mode``
+                or ``backend`` are not valid.
         """
         self._input_size = tuple(input_size)
         self._confidence_thr = confidence_threshold
 
-        provider = "CUDAExecutionProvider" if use_cuda \
-            else "CPUExecutionProvider"
-        self._detector = ort.InferenceSession(
-            model_path,
-            providers=[provider]
-        )
-        self._input_name = self._detector.get_inputs()[0].name
-
-    def _area_of(self, left_top: np.ndarray, right_bottom: np.ndarray) -> float:
-        """Compute the areas of rectangles given two corners.
-
-        Args:
-            left_top (np.ndarray): left top corner.
-            right_bottom (np.ndarray): right bottom corner.
-
-        Returns:
-            int: the area.
-        """
-        hw = np.clip(right_bottom - left_top, 0.0, None)
-        return hw[..., 0] * hw[..., 1]
-
-    def _iou_of(self, boxes0: np.ndarray, boxes1: np.diagonal,
-                eps: bool = 1e-5) -> np.ndarray:
-        """Return intersection-over-union (Jaccard index) of boxes.
-
-        Args:
-            boxes0 (np.ndarray): ground truth boxes (N, 4).
-            boxes1 (np.ndarray): predicted boxes (N or 1, 4).
-            eps (float, optional): a small number to avoid 0 as denominator.
-                Defaults to 1e-5.
-
-        Returns:
-            np.ndarray: IoU values (N).
-        """
-        overlap_left_top = np.maximum(boxes0[..., :2], boxes1[..., :2])
-        overlap_right_bottom = np.minimum(boxes0[..., 2:], boxes1[..., 2:])
-
-        overlap_area = self._area_of(overlap_left_top, overlap_right_bottom)
-        area0 = self._area_of(boxes0[..., :2], boxes0[..., 2:])
-        area1 = self._area_of(boxes1[..., :2], boxes1[..., 2:])
-        return overlap_area / (area0 + area1 - overlap_area + eps)
-
-    def _hard_nms(self, box_scores: np.ndarray, iou_threshold: float,
-                  top_k: int = -1, candidate_size: int = 200) -> np.ndarray:
-        """Perform hard non-maximum-suppression to filter out boxes with iou
-        greater than threshold
-
-        Args:
-            box_scores (np.ndarray): boxes in corner-form and probabilities
-                (N, 5).
-            iou_threshold (float): intersection over union threshold.
-            top_k (int, optional): keep top_k results. If k <= 0, keep all the
-                results. Defaults to -1.
-            candidate_size (int, optional): only consider the candidates with
-                the highest scores. Defaults to 200.
-
-        Returns:
-            np.ndarray: a list of indexes of the kept boxes.
+        backend_options = dict(backend_options or {})
+        if backend == "onnxruntime":
+            backend_options.setdefault("graph_optimization_level",
+                                       graph_optimization_level)
+            backend_options.setdefault("execution_mode", execution_mode)
+            backend_options.setdefault("io_binding", io_binding)
+        self._detector = create_backend(
+            backend, model_path, use_cuda=use_cuda,
+            intra_op_threads=intra_op_num_threads,
+            inter_op_threads=inter_op_num_threads, **backend_options
+        ).load()
+
+        # Models with a fixed batch dimension can only run one image per call
+        self._batch_size = max(batch_size, 1) \
+            if self._has_dynamic_batch() else 1
+
+        # Preallocated input buffer, reused on every call
+        w, h = self._input_size
+        self._input_buffer = np.empty((self._batch_size, 3, h, w), np.float32)
+        self._lock = threading.Lock()
+
+    def _has_dynamic_batch(self) -> bool:
+        """Check if the model can run several images per call. Some
+        backends (e.g. OpenCV) do not know the input shape, so the model is
+        then run once on a batch of 2 images.
         """
-        scores = box_scores[:, -1]
-        boxes = box_scores[:, :-1]
-        picked = []
-        indexes = np.argsort(scores)
-        indexes = indexes[-candidate_size:]
-        while len(indexes) > 0:
-            current = indexes[-1]
-            picked.append(current)
-            if 0 < top_k == len(picked) or len(indexes) == 1:
-                break
-            current_box = boxes[current, :]
-            indexes = indexes[:-1]
-            rest_boxes = boxes[indexes, :]
-            iou = self._iou_of(
-                rest_boxes,
-                np.expand_dims(current_box, axis=0),
-            )
-            indexes = indexes[iou <= iou_threshold]
-
-        return box_scores[picked, :]
+        if self._detector.inputs[0].shape[0] is not None:
+            return False
+        if self._detector.name == "onnxruntime":
+            return True
+        w, h = self._input_size
+        try:
+            outputs = self._detector.run(np.zeros((2, 3, h, w), np.float32))
+        except Exception:
+            return False
+        return all(len(output) == 2 for output in outputs)
 
     def _parse_boxes(self, width: int, height: int, confidences: np.ndarray,
                      boxes: np.ndarray, prob_threshold: float,
@@ -119,8 +120,9 @@ class FaceDetector:
         Args:
             width (int): Original image width.
             height (int): Original image height.
-            confidences (np.ndarray): Confidence array (N, 2).
-            boxes (np.ndarray): Boxes array in corner-form (N, 4).
+            confidences (np.ndarray): Confidence array of an image (N, 2).
+            boxes (np.ndarray): Boxes array of an image in corner-form (N, 4).
+            prob_threshold (float): Confidence threshold.
             iou_threshold (float, optional): Intersection over union threshold.
                 Defaults to 0.5.
             top_k (int): Keep top_k results. If k <= 0, keep all the results.
@@ -132,11 +134,6 @@ class FaceDetector:
                 labels (k): array of labels for each box.
                 probs (k): an array of probabilities for each box.
         """
-        assert boxes.shape[0] == 1
-        assert confidences.shape[0] == 1
-        boxes = boxes[0]
-        confidences = confidences[0]
-
         picked_box_probs = []
         picked_labels = []
         for class_index in range(1, confidences.shape[1]):
@@ -148,15 +145,17 @@ class FaceDetector:
                 continue
 
             subset_boxes = boxes[mask, :]
+            keep = nms(
+                subset_boxes,
+                probs,
+                iou_threshold,
+                top_k=top_k,
+                max_candidates=200
+            )
             box_probs = np.concatenate(
-                [subset_boxes, probs.reshape(-1, 1)],
+                [subset_boxes[keep], probs[keep].reshape(-1, 1)],
                 axis=1
             )
-            box_probs = self._hard_nms(
-                box_probs,
-                iou_threshold=iou_threshold,
-                top_k=top_k,
-            )
             picked_box_probs.append(box_probs)
             picked_labels.extend([class_index] * box_probs.shape[0])
         if not picked_box_probs:
@@ -172,6 +171,20 @@ class FaceDetector:
             picked_box_probs[:, 4]
         )
 
+    def _preprocess_into(self, image: np.ndarray, out: np.ndarray):
+        """Preprocess an image for the model, writing the result on a float32
+        array.
+
+        Args:
+            image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
+            out (np.ndarray): A float32 array of shape (3, H, W).
+        """
+        image = cv2.resize(image, self._input_size)
+        # BGR HWC to RGB CHW
+        image = image[..., ::-1].transpose(2, 0, 1)
+        np.subtract(image, 127, out=out, dtype=np.float32)
+        out *= 1 / 128
+
     def _preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """Preprocess an image for the model.
 
@@ -181,33 +194,35 @@ class FaceDetector:
         Returns:
             np.ndarray: A normalized array of shape (1, 3, H, W).
         """
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image = cv2.resize(image, self._input_size)
-        image_mean = np.array([127, 127, 127])
-        image = (image - image_mean) / 128
-        image = np.transpose(image, [2, 0, 1])
-        image = np.expand_dims(image, axis=0)
-        image = image.astype(np.float32)
-        return image
+        w, h = self._input_size
+        input_image = np.empty((1, 3, h, w), np.float32)
+        self._preprocess_into(image, input_image[0])
+        return input_image
 
-    def predict(self, image: np.ndarray) -> List[Instance]:
-        """Detect faces on an image and return its bounding boxes.
+    def _run(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Run the model.
 
         Args:
-            image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
+            batch (np.ndarray): A preprocessed batch of shape (B, 3, H, W).
 
         Returns:
-            List[Instance]: A list of Instances with the following fields:
-                - bounding_box (BoundingBox): A BoundingBox object with the
-                    position of the detected face
-                - confidence (float): The detection confidence.
+            Tuple[np.ndarray, np.ndarray]: The confidences (B, N, 2) and the
+                boxes (B, N, 4).
+        """
+        return self._detector.run(batch)
+
+    def _create_instances(self, image: np.ndarray, confidences: np.ndarray,
+                          boxes: np.ndarray) -> List[Instance]:
+        """Create the output Instances of an image.
+
+        Args:
+            image (np.ndarray): The input image.
+            confidences (np.ndarray): Confidences of the image (N, 2).
+            boxes (np.ndarray): Boxes of the image (N, 4).
+
+        Returns:
+            List[Instance]: The detected faces.
         """
-        instances = []
-        input_image = self._preprocess_image(image)
-        confidences, boxes = self._detector.run(
-            None,
-            {self._input_name: input_image}
-        )
         boxes, labels, probs = self._parse_boxes(
             image.shape[1],
             image.shape[0],
@@ -230,3 +245,48 @@ class FaceDetector:
             for box, conf in zip(boxes, probs)
         ]
         return instances
+
+    def predict(self, image: np.ndarray) -> List[Instance]:
+        """Detect faces on an image and return its bounding boxes.
+
+        Args:
+            image (np.ndarray): A BGR uint8 image of shape (H, W, 3).
+
+        Returns:
+            List[Instance]: A list of Instances with the following fields:
+                - bounding_box (BoundingBox): A BoundingBox object with the
+                    position of the detected face
+                - confidence (float): The detection confidence.
+        """
+        with self._lock:
+            batch = self._input_buffer[:1]
+            self._preprocess_into(image, batch[0])
+            confidences, boxes = self._run(batch)
+        return self._create_instances(image, confidences[0], boxes[0])
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[List[Instance]]:
+        """Detect faces on multiple images. The images are run in batches of
+        up to ``batch_size`` images if the model has a dynamic batch
+        dimension, otherwise they are run one by one.
+
+        Args:
+            images (List[np.ndarray]): A list of BGR uint8 images of shape
+                (H, W, 3).
+
+        Returns:
+            List[List[Instance]]: A list with the detected faces of each image,
+                with the same fields as ``predict``.
+        """
+        results = []
+        for start in range(0, len(images), self._batch_size):
+            chunk = images[start:start + self._batch_size]
+            with self._lock:
+                batch = self._input_buffer[:len(chunk)]
+                for image, out in zip(chunk, batch):
+                    self._preprocess_into(image, out)
+                confidences, boxes = self._run(batch)
+            results.extend(
+                self._create_instances(image, c, b)
+                for image, c, b in zip(chunk, confidences, boxes)
+            )
+        return results
@@ -1,14 +1,17 @@
 import os
 import pickle
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Literal, Optional, Union
 
 import cv2
 import numpy as np
-import tensorflow as tf
 
+from toolbox.Models.backends import create_backend
 from toolbox.Structures import Instance
 
+from .FeaturesStore import FeaturesStore
+from .Gallery import Gallery
+
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
 
@@ -24,7 +27,13 @@ class FaceRecognition:
     __algorithm_name__ = "FaceNet"
 
     def __init__(self, distance_threshold: float = 0.75,
-                 model_path: Optional[Path] = None, use_cuda: bool = False):
+                 model_path: Optional[Path] = None, use_cuda: bool = False,
+                 max_batch_size: int = 32,
+                 index: Literal["exact", "ivf"] = "exact",
+                 ivf_num_lists: Optional[int] = None,
+                 ivf_num_probes: int = 8,
+                 backend: Literal["tensorflow", "onnxruntime"] = "tensorflow",
+                 backend_options: Optional[dict] = None):
         """Create the FaceRecognition model.
 
         Args:
@@ -35,44 +44,113 @@ class FaceRecognition:
                 (.ckpt-..., without the ".data-..."). Defaults to None.
             use_cuda (bool, optional): Execute the model on a   CUDA device.
                 Defaults to False.
+            max_batch_size (int, optional): Maximum number of face images
+                run in one session call by ``predict_features_batch``.
+                Defaults to 32.
+            index (Literal["exact", "ivf"], optional): Search the stored
+                features exhaustively ("exact") or with an approximate
+                inverted file index ("ivf") for very large galleries. Only
+                galleries of at least 10000 features use the index.
+                Defaults to "exact".
+            ivf_num_lists (Optional[int], optional): Number of inverted lists
+                of the "ivf" index. None to use the square root of the
+                number of stored features. Defaults to None.
+            ivf_num_probes (int, optional): Number of inverted lists searched
+                for each query by the "ivf" index. Defaults to 8.
+            backend (Literal["tensorflow", "onnxruntime"], optional): Name
+                of the backend that runs the model. Defaults to "tensorflow".
+            backend_options (Optional[dict], optional): Other arguments of
+                the backend. The "tensorflow" backend loads a TF1 checkpoint
+                with the FaceNet input and output tensors unless they are
+                given, e.g. ``model_format: keras`` for a Keras model.
+                Defaults to None.
         """
         self.distance_threshold = distance_threshold
         self._model_path = model_path
         self._use_cuda = use_cuda
-        self._session = None
-        self._face_features: Dict[str, np.ndarray] = {}
+        self._backend = backend
+        self._backend_options = dict(backend_options or {})
+        self._max_batch_size = max(max_batch_size, 1)
+        self._model = None
+        self._gallery_params = dict(
+            index=index,
+            num_lists=ivf_num_lists,
+            num_probes=ivf_num_probes
+        )
+        self._gallery = Gallery(**self._gallery_params)
+        self._store: Optional[FeaturesStore] = None
+        # Features added since the last save
+        self._unsaved: Dict[str, np.ndarray] = {}
 
     def load_model(self):
-        """Load the model from a checkpoint file.
+        """Load the model with the selected backend.
+
+        Raises:
+            ValueError: If the model path is not defined or ``backend`` is
+                not a valid backend.
         """
         if self._model_path is None:
             raise ValueError("Model path is not defined")
 
-        model_path = Path(self._model_path)
+        backend_options = dict(self._backend_options)
+        if self._backend == "tensorflow":
+            # Tensors of the FaceNet checkpoints
+            backend_options.setdefault("model_format", "checkpoint")
+            backend_options.setdefault("input_names", ["input:0"])
+            backend_options.setdefault("output_names", ["embeddings:0"])
+            backend_options.setdefault("feeds", {"phase_train:0": False})
+        self._model = create_backend(
+            self._backend, self._model_path, use_cuda=self._use_cuda,
+            **backend_options
+        ).load()
+
+    def _preprocess_images(self, images: List[np.ndarray]) -> np.ndarray:
+        """Resize and prewhiten the face images. Each image is normalized
+        with its own mean and standard deviation.
 
-        if not self._use_cuda:
-            os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+        Args:
+            images (List[np.ndarray]): BGR uint8 face images of shape
+                (H, W, 3).
 
-        tf.compat.v1.disable_eager_execution()
+        Returns:
+            np.ndarray: A float32 batch of shape (B, 160, 160, 3).
+        """
+        batch = np.empty((len(images), 160, 160, 3), np.float32)
+        for i, image in enumerate(images):
+            batch[i] = cv2.resize(image, (160, 160))
+        mean = np.mean(batch, axis=(1, 2, 3), keepdims=True)
+        std = np.std(batch, axis=(1, 2, 3), keepdims=True)
+        std_adj = np.maximum(std, 1.0 / np.sqrt(batch[0].size))
+        batch -= mean
+        batch /= std_adj
+        return batch
+
+    def predict_features_batch(self, images: List[np.ndarray]) -> np.ndarray:
+        """Predict multiple face images and extract their features vectors.
+        The images are run in chunks of up to ``max_batch_size`` images.
 
-        # Prevent the allocation of all the available GPU memory
-        gpu_options = tf.compat.v1.GPUOptions(allow_growth=True)
-        self._session = tf.compat.v1.Session(
-            config=tf.compat.v1.ConfigProto(gpu_options=gpu_options)
-        )
+        Args:
+            images (List[np.ndarray]): A list of BGR uint8 face images of
+                shape (H, W, 3).
 
-        # Load the model
-        saver = tf.compat.v1.train.import_meta_graph(
-            str(model_path.with_suffix(".meta"))
-        )
-        saver.restore(self._session, str(model_path))
+        Raises:
+            ValueError: If the model is not loaded (call ``load_model()``).
+
+        Returns:
+            np.ndarray: The predicted features vectors of shape (B, F).
+        """
+        if self._model is None:
+            raise ValueError("Model is not loaded")
+        if len(images) == 0:
+            dim = self._model.outputs[0].shape[-1] or 0
+            return np.zeros((0, dim), np.float32)
 
-        self._net_embeddings = tf.compat.v1.get_default_graph(). \
-            get_tensor_by_name("embeddings:0")
-        self._image_placeholder = tf.compat.v1.get_default_graph(). \
-            get_tensor_by_name("input:0")
-        self._phase_train_placeholder = tf.compat.v1.get_default_graph(). \
-            get_tensor_by_name("phase_train:0")
+        outputs = []
+        for i in range(0, len(images), self._max_batch_size):
+            batch = self._preprocess_images(
+                images[i:i + self._max_batch_size])
+            outputs.append(self._model.run(batch)[0])
+        return np.concatenate(outputs)
 
     def predict_features(self, image: np.ndarray) -> np.ndarray:
         """Predict a face image and extract a features vector.
@@ -86,31 +164,30 @@ class FaceRecognition:
         Returns:
             np.ndarray: The predicted features vector.
         """
-        if self._session is None:
-            raise ValueError("Model is not loaded")
-
-        # Normalize the image
-        image = cv2.resize(image, (160, 160))
-        std_adj = np.maximum(np.std(image), 1.0 / np.sqrt(image.size))
-        image = (image - np.mean(image)) / std_adj
-        image = np.expand_dims(image, axis=0)
-
-        # Predict
-        feed_dict = {
-            self._image_placeholder: image,
-            self._phase_train_placeholder: False
-        }
-        out = self._session.run(self._net_embeddings, feed_dict=feed_dict)[0]
-        return out
+        return self.predict_features_batch([image])[0]
 
     def load_features(self, features_path: Path):
-        """Load face features from a pickle file.
+        """Load face features from a pickle file or a features store.
+
+        The features matrix of a store is memory mapped and searched without
+        copying it to memory.
 
         Args:
-            features_path (Path): Path to a pickle file (.pkl).
+            features_path (Path): Path to a pickle file (.pkl) or to a
+                features store folder.
         """
-        with open(features_path, "rb") as f:
-            self._face_features = pickle.load(f)
+        features_path = Path(features_path)
+        if features_path.suffix == ".pkl":
+            with open(features_path, "rb") as f:
+                self._gallery = Gallery.from_dict(pickle.load(f),
+                                                  **self._gallery_params)
+            self._store = None
+        else:
+            self._store = FeaturesStore(features_path)
+            names, features, sq_norms = self._store.read()
+            self._gallery = Gallery.from_arrays(names, features, sq_norms,
+                                                **self._gallery_params)
+        self._unsaved = {}
 
     def add_features(self, name: str, features: np.ndarray):
         """Store a new features vector.
@@ -119,30 +196,64 @@ class FaceRecognition:
             name (str): Name associated with the features.
             features (np.ndarray): A features vector.
         """
-        self._face_features[name] = features
+        self._gallery.add(name, features)
+        self._unsaved[name] = np.asarray(features, dtype=np.float32)
 
     def save_features(self, path: Path):
-        """Save the current face features to a file.
+        """Save the current face features to a pickle file or a features
+        store. If the features were loaded from the same store, only the
+        added features are appended to it.
 
         Args:
-            path (Path): Output pickle file path, ending in ".pkl".
+            path (Path): Output pickle file path, ending in ".pkl", or
+                features store folder.
         """
-        with open(path, "wb") as f:
-            pickle.dump(self._face_features, f)
-
-    def _compare(self, f1: np.ndarray, f2: np.ndarray) -> Tuple[bool, float]:
-        """Compare two features vectors.
+        path = Path(path)
+        if path.suffix == ".pkl":
+            with open(path, "wb") as f:
+                pickle.dump(self._gallery.to_dict(), f)
+            return
+        if self._store is not None and \
+                self._store.path.resolve() == path.resolve():
+            if self._unsaved:
+                self._store.append(list(self._unsaved),
+                                   np.stack(list(self._unsaved.values())))
+        else:
+            self._store = FeaturesStore(path)
+            self._store.write(self._gallery.names, self._gallery.features)
+        self._unsaved = {}
+
+    def recognize_features_batch(self,
+                                 features: Union[np.ndarray, List[np.ndarray]],
+                                 top_k: Optional[int] = None
+                                 ) -> List[List[Instance]]:
+        """Search multiple features vectors in the stored face features.
 
         Args:
-            f1 (np.ndarray): Feature vector.
-            f2 (np.ndarray): Feature vector.
+            features (Union[np.ndarray, List[np.ndarray]]): The features of
+                the faces, of shape (B, F).
+            top_k (Optional[int], optional): Maximum number of recognized
+                faces of each features vector. None to return all of them.
+                Defaults to None.
 
         Returns:
-            Tuple[bool, float]: A bool indicating if both features are similar
-                and its Euclidean distance.
+            List[List[Instance]]: A list for each features vector with
+                Instances sorted from most to least similar, with the
+                following fields:
+                - name (str): The name of the recognized face.
+                - distance (float): The Euclidean distance from the supplied
+                features to the dataset features.
         """
-        dist = np.sum(np.square(f1 - f2))
-        return dist < self.distance_threshold, dist
+        results = self._gallery.search(
+            np.asarray(features, dtype=np.float32),
+            self.distance_threshold,
+            top_k
+        )
+        return [
+            [Instance().set("name", name).set("distance", dist)
+             for name, dist in matches]
+            for matches in results
+        ]
 
     def recognize_features(self, features: np.ndarray) -> List[Instance]:
         """Search a features vector in the stored face features.
@@ -157,19 +268,8 @@ class FaceRecognition:
                 - distance (float): The Euclidean distance from the supplied
                 features to the dataset features.
         """
-        recognized = {}
-        for name, c_features in self._face_features.items():
-            eq, dist = self._compare(features, c_features)
-            if eq:
-                recognized[name] = dist
-
-        # Create instances with the recognized faces, sorted from most to
-        # least similar.
-        instances = []
-        for name, dist in sorted(list(recognized.items()), key=lambda x: x[1]):
-            instances.append(Instance().set(
-                "name", name).set("distance", dist))
-        return instances
+        return self.recognize_features_batch(
+            np.asarray(features)[None])[0]
 
     def recognize_image(self, image: np.ndarray) -> List[Instance]:
         """Recognize a face.
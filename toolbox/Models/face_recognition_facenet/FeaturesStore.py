@@ -0,0 +1,315 @@
+import json
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_MANIFEST = "manifest.json"
+_VERSION = 1
+# Header of the log records: length of the utf-8 name
+_RECORD_HEADER = struct.Struct("<I")
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write a file by replacing it with a complete temporary file.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _save_npy(path: Path, array: np.ndarray):
+    """Save an array in a .npy file, flushed to disk.
+    """
+    with open(path, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class FeaturesStore:
+    """On-disk store of named face features vectors.
+
+    The store is a folder with a ``manifest.json`` file that points to the
+    current generation of files:
+
+    - ``features-<gen>.npy``: float32 matrix of shape (N, F), opened as a
+      read-only memory map.
+    - ``norms-<gen>.npy``: squared norms of the features, of shape (N).
+    - ``ids-<gen>.json``: names of the rows of the matrix.
+    - ``log-<gen>.bin``: append-only log of the features added after the
+      matrix was written. Each record has the length of the name, the utf-8
+      name and the float32 features vector. A record replaces the previous
+      features of the same name.
+
+    ``compact`` merges the log into a new generation and replaces the
+    manifest, so readers always see a complete generation.
+    """
+
+    def __init__(self, path: Path, max_log_ratio: Optional[float] = 0.5):
+        """Open a features store, creating an empty one if it does not
+        exist.
+
+        Args:
+            path (Path): Path to the store folder.
+            max_log_ratio (Optional[float], optional): Compact the store when
+                the number of records of the log exceeds this fraction of the
+                number of rows of the matrix (with a minimum of 1000
+                records). None to only compact it explicitly.
+                Defaults to 0.5.
+
+        Raises:
+            ValueError: If the store version is not supported.
+        """
+        self._path = Path(path)
+        self._max_log_ratio = max_log_ratio
+        manifest_path = self._path / _MANIFEST
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text())
+            if manifest["version"] != _VERSION:
+                raise ValueError(f"Unsupported features store version: "
+                                 f"{manifest['version']}")
+        else:
+            self._path.mkdir(parents=True, exist_ok=True)
+            manifest = {"version": _VERSION, "generation": 0, "dim": None,
+                        "count": 0}
+            _write_atomic(manifest_path, json.dumps(manifest).encode())
+        self._generation = manifest["generation"]
+        self._dim = manifest["dim"]
+        self._count = manifest["count"]
+        self._log_count = len(self._read_log()[0])
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Size of the features vectors, None if the store is empty.
+        """
+        return self._dim
+
+    @property
+    def log_count(self) -> int:
+        """Number of records in the append log.
+        """
+        return self._log_count
+
+    def _file(self, name: str, suffix: str,
+              generation: Optional[int] = None) -> Path:
+        generation = self._generation if generation is None else generation
+        return self._path / f"{name}-{generation}.{suffix}"
+
+    def _read_base(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Open the features matrix of the current generation.
+        """
+        if self._count == 0:
+            dim = self._dim or 0
+            return [], np.zeros((0, dim), np.float32), \
+                np.zeros(0, np.float32)
+        names = json.loads(self._file("ids", "json").read_text())
+        features = np.load(self._file("features", "npy"), mmap_mode="r")
+        sq_norms = np.load(self._file("norms", "npy"), mmap_mode="r")
+        return names, features, sq_norms
+
+    def _read_log(self) -> Tuple[List[str], np.ndarray]:
+        """Read the records of the log. An incomplete last record (from an
+        interrupted write) is removed from the file.
+        """
+        log_path = self._file("log", "bin")
+        if not log_path.exists() or self._dim is None:
+            return [], np.zeros((0, self._dim or 0), np.float32)
+        data = log_path.read_bytes()
+        vector_size = 4 * self._dim
+        names, vectors = [], []
+        offset = 0
+        while offset + _RECORD_HEADER.size <= len(data):
+            (name_size,) = _RECORD_HEADER.unpack_from(data, offset)
+            end = offset + _RECORD_HEADER.size + name_size + vector_size
+            if end > len(data):
+                break
+            name_end = offset + _RECORD_HEADER.size + name_size
+            names.append(data[offset + _RECORD_HEADER.size:name_end]
+                         .decode("utf-8"))
+            vectors.append(np.frombuffer(data, np.float32, self._dim,
+                                         name_end))
+            offset = end
+        if offset < len(data):
+            with open(log_path, "r+b") as f:
+                f.truncate(offset)
+        if not vectors:
+            return [], np.zeros((0, self._dim), np.float32)
+        return names, np.stack(vectors)
+
+    def read(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Read the stored features.
+
+        The features matrix is memory mapped, so it is not copied to memory
+        if the log is empty (e.g. after ``compact``). Otherwise, the log
+        records are merged on a new array.
+
+        Returns:
+            Tuple[List[str], np.ndarray, np.ndarray]: The names, the float32
+                features of shape (N, F) and their squared norms of
+                shape (N).
+        """
+        names, features, sq_norms = self._read_base()
+        log_names, log_features = self._read_log()
+        if not log_names:
+            return names, features, sq_norms
+
+        name_to_idx = {name: i for i, name in enumerate(names)}
+        rows = np.empty(len(log_names), np.int64)
+        names = list(names)
+        for i, name in enumerate(log_names):
+            idx = name_to_idx.get(name)
+            if idx is None:
+                idx = len(names)
+                name_to_idx[name] = idx
+                names.append(name)
+            rows[i] = idx
+        # Keep the last record of each name
+        _, last = np.unique(rows[::-1], return_index=True)
+        last = len(rows) - 1 - last
+        rows, log_features = rows[last], log_features[last]
+        merged = np.empty((len(names), self._dim), np.float32)
+        merged[:len(features)] = features
+        merged[rows] = log_features
+        merged_norms = np.empty(len(names), np.float32)
+        merged_norms[:len(sq_norms)] = sq_norms
+        merged_norms[rows] = np.einsum("ij,ij->i", log_features,
+                                       log_features)
+        return names, merged, merged_norms
+
+    def __len__(self) -> int:
+        return len(self.read()[0])
+
+    def append(self, names: Iterable[str], features: np.ndarray):
+        """Append features to the log. They replace the stored features of
+        the same names.
+
+        Args:
+            names (Iterable[str]): Names of the features.
+            features (np.ndarray): Features vectors of shape (N, F).
+
+        Raises:
+            ValueError: If the number of names and vectors differ or their
+                size does not match the stored features.
+        """
+        names = list(names)
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.ndim != 2 or len(features) != len(names):
+            raise ValueError("Expected one features vector for each name")
+        if not names:
+            return
+        if self._dim is None:
+            # Empty store, write the first generation
+            self.write(names, features)
+            return
+        if features.shape[1] != self._dim:
+            raise ValueError(f"Expected features of size {self._dim}, got "
+                             f"{features.shape[1]}")
+
+        records = bytearray()
+        for name, vector in zip(names, features):
+            name_bytes = name.encode("utf-8")
+            records += _RECORD_HEADER.pack(len(name_bytes))
+            records += name_bytes
+            records += vector.tobytes()
+        with open(self._file("log", "bin"), "ab") as f:
+            f.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_count += len(names)
+
+        if self._max_log_ratio is not None and self._log_count > \
+                max(self._max_log_ratio * self._count, 1000):
+            self.compact()
+
+    def write(self, names: List[str], features: np.ndarray):
+        """Replace the content of the store with a new generation.
+
+        Args:
+            names (List[str]): Unique names of the features.
+            features (np.ndarray): Features vectors of shape (N, F).
+
+        Raises:
+            ValueError: If the number of names and vectors differ or the
+                names are not unique.
+        """
+        names = list(names)
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.ndim != 2 or len(features) != len(names):
+            raise ValueError("Expected one features vector for each name")
+        if len(set(names)) != len(names):
+            raise ValueError("The names of the features must be unique")
+
+        old_generation = self._generation
+        generation = old_generation + 1
+        _save_npy(self._file("features", "npy", generation), features)
+        _save_npy(self._file("norms", "npy", generation),
+                  np.einsum("ij,ij->i", features, features))
+        _write_atomic(self._file("ids", "json", generation),
+                      json.dumps(names).encode())
+        dim = features.shape[1] if len(names) else self._dim
+        manifest = {"version": _VERSION, "generation": generation,
+                    "dim": dim, "count": len(names)}
+        # Switching the manifest commits the new generation
+        _write_atomic(self._path / _MANIFEST, json.dumps(manifest).encode())
+        self._generation = generation
+        self._dim = dim
+        self._count = len(names)
+        self._log_count = 0
+        self._remove_generation(old_generation)
+
+    def compact(self):
+        """Merge the log into a new generation of the features matrix.
+        """
+        if self._log_count == 0:
+            return
+        names, features, _ = self.read()
+        self.write(names, features)
+
+    def _remove_generation(self, generation: int):
+        """Remove the files of an old generation. The files still opened as
+        memory maps can not be removed on some systems, they are left on
+        disk.
+        """
+        for name, suffix in (("features", "npy"), ("norms", "npy"),
+                             ("ids", "json"), ("log", "bin")):
+            try:
+                self._file(name, suffix, generation).unlink()
+            except OSError:
+                pass
+
+    def import_pickle(self, pickle_path: Path):
+        """Replace the content of the store with the features of a pickle
+        file with a dict of name to features vector.
+
+        Args:
+            pickle_path (Path): Path to the pickle file (.pkl).
+        """
+        with open(pickle_path, "rb") as f:
+            features: Dict[str, np.ndarray] = pickle.load(f)
+        dim = len(next(iter(features.values()))) if features else 0
+        self.write(list(features), np.array(list(features.values()),
+                                             dtype=np.float32)
+                   .reshape(len(features), dim))
+
+    def export_pickle(self, pickle_path: Path):
+        """Save the stored features to a pickle file with a dict of name to
+        features vector.
+
+        Args:
+            pickle_path (Path): Output pickle file path (.pkl).
+        """
+        names, features, _ = self.read()
+        with open(pickle_path, "wb") as f:
+            pickle.dump({name: np.array(vector) for name, vector in
+                         zip(names, features)}, f)
@@ -0,0 +1,361 @@
+from typing import Dict, Iterable, List, Literal, Optional, Tuple
+
+import numpy as np
+
+# Number of queries whose distances to the whole gallery are computed at once
+_QUERY_BLOCK_SIZE = 64
+
+
+class Gallery:
+    """Store of named features vectors searched by Euclidean distance.
+
+    The features are held in a contiguous float32 matrix with their
+    precomputed squared norms, so the squared distances from a batch of
+    queries to the whole gallery are computed with a single matrix
+    product: ``|q|^2 + |g|^2 - 2 q g^T``.
+
+    With the "ivf" index, the gallery is partitioned with k-means into
+    ``num_lists`` inverted lists and only the vectors of the ``num_probes``
+    lists closest to each query are compared. This is an approximate search:
+    a match whose vector falls in a list that is not probed is missed.
+    """
+
+    def __init__(self, index: Literal["exact", "ivf"] = "exact",
+                 num_lists: Optional[int] = None, num_probes: int = 8,
+                 min_ivf_size: int = 10000):
+        """Create an empty gallery.
+
+        Args:
+            index (Literal["exact", "ivf"], optional): Compare the queries
+                with all the gallery vectors ("exact") or only with the ones
+                of the closest inverted lists ("ivf"). Defaults to "exact".
+            num_lists (Optional[int], optional): Number of inverted lists of
+                the "ivf" index. None to use the square root of the gallery
+                size. Defaults to None.
+            num_probes (int, optional): Number of inverted lists searched for
+                each query by the "ivf" index. Defaults to 8.
+            min_ivf_size (int, optional): Galleries smaller than this are
+                searched exhaustively even with the "ivf" index.
+                Defaults to 10000.
+
+        Raises:
+            ValueError: If ``index`` is not "exact" or "ivf".
+        """
+        if index not in ("exact", "ivf"):
+            raise ValueError("``index`` should be one of 'exact' or 'ivf'")
+        self._index = index
+        self._num_lists = num_lists
+        self._num_probes = max(num_probes, 1)
+        self._min_ivf_size = min_ivf_size
+
+        self._names: List[str] = []
+        self._name_to_idx: Dict[str, int] = {}
+        self._features = np.zeros((0, 0), np.float32)
+        self._sq_norms = np.zeros(0, np.float32)
+        self._size = 0
+
+        # Inverted file index, built lazily on the first search
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, np.int64)
+        self._list_order: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._name_to_idx
+
+    @property
+    def names(self) -> List[str]:
+        """Names of the stored features, in insertion order.
+        """
+        return list(self._names)
+
+    @property
+    def features(self) -> np.ndarray:
+        """The stored features as a float32 array of shape (N, F).
+        """
+        return self._features[:self._size]
+
+    def _reserve(self, size: int, dim: int):
+        """Grow the features matrix to hold at least ``size`` vectors.
+        Read-only arrays (e.g. memory maps) are copied to memory before being
+        modified.
+        """
+        if self._features.shape[1] != dim:
+            if self._size > 0:
+                raise ValueError(f"Expected features of size "
+                                 f"{self._features.shape[1]}, got {dim}")
+            self._features = np.zeros((0, dim), np.float32)
+        capacity = len(self._features)
+        writeable = self._features.flags.writeable and \
+            self._sq_norms.flags.writeable
+        if size <= capacity and writeable:
+            return
+        if size > capacity:
+            capacity = max(size, 2 * capacity, 16)
+        features = np.zeros((capacity, dim), np.float32)
+        features[:self._size] = self._features[:self._size]
+        self._features = features
+        sq_norms = np.zeros(capacity, np.float32)
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        self._sq_norms = sq_norms
+
+    def add(self, name: str, features: np.ndarray):
+        """Add a features vector. It replaces the previous vector of the same
+        name.
+
+        Args:
+            name (str): Name associated with the features.
+            features (np.ndarray): A features vector.
+        """
+        self.add_batch([name], np.asarray(features)[None])
+
+    def add_batch(self, names: Iterable[str], features: np.ndarray):
+        """Add multiple features vectors. They replace the previous vectors of
+        the same names.
+
+        Args:
+            names (Iterable[str]): Names associated with the features.
+            features (np.ndarray): Features vectors of shape (N, F).
+
+        Raises:
+            ValueError: If the number of names and vectors differ or their
+                size does not match the stored features.
+        """
+        names = list(names)
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim != 2 or len(features) != len(names):
+            raise ValueError("Expected one features vector for each name")
+        if not names:
+            return
+        self._reserve(self._size + len(names), features.shape[1])
+
+        rows = np.empty(len(names), np.int64)
+        for i, name in enumerate(names):
+            idx = self._name_to_idx.get(name)
+            if idx is None:
+                idx = self._size
+                self._name_to_idx[name] = idx
+                self._names.append(name)
+                self._size += 1
+            rows[i] = idx
+        # Keep the last vector of each name
+        _, last = np.unique(rows[::-1], return_index=True)
+        last = len(rows) - 1 - last
+        rows, features = rows[last], features[last]
+        self._features[rows] = features
+        self._sq_norms[rows] = np.einsum("ij,ij->i", features, features)
+
+        if self._centroids is not None:
+            # Assign the new vectors to the current lists, the centroids are
+            # trained again when the gallery doubles its size
+            assignments = np.zeros(self._size, np.int64)
+            assignments[:len(self._assignments)] = self._assignments
+            nearest = self._nearest_lists(self._features[rows], 1)
+            assignments[rows] = nearest[:, 0]
+            self._assignments = assignments
+            self._list_order = None
+            if self._size > 2 * self._trained_size:
+                self._centroids = None
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        """Get the stored features as a dict of name to features vector.
+        """
+        return {name: self._features[i].copy()
+                for i, name in enumerate(self._names)}
+
+    @classmethod
+    def from_dict(cls, features: Dict[str, np.ndarray], **kwargs
+                  ) -> "Gallery":
+        """Create a gallery from a dict of name to features vector.
+
+        Args:
+            features (Dict[str, np.ndarray]): The features of each name.
+            **kwargs: Arguments of the ``Gallery`` constructor.
+
+        Returns:
+            Gallery: The gallery with the features.
+        """
+        gallery = cls(**kwargs)
+        if features:
+            gallery.add_batch(
+                list(features), np.stack([np.asarray(f) for f in
+                                          features.values()]))
+        return gallery
+
+    @classmethod
+    def from_arrays(cls, names: List[str], features: np.ndarray,
+                    sq_norms: Optional[np.ndarray] = None, **kwargs
+                    ) -> "Gallery":
+        """Create a gallery that searches the given arrays without copying
+        them, e.g. the memory-mapped matrix of a ``FeaturesStore``. Read-only
+        arrays are copied to memory the first time the gallery is modified.
+
+        Args:
+            names (List[str]): Unique names of the features.
+            features (np.ndarray): Float32 features of shape (N, F).
+            sq_norms (Optional[np.ndarray], optional): The squared norms of
+                the features of shape (N). None to compute them.
+                Defaults to None.
+            **kwargs: Arguments of the ``Gallery`` constructor.
+
+        Raises:
+            ValueError: If the number of names and vectors differ or the
+                names are not unique.
+
+        Returns:
+            Gallery: The gallery with the features.
+        """
+        names = list(names)
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.ndim != 2 or len(features) != len(names):
+            raise ValueError("Expected one features vector for each name")
+        if len(set(names)) != len(names):
+            raise ValueError("The names of the features must be unique")
+        if sq_norms is None:
+            sq_norms = np.einsum("ij,ij->i", features, features)
+        gallery = cls(**kwargs)
+        gallery._names = names
+        gallery._name_to_idx = {name: i for i, name in enumerate(names)}
+        gallery._features = features
+        gallery._sq_norms = np.ascontiguousarray(sq_norms, dtype=np.float32)
+        gallery._size = len(names)
+        return gallery
+
+    def _squared_distances(self, queries: np.ndarray,
+                           rows: Optional[np.ndarray] = None
+                           ) -> np.ndarray:
+        """Squared Euclidean distances from the queries (Q, F) to the gallery
+        vectors ``rows`` (all the gallery if None), of shape (Q, R).
+        """
+        if rows is None:
+            features = self._features[:self._size]
+            sq_norms = self._sq_norms[:self._size]
+        else:
+            features = self._features[rows]
+            sq_norms = self._sq_norms[rows]
+        q_sq_norms = np.einsum("ij,ij->i", queries, queries)
+        dist = queries @ features.T
+        dist *= -2
+        dist += q_sq_norms[:, None]
+        dist += sq_norms[None, :]
+        # Rounding errors can give small negative values
+        np.maximum(dist, 0, out=dist)
+        return dist
+
+    def _train_ivf(self):
+        """Partition the gallery in inverted lists with k-means.
+        """
+        features = self._features[:self._size]
+        num_lists = self._num_lists or int(np.sqrt(self._size))
+        num_lists = int(np.clip(num_lists, 1, self._size))
+        rng = np.random.RandomState(0)
+        # Train on a sample of the gallery
+        sample_size = min(self._size, 64 * num_lists)
+        sample = features[rng.choice(self._size, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, num_lists, replace=False)]
+        centroids_sq = np.einsum("ij,ij->i", centroids, centroids)
+        sample_sq = np.einsum("ij,ij->i", sample, sample)
+        for _ in range(10):
+            dist = sample_sq[:, None] + centroids_sq[None, :] \
+                - 2 * sample @ centroids.T
+            labels = np.argmin(dist, axis=1)
+            counts = np.bincount(labels, minlength=num_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            # Empty lists keep their previous centroid
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / \
+                counts[non_empty, None]
+            centroids_sq = np.einsum("ij,ij->i", centroids, centroids)
+        self._centroids = centroids
+        self._trained_size = self._size
+        self._assignments = np.concatenate([
+            self._nearest_lists(features[i:i + 4096], 1)[:, 0]
+            for i in range(0, self._size, 4096)
+        ])
+        self._list_order = None
+
+    def _nearest_lists(self, queries: np.ndarray, num_probes: int
+                       ) -> np.ndarray:
+        """Indices of the ``num_probes`` closest inverted lists of each query,
+        of shape (Q, num_probes).
+        """
+        centroids_sq = np.einsum("ij,ij->i", self._centroids, self._centroids)
+        dist = centroids_sq[None, :] - 2 * queries @ self._centroids.T
+        num_probes = min(num_probes, len(self._centroids))
+        if num_probes == len(self._centroids):
+            return np.argsort(dist, axis=1)
+        return np.argpartition(dist, num_probes - 1, axis=1)[:, :num_probes]
+
+    def _candidates(self, lists: np.ndarray) -> np.ndarray:
+        """Gallery rows stored in the given inverted lists.
+        """
+        if self._list_order is None:
+            self._list_order = np.argsort(self._assignments, kind="stable")
+            counts = np.bincount(self._assignments,
+                                 minlength=len(self._centroids))
+            self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return np.concatenate([
+            self._list_order[self._list_offsets[i]:self._list_offsets[i + 1]]
+            for i in lists
+        ])
+
+    def _select(self, dist: np.ndarray, rows: Optional[np.ndarray],
+                max_distance: float, top_k: Optional[int]
+                ) -> List[Tuple[str, float]]:
+        """Select the rows below ``max_distance`` sorted by distance.
+        """
+        matches = np.flatnonzero(dist < max_distance)
+        if top_k is not None and 0 < top_k < len(matches):
+            part = np.argpartition(dist[matches], top_k - 1)[:top_k]
+            matches = matches[part]
+        matches = matches[np.argsort(dist[matches], kind="stable")]
+        if rows is not None:
+            names = [self._names[rows[i]] for i in matches]
+        else:
+            names = [self._names[i] for i in matches]
+        return [(name, float(d)) for name, d in zip(names, dist[matches])]
+
+    def search(self, queries: np.ndarray, max_distance: float,
+               top_k: Optional[int] = None
+               ) -> List[List[Tuple[str, float]]]:
+        """Search the gallery vectors whose squared Euclidean distance to
+        each query is lower than ``max_distance``.
+
+        Args:
+            queries (np.ndarray): Features vectors of shape (Q, F).
+            max_distance (float): Maximum squared Euclidean distance of the
+                matches (not included).
+            top_k (Optional[int], optional): Maximum number of matches of
+                each query. None to return all of them. Defaults to None.
+
+        Returns:
+            List[List[Tuple[str, float]]]: The name and squared distance of
+                the matches of each query, sorted from the closest to the
+                farthest.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self._size == 0:
+            return [[] for _ in range(len(queries))]
+
+        if self._index == "ivf" and self._size >= self._min_ivf_size:
+            if self._centroids is None:
+                self._train_ivf()
+            results = []
+            lists = self._nearest_lists(queries, self._num_probes)
+            for query, query_lists in zip(queries, lists):
+                rows = self._candidates(query_lists)
+                dist = self._squared_distances(query[None], rows)[0]
+                results.append(self._select(dist, rows, max_distance, top_k))
+            return results
+
+        results = []
+        for i in range(0, len(queries), _QUERY_BLOCK_SIZE):
+            dist = self._squared_distances(queries[i:i + _QUERY_BLOCK_SIZE])
+            results.extend(self._select(d, None, max_distance, top_k)
+                           for d in dist)
+        return results
@@ -1,8 +1,9 @@
-from typing import List
+from typing import List, Optional
 
 from toolbox import DataModels
-from toolbox.Models import model_catalog
-from toolbox.Structures import BoundingBox, Image
+from toolbox.Models import create_model
+from toolbox.Structures import BoundingBox, Image, Instance
+from toolbox.utils.prediction_cache import create_prediction_cache
 from toolbox.utils.utils import float_or_none, get_logger
 
 logger = get_logger("toolbox.AgeGender")
@@ -22,14 +23,62 @@ class AgeGender:
         ag_params = config["age_gender"]["params"]
         logger.info(f"Loading age-gender model: {ag_model}")
         logger.debug(f"Age-gender params: {ag_params}")
-        self._ag_predictor = model_catalog[ag_model](**ag_params)
+        self._ag_predictor = create_model(
+            ag_model, ag_params,
+            config["age_gender"].get("num_workers", 0),
+            config["age_gender"].get("num_replicas", 1),
+            autotune=config["age_gender"].get("autotune"),
+            warmup=config["age_gender"].get("warmup"))
 
         face_model = config["face_detector"]["model_name"]
         face_params = config["face_detector"]["params"]
         logger.info(f"Loading face detector model: {face_model}")
         logger.debug(f"Face detector params {face_params}")
-        self._face_detector = model_catalog[face_model](**face_params)
+        self._face_detector = create_model(
+            face_model, face_params,
+            config["face_detector"].get("num_workers", 0),
+            config["face_detector"].get("num_replicas", 1),
+            config["face_detector"].get("tiling"),
+            autotune=config["face_detector"].get("autotune"),
+            warmup=config["face_detector"].get("warmup"))
         self._scale_bb = config["face_detector"]["face_box_scale"]
+        self._cache = create_prediction_cache(
+            config, f"{face_model}+{ag_model}",
+            {k: config[k] for k in ("face_detector", "age_gender")})
+
+    def _predict_crops(self, image: Image, bounding_boxes: List[BoundingBox]
+                       ) -> List[Optional[Instance]]:
+        """Predict the age and gender of multiple faces of an image in a
+        single batch.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+            bounding_boxes (List[BoundingBox]): The bounding boxes of the
+                faces. None to use the whole image.
+
+        Returns:
+            List[Optional[Instance]]: The age and gender Instance of each face
+                or None if its scaled bounding box is empty.
+        """
+        crops = []
+        indices = []
+        for i, bb in enumerate(bounding_boxes):
+            if bb is None:
+                crops.append(image.image)
+                indices.append(i)
+                continue
+            scaled_bb = bb.scale(self._scale_bb)
+            if scaled_bb.is_empty():
+                continue
+            crops.append(scaled_bb.crop_image(image.image))
+            indices.append(i)
+
+        ag_instances = [None] * len(bounding_boxes)
+        if crops:
+            for i, ag_instance in zip(indices,
+                                      self._ag_predictor.predict(crops)):
+                ag_instances[i] = ag_instance
+        return ag_instances
 
     def update_face(self, image: Image, face: DataModels.Face
                     ) -> DataModels.Face:
@@ -43,24 +92,38 @@ class AgeGender:
             DataModels.Face: The same Face data model with the age and gender
                 attributes updated.
         """
-        image = image.image
-        bb = face.bounding_box
-        if bb is not None:
-            scaled_bb = bb.scale(self._scale_bb)
-            if scaled_bb.is_empty():
-                return face
-            image = scaled_bb.crop_image(image)
-        ag_instance = self._ag_predictor.predict(image)[0]
-        face.age = float_or_none(ag_instance.get("age"))
-        face.gender = ag_instance.get("gender")
-        face.gender_confidence = float_or_none(
-            ag_instance.get("gender_confidence"))
-        assert face.gender is not None or face.age is not None, (
-            face.gender, face.age)
-        return face
+        return self.update_faces(image, [face])[0]
+
+    def update_faces(self, image: Image, faces: List[DataModels.Face]
+                     ) -> List[DataModels.Face]:
+        """Predict the age and gender of multiple face data models of the same
+        image in a single batch.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+            faces (List[DataModels.Face]): Face data model objects.
+
+        Returns:
+            List[DataModels.Face]: The same Face data models with the age and
+                gender attributes updated.
+        """
+        ag_instances = self._predict_crops(
+            image, [face.bounding_box for face in faces])
+        for face, ag_instance in zip(faces, ag_instances):
+            if ag_instance is None:
+                continue
+            face.age = float_or_none(ag_instance.get("age"))
+            face.gender = ag_instance.get("gender")
+            face.gender_confidence = float_or_none(
+                ag_instance.get("gender_confidence"))
+            assert face.gender is not None or face.age is not None, (
+                face.gender, face.age)
+        return faces
 
     def predict(self, image: Image) -> List[DataModels.Face]:
-        """Predict the position, age and gender of faces in an image.
+        """Predict the position, age and gender of faces in an image. The
+        results of identical images are reused if the prediction cache is
+        enabled.
 
         Args:
             image (toolbox.Structures.Image): An Image object.
@@ -68,22 +131,28 @@ class AgeGender:
         Returns:
             List[DataModels.Face]: A list of Face data models.
         """
+        if self._cache is not None:
+            return self._cache.predict(image, self._predict)
+        return self._predict(image)
+
+    def _predict(self, image: Image) -> List[DataModels.Face]:
+        """Predict the faces of an image without the prediction cache.
+        """
         face_instances = self._face_detector.predict(image.image)
+        ag_instances = self._predict_crops(
+            image, [ins.bounding_box for ins in face_instances])
 
         data_models = []
-        for face_instance in face_instances:
-            bb: BoundingBox = face_instance.bounding_box
-            scaled_bb = bb.scale(self._scale_bb)
-            if scaled_bb.is_empty():
+        for face_instance, ag_instance in zip(face_instances, ag_instances):
+            if ag_instance is None:
                 continue
-            face_crop = scaled_bb.crop_image(image.image)
-            ag_instance = self._ag_predictor.predict(face_crop)[0]
             dm = DataModels.Face(
-                bounding_box=bb,
+                bounding_box=face_instance.bounding_box,
                 detection_confidence=float(face_instance.confidence),
-                age=float(ag_instance.get("age")),
+                age=float_or_none(ag_instance.get("age")),
                 gender=ag_instance.get("gender"),
-                gender_confidence=float(ag_instance.get("gender_confidence")),
+                gender_confidence=float_or_none(
+                    ag_instance.get("gender_confidence")),
                 image=image.id
             )
             data_models.append(dm)
@@ -22,6 +22,10 @@ class AgeGenderApi(ApiBase):
         super()._initialize(args)
         self._post_new_entity = self.config["api"]["post_new_entity"]
         self._update_entity = self.config["api"]["update_entity"]
+
+    def _load_models(self):
+        """Load the model.
+        """
         self._model = AgeGender(self.config)
 
     def _predict_entity(self,
@@ -49,18 +53,13 @@ class AgeGenderApi(ApiBase):
             return dms
         elif isinstance(data_model, DataModels.Face):
             # Ignore already predicted entities.
-            if data_model.age is not None or data_model.gender is not None \
-                    or data_model.gender_confidence is not None:
+            if self._is_predicted(data_model):
                 return [data_model]
             # Predict the image
             image = self._get_image_by_id(data_model.image)
             dm = self._model.update_face(image, data_model)
             if post_to_broker:
-                if self._post_new_entity:
-                    dm.id = None
-                    self.context_cli.post_data_model(dm)
-                if self._update_entity:
-                    self.context_cli.update_data_model(dm)
+                self._post_face(dm)
             return [dm]
         else:
             raise HTTPException(
@@ -68,6 +67,55 @@ class AgeGenderApi(ApiBase):
                 f"Unprocessable entity type: {type(data_model)}"
             )
 
+    def _is_predicted(self, face: DataModels.Face) -> bool:
+        """Check if the age or gender of a Face data model are set.
+        """
+        return face.age is not None or face.gender is not None \
+            or face.gender_confidence is not None
+
+    def _post_face(self, face: DataModels.Face):
+        """Post or update an updated Face data model on the context broker.
+        """
+        if self._post_new_entity:
+            face.id = None
+            self.context_cli.post_data_model(face)
+        if self._update_entity:
+            self.context_cli.update_data_model(face)
+
+    def _predict_entities(self, data_models: List[DataModels.BaseModel],
+                          post_to_broker: bool) -> List[DataModels.Face]:
+        """Predict the Face data models of the same image as a single batch.
+
+        Args:
+            data_models (List[DataModels.BaseModel]): The data models to
+                predict.
+            post_to_broker (bool): Post the predicted data models to the
+                context broker.
+
+        Returns:
+            List[DataModels.Face]: The predicted Face data models.
+        """
+        faces = {}
+        others = []
+        for dm in data_models:
+            if isinstance(dm, DataModels.Face) and not self._is_predicted(dm):
+                faces.setdefault(dm.image, []).append(dm)
+            else:
+                others.append(dm)
+
+        predicted = []
+        for image_id, face_dms in faces.items():
+            try:
+                image = self._get_image_by_id(image_id)
+            except HTTPException as e:
+                logger.error(str(e))
+                continue
+            for dm in self._model.update_faces(image, face_dms):
+                if post_to_broker:
+                    self._post_face(dm)
+                predicted.append(dm)
+        return predicted + super()._predict_entities(others, post_to_broker)
+
 
 def main():
     api = AgeGenderApi()
@@ -1,8 +1,9 @@
 from typing import List
 
 from toolbox import DataModels
-from toolbox.Models import model_catalog
-from toolbox.Structures import BoundingBox, Image
+from toolbox.Models import create_model
+from toolbox.Structures import BoundingBox, Image, Instance
+from toolbox.utils.prediction_cache import create_prediction_cache
 from toolbox.utils.utils import get_logger
 
 logger = get_logger("toolbox.FaceDetection")
@@ -22,19 +23,27 @@ class FaceDetection:
         model_params = config["face_detector"]["params"]
         logger.info(f"Loading face detector model: {model_name}")
         logger.debug(f"Face detector params {model_params}")
-        self._face_detector = model_catalog[model_name](**model_params)
+        self._face_detector = create_model(
+            model_name, model_params,
+            config["face_detector"].get("num_workers", 0),
+            config["face_detector"].get("num_replicas", 1),
+            config["face_detector"].get("tiling"),
+            autotune=config["face_detector"].get("autotune"),
+            warmup=config["face_detector"].get("warmup"))
+        self._cache = create_prediction_cache(
+            config, model_name, config["face_detector"])
 
-    def predict(self, image: Image) -> List[DataModels.Face]:
-        """Predict the position of faces on an image.
+    def _create_data_models(self, image: Image, face_instances: List[Instance]
+                            ) -> List[DataModels.Face]:
+        """Create the Face data models of the faces detected on an image.
 
         Args:
-            image (toolbox.Structures.Image): An Image object.
+            image (toolbox.Structures.Image): The predicted Image object.
+            face_instances (List[Instance]): The output of the face detector.
 
         Returns:
             List[DataModels.Face]: A list of Face data models.
         """
-        face_instances = self._face_detector.predict(image.image)
-
         data_models = []
         for face_instance in face_instances:
             bb: BoundingBox = face_instance.bounding_box
@@ -48,3 +57,56 @@ class FaceDetection:
             data_models.append(dm)
 
         return data_models
+
+    def predict(self, image: Image) -> List[DataModels.Face]:
+        """Predict the position of faces on an image. The results of
+        identical images are reused if the prediction cache is enabled.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+
+        Returns:
+            List[DataModels.Face]: A list of Face data models.
+        """
+        if self._cache is not None:
+            return self._cache.predict(image, self._predict)
+        return self._predict(image)
+
+    def _predict(self, image: Image) -> List[DataModels.Face]:
+        """Predict the faces of an image without the prediction cache.
+        """
+        face_instances = self._face_detector.predict(image.image)
+        return self._create_data_models(image, face_instances)
+
+    def predict_batch(self, images: List[Image]
+                      ) -> List[List[DataModels.Face]]:
+        """Predict the position of faces on multiple images. The images are
+        run as a batch if the face detector supports it.
+
+        Args:
+            images (List[toolbox.Structures.Image]): A list of Image objects.
+
+        Returns:
+            List[List[DataModels.Face]]: A list of Face data models for
+                each image.
+        """
+        if self._cache is not None:
+            return self._cache.predict_batch(images, self._predict_batch)
+        return self._predict_batch(images)
+
+    def _predict_batch(self, images: List[Image]
+                       ) -> List[List[DataModels.Face]]:
+        """Predict the faces of multiple images without the prediction
+        cache.
+        """
+        if hasattr(self._face_detector, "predict_batch"):
+            batch_instances = self._face_detector.predict_batch(
+                [image.image for image in images])
+        else:
+            batch_instances = [
+                self._face_detector.predict(image.image) for image in images
+            ]
+        return [
+            self._create_data_models(image, face_instances)
+            for image, face_instances in zip(images, batch_instances)
+        ]
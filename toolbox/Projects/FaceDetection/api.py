@@ -1,4 +1,3 @@
-import argparse
 from typing import List, Union
 
 from fastapi import HTTPException, status
@@ -18,10 +17,9 @@ class FaceDetectionApi(ApiBase):
     def __init__(self):
         super().__init__(DataModels.Face)
 
-    def _initialize(self, args: argparse.Namespace):
-        """Initialize the model.
+    def _load_models(self):
+        """Load the model.
         """
-        super()._initialize(args)
         self._model = FaceDetection(self.config)
 
     def _predict_entity(self,
@@ -53,6 +51,38 @@ class FaceDetectionApi(ApiBase):
                 f"Unprocessable entity type: {type(data_model)}"
             )
 
+    def _predict_entities(self, data_models: List[DataModels.BaseModel],
+                          post_to_broker: bool) -> List[DataModels.Face]:
+        """Predict the Image data models as a single batch.
+
+        Args:
+            data_models (List[DataModels.BaseModel]): The data models to
+                predict.
+            post_to_broker (bool): Post the predicted data models to the
+                context broker.
+
+        Returns:
+            List[DataModels.Face]: The predicted Face data models.
+        """
+        images = []
+        others = []
+        for dm in data_models:
+            if not isinstance(dm, DataModels.Image):
+                others.append(dm)
+                continue
+            try:
+                images.append(self._get_image_from_dm(dm))
+            except HTTPException as e:
+                logger.error(str(e))
+
+        predicted = []
+        if images:
+            for dms in self._model.predict_batch(images):
+                if post_to_broker:
+                    [self.context_cli.post_data_model(dm) for dm in dms]
+                predicted += dms
+        return predicted + super()._predict_entities(others, post_to_broker)
+
 
 def main():
     api = FaceDetectionApi()
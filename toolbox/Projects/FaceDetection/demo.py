@@ -19,6 +19,10 @@ class Demo(DemoBase):
         data_models = self.model.predict(image)
         return data_models
 
+    def _process_images(self, images: List[Image]
+                        ) -> List[List[DataModels.Face]]:
+        return self.model.predict_batch(images)
+
     def _consume_data_model(self, data_model: Type[DataModels.BaseModel]
                             ) -> List[DataModels.Face]:
         if isinstance(data_model, DataModels.Image):
@@ -1,8 +1,9 @@
-from typing import List
+from typing import List, Optional
 
 from toolbox import DataModels
-from toolbox.Models import model_catalog
-from toolbox.Structures import BoundingBox, Image
+from toolbox.Models import create_model
+from toolbox.Structures import BoundingBox, Image, Instance
+from toolbox.utils.prediction_cache import create_prediction_cache
 from toolbox.utils.utils import get_logger
 
 logger = get_logger("toolbox.FaceEmotions")
@@ -22,14 +23,62 @@ class FaceEmotions:
         emo_params = config["face_emotions"]["params"]
         logger.info(f"Loading age-gender model: {emo_model}")
         logger.debug(f"Age-gender params: {emo_params}")
-        self._emotions_classifier = model_catalog[emo_model](**emo_params)
+        self._emotions_classifier = create_model(
+            emo_model, emo_params,
+            config["face_emotions"].get("num_workers", 0),
+            config["face_emotions"].get("num_replicas", 1),
+            autotune=config["face_emotions"].get("autotune"),
+            warmup=config["face_emotions"].get("warmup"))
 
         face_model = config["face_detector"]["model_name"]
         face_params = config["face_detector"]["params"]
         logger.info(f"Loading face detector model: {face_model}")
         logger.debug(f"Face detector params {face_params}")
-        self._face_detector = model_catalog[face_model](**face_params)
+        self._face_detector = create_model(
+            face_model, face_params,
+            config["face_detector"].get("num_workers", 0),
+            config["face_detector"].get("num_replicas", 1),
+            config["face_detector"].get("tiling"),
+            autotune=config["face_detector"].get("autotune"),
+            warmup=config["face_detector"].get("warmup"))
         self._scale_bb = config["face_detector"]["face_box_scale"]
+        self._cache = create_prediction_cache(
+            config, f"{face_model}+{emo_model}",
+            {k: config[k] for k in ("face_detector", "face_emotions")})
+
+    def _predict_crops(self, image: Image, bounding_boxes: List[BoundingBox]
+                       ) -> List[Optional[Instance]]:
+        """Predict the emotion of multiple faces of an image in a single
+        batch.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+            bounding_boxes (List[BoundingBox]): The bounding boxes of the
+                faces. None to use the whole image.
+
+        Returns:
+            List[Optional[Instance]]: The emotion Instance of each face or
+                None if its scaled bounding box is empty.
+        """
+        crops = []
+        indices = []
+        for i, bb in enumerate(bounding_boxes):
+            if bb is None:
+                crops.append(image.image)
+                indices.append(i)
+                continue
+            scaled_bb = bb.scale(self._scale_bb)
+            if scaled_bb.is_empty():
+                continue
+            crops.append(scaled_bb.crop_image(image.image))
+            indices.append(i)
+
+        emo_instances = [None] * len(bounding_boxes)
+        if crops:
+            for i, emo_instance in zip(
+                    indices, self._emotions_classifier.predict(crops)):
+                emo_instances[i] = emo_instance
+        return emo_instances
 
     def update_face(self, image: Image, face: DataModels.Face
                     ) -> DataModels.Face:
@@ -43,20 +92,34 @@ class FaceEmotions:
             DataModels.Face: The same Face data model with the emotions
                 attributes updated.
         """
-        image = image.image
-        bb = face.bounding_box
-        if bb is not None:
-            scaled_bb = bb.scale(self._scale_bb)
-            if scaled_bb.is_empty():
-                return face
-            image = scaled_bb.crop_image(image)
-        emo_instance = self._emotions_classifier.predict(image)[0]
-        face.emotion = emo_instance.emotion
-        face.emotion_confidence = float(emo_instance.confidence)
-        return face
+        return self.update_faces(image, [face])[0]
+
+    def update_faces(self, image: Image, faces: List[DataModels.Face]
+                     ) -> List[DataModels.Face]:
+        """Predict the emotion of multiple Face data models of the same image
+        in a single batch.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+            faces (List[DataModels.Face]): Face data model objects.
+
+        Returns:
+            List[DataModels.Face]: The same Face data models with the emotions
+                attributes updated.
+        """
+        emo_instances = self._predict_crops(
+            image, [face.bounding_box for face in faces])
+        for face, emo_instance in zip(faces, emo_instances):
+            if emo_instance is None:
+                continue
+            face.emotion = emo_instance.emotion
+            face.emotion_confidence = float(emo_instance.confidence)
+        return faces
 
     def predict(self, image: Image) -> List[DataModels.Face]:
-        """Predicts the position and the emotion of faces on an image.
+        """Predicts the position and the emotion of faces on an image. The
+        results of identical images are reused if the prediction cache is
+        enabled.
 
         Args:
             image (toolbox.Structures.Image): An Image object.
@@ -64,18 +127,23 @@ class FaceEmotions:
         Returns:
             List[DataModels.Face]: A list of Face data models.
         """
+        if self._cache is not None:
+            return self._cache.predict(image, self._predict)
+        return self._predict(image)
+
+    def _predict(self, image: Image) -> List[DataModels.Face]:
+        """Predict the faces of an image without the prediction cache.
+        """
         face_instances = self._face_detector.predict(image.image)
+        emo_instances = self._predict_crops(
+            image, [ins.bounding_box for ins in face_instances])
 
         data_models = []
-        for face_instance in face_instances:
-            bb: BoundingBox = face_instance.bounding_box
-            scaled_bb = bb.scale(self._scale_bb)
-            if scaled_bb.is_empty():
+        for face_instance, emo_instance in zip(face_instances, emo_instances):
+            if emo_instance is None:
                 continue
-            face_crop = scaled_bb.crop_image(image.image)
-            emo_instance = self._emotions_classifier.predict(face_crop)[0]
             dm = DataModels.Face(
-                bounding_box=bb,
+                bounding_box=face_instance.bounding_box,
                 detection_confidence=float(face_instance.confidence),
                 emotion=emo_instance.emotion,
                 emotion_confidence=float(emo_instance.confidence),
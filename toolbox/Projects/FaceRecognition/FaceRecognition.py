@@ -1,11 +1,11 @@
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 
 from toolbox import DataModels
-from toolbox.Models import model_catalog
-from toolbox.Structures import Image
+from toolbox.Models import create_model, warmup_model
+from toolbox.Structures import BoundingBox, Image
 from toolbox.utils.utils import get_logger
 
 logger = get_logger("toolbox.FaceRecognition")
@@ -33,7 +33,8 @@ class FaceRecognition:
         rec_model = config["face_recognition"]["model_name"]
         rec_params = config["face_recognition"]["params"]
         logger.debug(f"Face recognition params {config['face_recognition']}")
-        self._face_recognition = model_catalog[rec_model](**rec_params)
+        # A single replica, the features are shared by all the requests
+        self._face_recognition = create_model(rec_model, rec_params)
         self._scale_bb = config["face_detector"]["face_box_scale"]
 
         self._do_extraction = do_extraction
@@ -42,12 +43,21 @@ class FaceRecognition:
         if do_extraction:
             logger.info("Loading face recognition model")
             self._face_recognition.load_model()
+            if config["face_recognition"].get("warmup") is not None:
+                warmup_model(self._face_recognition,
+                             **config["face_recognition"]["warmup"])
 
             face_model = config["face_detector"]["model_name"]
             face_params = config["face_detector"]["params"]
             logger.info(f"Loading face detector model: {face_model}")
             logger.debug(f"Face detector params {face_params}")
-            self._face_detector = model_catalog[face_model](**face_params)
+            self._face_detector = create_model(
+                face_model, face_params,
+                config["face_detector"].get("num_workers", 0),
+                config["face_detector"].get("num_replicas", 1),
+                config["face_detector"].get("tiling"),
+                autotune=config["face_detector"].get("autotune"),
+                warmup=config["face_detector"].get("warmup"))
 
         if do_recognition:
             self.load_dataset(Path(config["face_recognition"]["dataset_path"]))
@@ -56,6 +66,44 @@ class FaceRecognition:
         self.unknown_label = config["face_recognition"].get(
             "unknown_label", "")
 
+    def _extract_crops(self, images: List[Image],
+                       bounding_boxes: List[List[Optional[BoundingBox]]]
+                       ) -> List[List[Optional[np.ndarray]]]:
+        """Extract the features of the faces of multiple images in a single
+        batch.
+
+        Args:
+            images (List[toolbox.Structures.Image]): Image objects.
+            bounding_boxes (List[List[Optional[BoundingBox]]]): The bounding
+                boxes of the faces of each image. None to use the whole
+                image.
+
+        Returns:
+            List[List[Optional[np.ndarray]]]: The features vector of each face
+                of each image or None if its scaled bounding box is empty.
+        """
+        crops = []
+        indices = []
+        for i, (image, image_bbs) in enumerate(zip(images, bounding_boxes)):
+            for j, bb in enumerate(image_bbs):
+                if bb is None:
+                    crops.append(image.image)
+                    indices.append((i, j))
+                    continue
+                scaled_bb = bb.scale(self._scale_bb)
+                if scaled_bb.is_empty():
+                    continue
+                crops.append(scaled_bb.crop_image(image.image))
+                indices.append((i, j))
+
+        features = [[None] * len(image_bbs) for image_bbs in bounding_boxes]
+        if crops:
+            for (i, j), f in zip(
+                    indices,
+                    self._face_recognition.predict_features_batch(crops)):
+                features[i][j] = f
+        return features
+
     def update_face(self, image: Image, face: DataModels.Face
                     ) -> DataModels.Face:
         """Extract and update the features attributes of a Face data model.
@@ -68,17 +116,29 @@ class FaceRecognition:
             DataModels.Face: The same Face data model with the features
                 attributes updated.
         """
-        image = image.image
-        bb = face.bounding_box
-        if bb is not None:
-            scaled_bb = bb.scale(self._scale_bb)
-            if scaled_bb.is_empty():
-                return face
-            image = scaled_bb.crop_image(image)
-        features = self._face_recognition.predict_features(image)
-        face.features = features.tolist()
-        face.features_algorithm = self._face_recognition.algorithm_name
-        return face
+        return self.update_faces(image, [face])[0]
+
+    def update_faces(self, image: Image, faces: List[DataModels.Face]
+                     ) -> List[DataModels.Face]:
+        """Extract and update the features attributes of multiple Face data
+        models of the same image in a single batch.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+            faces (List[DataModels.Face]): DataModels.Face objects.
+
+        Returns:
+            List[DataModels.Face]: The same Face data models with the features
+                attributes updated.
+        """
+        features = self._extract_crops(
+            [image], [[face.bounding_box for face in faces]])[0]
+        for face, f in zip(faces, features):
+            if f is None:
+                continue
+            face.features = f.tolist()
+            face.features_algorithm = self._face_recognition.algorithm_name
+        return faces
 
     def predict(self, image: Image
                 ) -> List[DataModels.Face]:
@@ -90,26 +150,48 @@ class FaceRecognition:
         Returns:
             List[DataModels.Face]: A list of Face objects.
         """
-        data_models = []
+        return self.predict_batch([image])[0]
 
-        face_instances = self._face_detector.predict(image.image)
-        for face_ins in face_instances:
-            scaled_bb = face_ins.bounding_box.scale(self._scale_bb)
-            if scaled_bb.is_empty():
-                continue
-            crop = scaled_bb.crop_image(image.image)
-            features = self._face_recognition.predict_features(crop)
-            data_models.append(
-                DataModels.Face(
-                    bounding_box=face_ins.bounding_box,
-                    detection_confidence=float(face_ins.confidence),
-                    features=features.tolist(),
-                    features_algorithm=self._face_recognition.algorithm_name,
-                    image=image.id
-                )
-            )
+    def predict_batch(self, images: List[Image]
+                      ) -> List[List[DataModels.Face]]:
+        """Extract features from multiple images, but do not recognize them.
+        The features of the faces of all the images are extracted in a single
+        batch.
+
+        Args:
+            images (List[toolbox.Structures.Image]): Image objects.
+
+        Returns:
+            List[List[DataModels.Face]]: A list of Face objects for each
+                image.
+        """
+        face_instances = [self._face_detector.predict(image.image)
+                          for image in images]
+        features = self._extract_crops(
+            images,
+            [[ins.bounding_box for ins in instances]
+             for instances in face_instances]
+        )
 
-        return data_models
+        algorithm_name = self._face_recognition.algorithm_name
+        results = []
+        for image, instances, image_features in zip(images, face_instances,
+                                                    features):
+            data_models = []
+            for face_ins, f in zip(instances, image_features):
+                if f is None:
+                    continue
+                data_models.append(
+                    DataModels.Face(
+                        bounding_box=face_ins.bounding_box,
+                        detection_confidence=float(face_ins.confidence),
+                        features=f.tolist(),
+                        features_algorithm=algorithm_name,
+                        image=image.id
+                    )
+                )
+            results.append(data_models)
+        return results
 
     def recognize(self, face: DataModels.Face) -> DataModels.Face:
         """Recognize the features of a Face data model.
@@ -121,15 +203,35 @@ class FaceRecognition:
             DataModels.Face: A copy of the Face data model with the
                 recognition data updated.
         """
-        instances = self._face_recognition.recognize_features(
-            np.array(face.features)
+        return self.recognize_faces([face])[0]
+
+    def recognize_faces(self, faces: List[DataModels.Face]
+                        ) -> List[DataModels.Face]:
+        """Recognize the features of multiple Face data models in a single
+        search of the dataset.
+
+        Args:
+            faces (List[DataModels.Face]): Face data model objects. Faces
+                without features are not modified.
+
+        Returns:
+            List[DataModels.Face]: The same Face data models with the
+                recognition data updated.
+        """
+        with_features = [face for face in faces if face.features is not None]
+        if not with_features:
+            return faces
+        results = self._face_recognition.recognize_features_batch(
+            np.array([face.features for face in with_features]), top_k=1
         )
-        face.recognized_person = instances[0].name \
-            if instances else self.unknown_label
-        face.recognized_distance = instances[0].distance if instances else -1
-        face.recognized = True
-        face.recognition_domain = self.domain
-        return face
+        for face, instances in zip(with_features, results):
+            face.recognized_person = instances[0].name \
+                if instances else self.unknown_label
+            face.recognized_distance = instances[0].distance \
+                if instances else -1
+            face.recognized = True
+            face.recognition_domain = self.domain
+        return faces
 
     def register_features(self, face: DataModels.Face,
                           name: str):
@@ -146,15 +248,17 @@ class FaceRecognition:
         """Save the current face features dataset to a file.
 
         Args:
-            path (Path): Output pickle file path, ending in ".pkl".
+            path (Path): Output pickle file path, ending in ".pkl", or
+                features store folder.
         """
         self._face_recognition.save_features(path)
 
     def load_dataset(self, path: Path):
-        """Load the dataset features from a pickle file.
+        """Load the dataset features from a pickle file or a features store.
 
         Args:
-            path (Path): Path to the dataset .pkl file.
+            path (Path): Path to the dataset .pkl file or features store
+                folder.
         """
         self._face_recognition.load_features(path)
 
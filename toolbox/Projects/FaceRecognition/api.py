@@ -19,13 +19,17 @@ class FaceRecognitionApi(ApiBase):
         super().__init__(DataModels.Face)
 
     def _initialize(self, args: argparse.Namespace):
-        """Initialize the model.
+        """Initialize the API.
         """
         super()._initialize(args)
         self._do_extraction = self.config["api"]["do_feature_extraction"]
         self._do_recognition = self.config["api"]["do_feature_recognition"]
         self._update_entity = self.config["api"]["update_entity"]
         self._post_new_entity = self.config["api"]["post_new_entity"]
+
+    def _load_models(self):
+        """Load the model.
+        """
         self._model = FaceRecognition(
             self.config,
             do_extraction=self._do_extraction,
@@ -51,11 +55,9 @@ class FaceRecognitionApi(ApiBase):
         """
         if isinstance(data_model, DataModels.Image):
             image = self._get_image_from_dm(data_model)
-            dms = self._model.predict(image)
-            for dm in dms:
-                self._model.recognize(dm)
-                if post_to_broker:
-                    self.context_cli.post_data_model(dm)
+            dms = self._model.recognize_faces(self._model.predict(image))
+            if post_to_broker:
+                [self.context_cli.post_data_model(dm) for dm in dms]
             return dms
         elif isinstance(data_model, DataModels.Face):
             if data_model.recognized:
@@ -64,11 +66,7 @@ class FaceRecognitionApi(ApiBase):
             dm = self._model.update_face(image, data_model)
             self._model.recognize(dm)
             if post_to_broker:
-                if self._post_new_entity:
-                    dm.id = None
-                    self.context_cli.post_data_model(dm)
-                else:
-                    self.context_cli.update_data_model(dm)
+                self._post_face(dm)
             return [dm]
         else:
             raise HTTPException(
@@ -76,6 +74,51 @@ class FaceRecognitionApi(ApiBase):
                 f"Unprocessable entity type: {type(data_model)}"
             )
 
+    def _post_face(self, face: DataModels.Face):
+        """Post or update an updated Face data model on the context broker.
+        """
+        if self._post_new_entity:
+            face.id = None
+            self.context_cli.post_data_model(face)
+        else:
+            self.context_cli.update_data_model(face)
+
+    def _predict_entities(self, data_models: List[DataModels.BaseModel],
+                          post_to_broker: bool) -> List[DataModels.Face]:
+        """Extract and recognize the features of the Face data models of the
+        same image as a single batch.
+
+        Args:
+            data_models (List[DataModels.BaseModel]): The data models to
+                predict.
+            post_to_broker (bool): Post the predicted data models to the
+                context broker.
+
+        Returns:
+            List[DataModels.Face]: The predicted Face data models.
+        """
+        faces = {}
+        others = []
+        for dm in data_models:
+            if isinstance(dm, DataModels.Face) and not dm.recognized:
+                faces.setdefault(dm.image, []).append(dm)
+            else:
+                others.append(dm)
+
+        predicted = []
+        for image_id, face_dms in faces.items():
+            try:
+                image = self._get_image_by_id(image_id)
+            except HTTPException as e:
+                logger.error(str(e))
+                continue
+            face_dms = self._model.update_faces(image, face_dms)
+            for dm in self._model.recognize_faces(face_dms):
+                if post_to_broker:
+                    self._post_face(dm)
+                predicted.append(dm)
+        return predicted + super()._predict_entities(others, post_to_broker)
+
     def _extract_entity(self,
                         data_model: Union[DataModels.Image, DataModels.Face],
                         post_to_broker: bool) -> List[DataModels.Face]:
@@ -105,11 +148,7 @@ class FaceRecognitionApi(ApiBase):
             image = self._get_image_by_id(data_model.image)
             dm = self._model.update_face(image, data_model)
             if post_to_broker:
-                if self._post_new_entity:
-                    dm.id = None
-                    self.context_cli.post_data_model(dm)
-                else:
-                    self.context_cli.update_data_model(dm)
+                self._post_face(dm)
             return [dm]
         else:
             raise HTTPException(
@@ -144,6 +183,7 @@ class FaceRecognitionApi(ApiBase):
         ) -> Union[List[self.base_dm], Any]:
             """Extract the features of a Face or an Image entity.
             """
+            self._check_ready()
             accept = request.headers.get("accept", "application/json")
             try:
                 data_model = self.context_cli.get_entity(entity_id)
@@ -232,6 +272,7 @@ class FaceRecognitionApi(ApiBase):
         ) -> Union[self.base_dm, Any]:
             """Recognize the features of a Face entity.
             """
+            self._check_ready()
             accept = request.headers.get("accept", "application/json")
             try:
                 data_model = self.context_cli.get_entity(entity_id)
@@ -264,6 +305,7 @@ class FaceRecognitionApi(ApiBase):
             FastAPI.
         """
         app = self._set_route_get_root(app)
+        app = self._set_route_get_ready(app)
         app = self._set_route_post_notification(app)
         if self._do_extraction and self._do_recognition:
             app = self._set_route_post_predict(
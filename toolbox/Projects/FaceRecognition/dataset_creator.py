@@ -8,6 +8,7 @@ from tqdm import tqdm
 from toolbox.Projects.FaceRecognition import FaceRecognition
 from toolbox.Structures import Image
 from toolbox.utils.config_utils import parse_config
+from toolbox.utils.runtime import configure_runtime
 
 
 def parse_args() -> argparse.Namespace:
@@ -35,23 +36,33 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument(
         "-d",
         "--dataset",
-        help="Path to a dataset pickle file, to load and combine with the "
-        "current images",
+        help="Path to a dataset pickle file or features store folder, to load "
+        "and combine with the current images",
         default=None,
         type=Path
     )
     ap.add_argument(
         "-o",
         "--output",
-        help="Output pickle file to save the dataset",
+        help="Output pickle file (.pkl) or features store folder to save the "
+        "dataset. If it is the loaded features store, the new features are "
+        "appended to it",
         required=True
     )
+    ap.add_argument(
+        "-b",
+        "--batch-size",
+        help="Number of images whose faces are processed in one batch "
+        "(default 16)",
+        type=int,
+        default=16
+    )
     args = ap.parse_args()
     return args
 
 
 def main(config_path: Path, image_path: Path, dataset_path: Optional[Path],
-         output_path: Path):
+         output_path: Path, batch_size: int = 16):
 
     if image_path.is_file():
         images_path = [image_path]
@@ -60,22 +71,30 @@ def main(config_path: Path, image_path: Path, dataset_path: Optional[Path],
 
     config = parse_config(config_path)
     config["api"]
+    configure_runtime(config.get("runtime"))
 
     recognition = FaceRecognition(config, do_extraction=True)
 
     if dataset_path is not None:
         recognition.load_dataset(dataset_path)
 
-    pbar = tqdm(images_path, unit="img")
-    for image_path in pbar:
-        pbar.set_description(str(image_path))
-        dms = recognition.predict(Image(image_path))
-        if len(dms) > 1:
-            warnings.warn(
-                f"\nDetected more than one face on {image_path} ({len(dms)})"
-            )
-        recognition.register_features(
-            dms[0], image_path.stem.replace(";", ":"))
+    batch_size = max(batch_size, 1)
+    pbar = tqdm(total=len(images_path), unit="img")
+    for i in range(0, len(images_path), batch_size):
+        batch_paths = images_path[i:i + batch_size]
+        pbar.set_description(str(batch_paths[0]))
+        batch_dms = recognition.predict_batch(
+            [Image(p) for p in batch_paths])
+        for image_path, dms in zip(batch_paths, batch_dms):
+            if len(dms) > 1:
+                warnings.warn(
+                    f"\nDetected more than one face on {image_path} "
+                    f"({len(dms)})"
+                )
+            recognition.register_features(
+                dms[0], image_path.stem.replace(";", ":"))
+        pbar.update(len(batch_paths))
+    pbar.close()
 
     recognition.save_dataset(output_path)
 
@@ -86,5 +105,6 @@ if __name__ == "__main__":
         config_path=args.config,
         image_path=args.images,
         dataset_path=args.dataset,
-        output_path=args.output
+        output_path=args.output,
+        batch_size=args.batch_size
     )
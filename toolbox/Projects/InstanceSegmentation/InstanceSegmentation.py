@@ -1,8 +1,9 @@
 from typing import List
 
 from toolbox import DataModels
-from toolbox.Models import model_catalog
+from toolbox.Models import create_model
 from toolbox.Structures import Image
+from toolbox.utils.prediction_cache import create_prediction_cache
 from toolbox.utils.utils import get_logger
 
 logger = get_logger("toolbox.InstanceSegmentation")
@@ -22,7 +23,14 @@ class InstanceSegmentation:
         model_params = config["instance_segmentation"]["params"]
         logger.info(f"Loading Instance segmentation model: {model_name}")
         logger.debug(f"Instance segmentation params: {model_params}")
-        self._predictor = model_catalog[model_name](**model_params)
+        self._predictor = create_model(
+            model_name, model_params,
+            config["instance_segmentation"].get("num_workers", 0),
+            config["instance_segmentation"].get("num_replicas", 1),
+            config["instance_segmentation"].get("tiling"),
+            warmup=config["instance_segmentation"].get("warmup"))
+        self._cache = create_prediction_cache(
+            config, model_name, config["instance_segmentation"])
 
     def predict(self, image: Image
                 ) -> List[DataModels.InstanceSegmentation]:
@@ -35,19 +43,49 @@ class InstanceSegmentation:
             List[DataModels.InstanceSegmentation]: A list of
                 InstanceSegmentation objects.
         """
-        instances = self._predictor.predict(image.image)
-
-        data_models = []
-        for ins in instances:
-            data_models.append(
-                DataModels.InstanceSegmentation(
-                    mask=ins.mask,
-                    bounding_box=ins.bounding_box,
-                    label=ins.label,
-                    label_id=ins.label_id,
-                    confidence=ins.confidence,
-                    image=image.id
+        return self.predict_batch([image])[0]
+
+    def predict_batch(self, images: List[Image]
+                      ) -> List[List[DataModels.InstanceSegmentation]]:
+        """Perform instance segmentation on multiple images, which are
+        predicted by the model as a batch. The results of identical images
+        are reused if the prediction cache is enabled.
+
+        Args:
+            images (List[toolbox.Structures.Image]): A list of Image objects.
+
+        Returns:
+            List[List[DataModels.InstanceSegmentation]]: The
+                InstanceSegmentation objects of each image.
+        """
+        if self._cache is not None:
+            return self._cache.predict_batch(images, self._predict_batch)
+        return self._predict_batch(images)
+
+    def _predict_batch(self, images: List[Image]
+                       ) -> List[List[DataModels.InstanceSegmentation]]:
+        """Perform instance segmentation on multiple images without the
+        prediction cache.
+        """
+        if not images:
+            return []
+        batch_instances = self._predictor.predict_batch(
+            [image.image for image in images])
+
+        batch_data_models = []
+        for image, instances in zip(images, batch_instances):
+            data_models = []
+            for ins in instances:
+                data_models.append(
+                    DataModels.InstanceSegmentation(
+                        mask=ins.mask,
+                        bounding_box=ins.bounding_box,
+                        label=ins.label,
+                        label_id=ins.label_id,
+                        confidence=ins.confidence,
+                        image=image.id
+                    )
                 )
-            )
+            batch_data_models.append(data_models)
 
-        return data_models
+        return batch_data_models
@@ -1,4 +1,3 @@
-import argparse
 from typing import List
 
 from fastapi import HTTPException, status
@@ -18,10 +17,9 @@ class InstanceSegmentationApi(ApiBase):
     def __init__(self):
         super().__init__(DataModels.InstanceSegmentation)
 
-    def _initialize(self, args: argparse.Namespace):
-        """Initialize the model.
+    def _load_models(self):
+        """Load the model.
         """
-        super()._initialize(args)
         self._model = InstanceSegmentation(self.config)
 
     def _predict_entity(self,
@@ -52,6 +50,39 @@ class InstanceSegmentationApi(ApiBase):
                 f"Unprocessable entity type: {type(data_model)}"
             )
 
+    def _predict_entities(self, data_models: List[DataModels.BaseModel],
+                          post_to_broker: bool
+                          ) -> List[DataModels.InstanceSegmentation]:
+        """Predict the Image data models as a single batch.
+
+        Args:
+            data_models (List[DataModels.BaseModel]): The data models to
+                predict.
+            post_to_broker (bool): Post the predicted data models to the
+                context broker.
+
+        Returns:
+            List[DataModels.InstanceSegmentation]: The predicted
+                InstanceSegmentation data models.
+        """
+        images = []
+        others = []
+        for dm in data_models:
+            if isinstance(dm, DataModels.Image):
+                try:
+                    images.append(self._get_image_from_dm(dm))
+                except HTTPException as e:
+                    logger.error(str(e))
+            else:
+                others.append(dm)
+
+        predicted = []
+        for dms in self._model.predict_batch(images):
+            if post_to_broker:
+                [self.context_cli.post_data_model(dm) for dm in dms]
+            predicted += dms
+        return predicted + super()._predict_entities(others, post_to_broker)
+
 
 def main():
     api = InstanceSegmentationApi()
@@ -1,8 +1,9 @@
 from typing import List
 
 from toolbox.DataModels import PersonKeyPoints
-from toolbox.Models import model_catalog
+from toolbox.Models import create_model
 from toolbox.Structures import Image
+from toolbox.utils.prediction_cache import create_prediction_cache
 from toolbox.utils.utils import get_logger
 
 logger = get_logger("toolbox.Keypoints")
@@ -22,11 +23,19 @@ class Keypoints:
         model_params = config["keypoints"]["params"]
         logger.info(f"Loading Keypoints model: {model_name}")
         logger.debug(f"Keypoints params: {model_params}")
-        self._predictor = model_catalog[model_name](**model_params)
+        self._predictor = create_model(
+            model_name, model_params,
+            config["keypoints"].get("num_workers", 0),
+            config["keypoints"].get("num_replicas", 1),
+            config["keypoints"].get("tiling"),
+            warmup=config["keypoints"].get("warmup"))
+        self._cache = create_prediction_cache(
+            config, model_name, config["keypoints"])
 
     def predict(self, image: Image
                 ) -> List[PersonKeyPoints]:
-        """Predict person keypoints from an image.
+        """Predict person keypoints from an image. The results of identical
+        images are reused if the prediction cache is enabled.
 
         Args:
             image (toolbox.Structures.Image): An Image object.
@@ -34,6 +43,13 @@ class Keypoints:
         Returns:
             List[PersonKeyPoints]: A list of PersonKeyPoints objects.
         """
+        if self._cache is not None:
+            return self._cache.predict(image, self._predict)
+        return self._predict(image)
+
+    def _predict(self, image: Image) -> List[PersonKeyPoints]:
+        """Predict the keypoints of an image without the prediction cache.
+        """
         instances = self._predictor.predict(image.image)
 
         data_models = []
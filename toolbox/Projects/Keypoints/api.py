@@ -1,4 +1,3 @@
-import argparse
 from typing import List, Type
 
 from fastapi import HTTPException, status
@@ -18,10 +17,9 @@ class KeypointsApi(ApiBase):
     def __init__(self):
         super().__init__(DataModels.PersonKeyPoints)
 
-    def _initialize(self, args: argparse.Namespace):
-        """Initialize the model.
+    def _load_models(self):
+        """Load the model.
         """
-        super()._initialize(args)
         self._model = Keypoints(self.config)
 
     def _predict_entity(self,
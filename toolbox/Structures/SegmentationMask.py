@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from copy import deepcopy
-from typing import Optional
+from typing import List, Optional
 
 import cv2
 import numpy as np
@@ -11,6 +11,9 @@ import pycocotools.mask as Mask
 class SegmentationMask:
     """Store data about a single segmentation mask.
 
+    A mask created from an rle is only decoded when the ``mask`` attribute is
+    accessed, so it can be serialized without decoding it.
+
     Attributes:
         mask (np.ndarray): Binary mask of shape (H, W).
 
@@ -30,9 +33,56 @@ class SegmentationMask:
                 Defaults to None.
             rle (Optional[dict], optional): Encoded rle mask. Defaults to None.
         """
-        self.mask = Mask.decode(rle) if rle is not None else mask
-        self.mask = self.mask.astype(bool)
-        self.mask = np.asfortranarray(self.mask)
+        self._rle = rle
+        self._mask = None
+        if rle is None:
+            self.mask = mask
+
+    @classmethod
+    def from_tensors(cls, masks) -> List[SegmentationMask]:
+        """Create rle-encoded masks from a batch of binary torch masks. The
+        runs are computed on the tensor device and only their lengths are
+        copied to the CPU.
+
+        Args:
+            masks (torch.Tensor): Binary masks of shape (N, H, W).
+
+        Returns:
+            List[SegmentationMask]: A SegmentationMask for each mask.
+        """
+        n, h, w = masks.shape
+        if n == 0:
+            return []
+        # Column-major order, as the COCO rle
+        flat = masks.bool().permute(0, 2, 1).reshape(n, h * w)
+        changes = (flat[:, 1:] != flat[:, :-1]).nonzero().cpu().numpy()
+        first = flat[:, 0].cpu().numpy()
+        # Start of the runs of each mask
+        splits = np.searchsorted(changes[:, 0], np.arange(n + 1))
+        seg_masks = []
+        for i in range(n):
+            ends = changes[splits[i]:splits[i + 1], 1] + 1
+            bounds = np.concatenate([[0], ends, [h * w]])
+            counts = np.diff(bounds)
+            # The rle starts with the number of zeros
+            if first[i]:
+                counts = np.concatenate([[0], counts])
+            rle = Mask.frPyObjects(
+                {"size": [h, w], "counts": counts.tolist()}, h, w)
+            seg_masks.append(cls(rle=rle))
+        return seg_masks
+
+    @property
+    def mask(self) -> np.ndarray:
+        if self._mask is None:
+            self._mask = np.asfortranarray(Mask.decode(self._rle)
+                                           .astype(bool))
+        return self._mask
+
+    @mask.setter
+    def mask(self, mask: np.ndarray):
+        self._mask = np.asfortranarray(np.asarray(mask).astype(bool))
+        self._rle = None
 
     @property
     def rle(self) -> dict:
@@ -41,19 +91,27 @@ class SegmentationMask:
         Returns:
             dict: A dict with the size and rle-encoded mask.
         """
-        return Mask.encode(self.mask)
+        if self._rle is None:
+            self._rle = Mask.encode(self._mask)
+        return dict(self._rle)
 
     @property
     def area(self) -> float:
-        return np.sum(self.mask)
+        if self._mask is None:
+            return Mask.area(self._rle)
+        return np.sum(self._mask)
 
     @property
     def width(self) -> int:
-        return self.mask.shape[1]
+        if self._mask is None:
+            return self._rle["size"][1]
+        return self._mask.shape[1]
 
     @property
     def height(self) -> int:
-        return self.mask.shape[0]
+        if self._mask is None:
+            return self._rle["size"][0]
+        return self._mask.shape[0]
 
     def resize(self, width: int, height: int) -> SegmentationMask:
         """Return a resized copy of the mask.
@@ -75,6 +133,44 @@ class SegmentationMask:
             mask = self.mask
         return SegmentationMask(mask=mask)
 
+    def paste(self, x: int, y: int, width: int, height: int
+              ) -> SegmentationMask:
+        """Place the mask on a larger empty mask, e.g. to move the mask of
+        an image tile to the whole image. The new mask is built as an rle,
+        without decoding it, so its memory does not depend on its size.
+
+        Args:
+            x (int): Position of the left side of the mask.
+            y (int): Position of the top side of the mask.
+            width (int): Width of the new mask.
+            height (int): Height of the new mask.
+
+        Returns:
+            SegmentationMask: A new rle-encoded SegmentationMask object.
+        """
+        mask = self.mask[:max(height - y, 0), :max(width - x, 0)]
+        h, w = mask.shape
+        # Runs of each column, in column-major order as the COCO rle
+        padded = np.zeros((w, h + 2), np.int8)
+        padded[:, 1:-1] = mask.T
+        changes = np.diff(padded, axis=1)
+        starts_col, starts_row = np.nonzero(changes == 1)
+        ends_col, ends_row = np.nonzero(changes == -1)
+        starts = (starts_col + x) * height + starts_row + y
+        ends = (ends_col + x) * height + ends_row + y
+        if len(starts):
+            # Join the runs that continue on the next column
+            joined = ends[:-1] == starts[1:]
+            starts = starts[np.concatenate([[True], ~joined])]
+            ends = ends[np.concatenate([~joined, [True]])]
+        # The rle starts with the number of zeros
+        bounds = np.stack([starts, ends], axis=1).ravel()
+        counts = np.diff(np.concatenate([[0], bounds, [width * height]]))
+        rle = Mask.frPyObjects(
+            {"size": [height, width], "counts": counts.tolist()},
+            height, width)
+        return SegmentationMask(rle=rle)
+
     def __str__(self) -> str:
         return f"SegmentationMask ({self.width} X {self.height})"
 
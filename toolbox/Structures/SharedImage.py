@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+import threading
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from .Image import Image
+
+
+class SharedMemoryHandle:
+    """Reference-counted handle to a shared memory segment.
+
+    The segment is released when the reference count reaches zero. If the
+    handle belongs to a ``SharedImagePool`` the segment is returned to the
+    pool, otherwise it is closed and, if the handle is the owner of the
+    segment, unlinked.
+
+    Attributes:
+        shm (shared_memory.SharedMemory): The shared memory segment.
+        owner (bool): Whether this process created the segment and is
+            responsible for unlinking it.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool,
+                 pool: Optional[SharedImagePool] = None):
+        """Create a handle with a reference count of 1.
+
+        Args:
+            shm (shared_memory.SharedMemory): A shared memory segment.
+            owner (bool): Whether this process created the segment.
+            pool (Optional[SharedImagePool], optional): Pool where the segment
+                is returned when it is released. Defaults to None.
+        """
+        self.shm = shm
+        self.owner = owner
+        self._pool = pool
+        self._refcount = 1
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, size: int) -> SharedMemoryHandle:
+        """Create a new shared memory segment.
+
+        Args:
+            size (int): Size of the segment in bytes.
+
+        Returns:
+            SharedMemoryHandle: The owner handle of the new segment.
+        """
+        return cls(shared_memory.SharedMemory(create=True, size=size), True)
+
+    @classmethod
+    def attach(cls, name: str) -> SharedMemoryHandle:
+        """Attach to an existing shared memory segment.
+
+        Args:
+            name (str): Name of the segment.
+
+        Returns:
+            SharedMemoryHandle: A non-owner handle of the segment.
+        """
+        try:
+            # Python >= 3.13, do not let the resource tracker of this process
+            # unlink a segment that it does not own.
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def size(self) -> int:
+        return self.shm.size
+
+    @property
+    def refcount(self) -> int:
+        return self._refcount
+
+    def acquire(self) -> SharedMemoryHandle:
+        """Increase the reference count.
+
+        Raises:
+            ValueError: If the handle was already released.
+
+        Returns:
+            SharedMemoryHandle: Self.
+        """
+        with self._lock:
+            if self._refcount <= 0:
+                raise ValueError(f"Shared memory {self.name} is released")
+            self._refcount += 1
+        return self
+
+    def release(self):
+        """Decrease the reference count and free the segment when it reaches
+        zero.
+        """
+        with self._lock:
+            if self._refcount <= 0:
+                return
+            self._refcount -= 1
+            if self._refcount > 0:
+                return
+        if self._pool is not None:
+            self._pool._put(self)
+        else:
+            self.destroy()
+
+    def destroy(self):
+        """Close the segment and unlink it if this handle is the owner.
+        """
+        self._refcount = 0
+        try:
+            self.shm.close()
+        except BufferError:
+            # Some array views are still alive, the mapping will be freed
+            # when they are garbage collected.
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class SharedImagePool:
+    """Bounded pool of reusable shared memory segments for ``SharedImage``
+    objects.
+
+    Released segments are kept and reused by later images that fit in them,
+    avoiding the cost of creating and mapping a new segment for every frame.
+
+    Attributes:
+        max_segments (int): Maximum number of segments of the pool.
+        segment_size (int): Minimum size in bytes of the created segments.
+    """
+
+    def __init__(self, max_segments: int = 8, segment_size: int = 0):
+        """Create an empty pool.
+
+        Args:
+            max_segments (int, optional): Maximum number of segments that the
+                pool can create. Defaults to 8.
+            segment_size (int, optional): Minimum size in bytes of the created
+                segments, e.g. the size of the largest expected frame.
+                Defaults to 0.
+        """
+        if max_segments < 1:
+            raise ValueError("``max_segments`` must be greater than 0")
+        self.max_segments = max_segments
+        self.segment_size = segment_size
+        self._free: List[SharedMemoryHandle] = []
+        self._num_segments = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, size: int, timeout: Optional[float] = None
+                ) -> SharedMemoryHandle:
+        """Get a segment of at least ``size`` bytes. Blocks if all the segments
+        are in use and the pool is full.
+
+        Args:
+            size (int): Required size in bytes.
+            timeout (Optional[float], optional): Maximum time in seconds to
+                wait for a free segment. None to wait forever.
+                Defaults to None.
+
+        Raises:
+            TimeoutError: If no segment is released within ``timeout``.
+            ValueError: If the pool is closed.
+
+        Returns:
+            SharedMemoryHandle: A handle with a reference count of 1.
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ValueError("The pool is closed")
+                handle = self._pop_free(size)
+                if handle is not None:
+                    handle._refcount = 1
+                    return handle
+                if self._num_segments < self.max_segments:
+                    break
+                if self._free:
+                    # Replace the smallest free segment with a larger one
+                    self._free.pop(0).destroy()
+                    self._num_segments -= 1
+                    break
+                if not self._cond.wait(timeout):
+                    raise TimeoutError("No free shared memory segment")
+            self._num_segments += 1
+        handle = SharedMemoryHandle.create(max(size, self.segment_size, 1))
+        handle._pool = self
+        return handle
+
+    def _pop_free(self, size: int) -> Optional[SharedMemoryHandle]:
+        """Remove and return the smallest free segment that fits ``size``
+        bytes.
+        """
+        for i, handle in enumerate(self._free):
+            if handle.size >= size:
+                return self._free.pop(i)
+        return None
+
+    def _put(self, handle: SharedMemoryHandle):
+        """Return a released segment to the pool.
+        """
+        with self._cond:
+            if self._closed:
+                handle.destroy()
+                self._num_segments -= 1
+                return
+            self._free.append(handle)
+            self._free.sort(key=lambda h: h.size)
+            self._cond.notify()
+
+    @property
+    def num_segments(self) -> int:
+        """Number of segments currently allocated by the pool.
+        """
+        return self._num_segments
+
+    @property
+    def num_free(self) -> int:
+        """Number of allocated segments that are not in use.
+        """
+        return len(self._free)
+
+    def close(self):
+        """Destroy the free segments. Segments in use are destroyed when they
+        are released.
+        """
+        with self._cond:
+            self._closed = True
+            for handle in self._free:
+                handle.destroy()
+            self._num_segments -= len(self._free)
+            self._free = []
+            self._cond.notify_all()
+
+    def __enter__(self) -> SharedImagePool:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SharedImage(Image):
+    """An ``Image`` whose pixels are stored in a shared memory segment.
+
+    Pickling a ``SharedImage`` only serializes the name of the segment, the
+    shape and the dtype of the image, so it can be sent to other processes
+    without copying the pixels. The receiving process attaches to the same
+    segment.
+
+    The process that creates the image owns the segment and must keep the
+    image alive (or call ``acquire()``) until the other processes are done
+    with it. Call ``close()`` or use the image as a context manager to
+    release it.
+
+    Example:
+
+    .. code-block:: python
+
+        with SharedImagePool(max_segments=4) as pool:
+            image = SharedImage.from_array(frame, pool=pool)
+            result = process_pool.submit(predict, image).result()
+            image.close()
+    """
+
+    def __init__(self, handle: SharedMemoryHandle, shape: Tuple[int, ...],
+                 dtype: Union[str, np.dtype] = np.uint8,
+                 path: Union[str, Path] = "", id: str = ""):
+        """Create a SharedImage from a shared memory handle. Use
+        ``from_array`` to create it from a numpy array.
+
+        Args:
+            handle (SharedMemoryHandle): Handle of the segment that stores
+                the image. The SharedImage takes ownership of one reference.
+            shape (Tuple[int, ...]): Shape of the image.
+            dtype (Union[str, np.dtype], optional): Data type of the image.
+                Defaults to np.uint8.
+            path (Union[str, Path], optional): Path or URL of the image.
+                Defaults to "".
+            id (str, optional): Id of an ngsi-ld image entity.
+                Defaults to "".
+        """
+        self._handle = handle
+        self._shape = tuple(shape)
+        self._dtype = np.dtype(dtype)
+        image = np.ndarray(self._shape, self._dtype, buffer=handle.shm.buf)
+        super().__init__(path=path, image=image, id=id)
+
+    @classmethod
+    def from_array(cls, image: np.ndarray,
+                   pool: Optional[SharedImagePool] = None,
+                   path: Union[str, Path] = "", id: str = "",
+                   timeout: Optional[float] = None) -> SharedImage:
+        """Copy a numpy array into a shared memory segment.
+
+        Args:
+            image (np.ndarray): The image array.
+            pool (Optional[SharedImagePool], optional): Optional pool from
+                where to get the segment. Defaults to None.
+            path (Union[str, Path], optional): Path or URL of the image.
+                Defaults to "".
+            id (str, optional): Id of an ngsi-ld image entity.
+                Defaults to "".
+            timeout (Optional[float], optional): Maximum time in seconds to
+                wait for a free segment of the pool. None to wait forever.
+                Defaults to None.
+
+        Raises:
+            TimeoutError: If the pool has no free segment within
+                ``timeout``.
+
+        Returns:
+            SharedImage
+        """
+        if pool is not None:
+            handle = pool.acquire(image.nbytes, timeout)
+        else:
+            handle = SharedMemoryHandle.create(max(image.nbytes, 1))
+        shared = cls(handle, image.shape, image.dtype, path, id)
+        shared._image[...] = image
+        return shared
+
+    @classmethod
+    def from_image(cls, image: Image,
+                   pool: Optional[SharedImagePool] = None) -> SharedImage:
+        """Copy an ``Image`` into a shared memory segment.
+
+        Args:
+            image (Image): The image to copy. It is loaded if necessary.
+            pool (Optional[SharedImagePool], optional): Optional pool from
+                where to get the segment. Defaults to None.
+
+        Returns:
+            SharedImage
+        """
+        return cls.from_array(image.image, pool, image.path, image.id)
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory segment.
+        """
+        return self._handle.name
+
+    @property
+    def closed(self) -> bool:
+        return self._image is None
+
+    def acquire(self) -> SharedImage:
+        """Increase the reference count of the underlying segment. Each call
+        must be matched with a ``close()`` call.
+
+        Returns:
+            SharedImage: Self.
+        """
+        self._handle.acquire()
+        return self
+
+    def to_image(self) -> Image:
+        """Return a regular ``Image`` with a private copy of the pixels.
+        """
+        return Image(path=self.path, image=self.image.copy(), id=self.id)
+
+    def close(self):
+        """Release one reference to the shared memory segment. The image can
+        not be accessed after the last reference is released.
+        """
+        if self._handle.refcount <= 1:
+            self._image = None
+        self._handle.release()
+
+    @property
+    def image(self) -> np.ndarray:
+        if self._image is None:
+            raise ValueError(f"SharedImage {self.name} is closed")
+        return self._image
+
+    def _load_image(self):
+        raise ValueError(f"SharedImage {self.name} is closed")
+
+    def __getstate__(self) -> dict:
+        return {
+            "name": self._handle.name,
+            "shape": self._shape,
+            "dtype": self._dtype.str,
+            "path": self.path,
+            "id": self.id
+        }
+
+    def __setstate__(self, state: dict):
+        handle = SharedMemoryHandle.attach(state["name"])
+        self.__init__(
+            handle,
+            state["shape"],
+            state["dtype"],
+            state["path"],
+            state["id"]
+        )
+
+    def __enter__(self) -> SharedImage:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        handle = getattr(self, "_handle", None)
+        if handle is not None and self._image is not None:
+            self._image = None
+            handle.release()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self._handle.name}," \
+            f"shape={self._shape},path={self.path},id='{self.id}')"
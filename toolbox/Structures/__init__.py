@@ -3,4 +3,5 @@ from .Gender import Gender
 from .Emotion import Emotion
 from .Instance import Instance
 from .SegmentationMask import SegmentationMask
-from .Image import Image
\ No newline at end of file
+from .Image import Image
+from .SharedImage import SharedImage, SharedImagePool
\ No newline at end of file
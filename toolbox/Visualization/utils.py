@@ -3,7 +3,6 @@ from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
-import seaborn as sns
 
 from toolbox.Structures import BoundingBox, Keypoints, SegmentationMask
 
@@ -248,6 +247,8 @@ def draw_mask(
 
     if color_by_label:
         if colors_list is None:
+            # seaborn is slow to import, it is only loaded when used
+            import seaborn as sns
             color = sns.color_palette(None, label_id+1)[label_id]
             color_mask = np.full_like(mask_pixels, [int(i*255) for i in color])
         else:
@@ -0,0 +1,94 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from toolbox.Models.age_gender import AgeGenderPredictor
+from toolbox.Structures import Gender
+
+
+def _export(path: Path, num_outputs: int):
+    """Export a small classifier with the input of the age and gender models.
+    """
+    torch.manual_seed(num_outputs)
+    net = torch.nn.Sequential(
+        torch.nn.Conv2d(3, 8, 7, stride=4),
+        torch.nn.ReLU(),
+        torch.nn.AdaptiveAvgPool2d(1),
+        torch.nn.Flatten(),
+        torch.nn.Linear(8, num_outputs)
+    ).eval()
+    kwargs = dict(
+        input_names=["input"],
+        dynamic_axes={"input": {0: "batch"}},
+        opset_version=13
+    )
+    args = (net, torch.zeros((1, 3, 224, 224)), str(path))
+    try:
+        torch.onnx.export(*args, dynamo=False, **kwargs)
+    except TypeError:
+        torch.onnx.export(*args, **kwargs)
+
+
+class TestAgeGenderPredictor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.age_path = Path(cls.tmp_dir.name) / "age.onnx"
+        cls.gender_path = Path(cls.tmp_dir.name) / "gender.onnx"
+        _export(cls.age_path, 101)
+        _export(cls.gender_path, 2)
+        rng = np.random.RandomState(0)
+        cls.images = [
+            rng.randint(0, 255, (h, w, 3), dtype=np.uint8)
+            for h, w in ((100, 80), (300, 250), (224, 224), (50, 60), (90, 90))
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def _create_model(self, **kwargs) -> AgeGenderPredictor:
+        return AgeGenderPredictor(self.age_path, self.gender_path, **kwargs)
+
+    def _assert_equal_instances(self, instances1, instances2):
+        self.assertEqual(len(instances1), len(instances2))
+        for i1, i2 in zip(instances1, instances2):
+            self.assertAlmostEqual(i1.age, i2.age, places=3)
+            self.assertEqual(i1.gender, i2.gender)
+            self.assertAlmostEqual(i1.gender_confidence,
+                                   i2.gender_confidence, places=4)
+
+    def test_batch(self):
+        model = self._create_model(max_batch_size=2)
+        instances = model.predict(self.images)
+        self.assertEqual(len(instances), len(self.images))
+        single = [model.predict(image)[0] for image in self.images]
+        self._assert_equal_instances(instances, single)
+        for ins in instances:
+            self.assertIsInstance(ins.gender, Gender)
+            self.assertGreaterEqual(ins.gender_confidence, 0.5)
+            self.assertTrue(0 <= ins.age <= 100)
+
+    def test_onnxruntime(self):
+        model = self._create_model()
+        model_ort = self._create_model(backend="onnxruntime", num_threads=1)
+        self._assert_equal_instances(model.predict(self.images),
+                                     model_ort.predict(self.images))
+
+    def test_empty(self):
+        model = self._create_model()
+        self.assertEqual(model.predict([]), [])
+        self.assertEqual(model.predict_age([]), [])
+        self.assertEqual(model.predict_gender([]), [])
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            self._create_model(backend="invalid")
+
+
+if __name__ == "__main__":
+    unittest.main()
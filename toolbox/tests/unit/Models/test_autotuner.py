@@ -0,0 +1,99 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from toolbox.Models import create_model
+from toolbox.Models.Autotuner import Autotuner
+
+from .test_face_detector_ultraface import _export
+
+
+class TestAutotuner(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.model_path = Path(cls.tmp_dir.name) / "ultraface.onnx"
+        _export(cls.model_path, True)
+        cls.params = {"model_path": str(cls.model_path),
+                      "input_size": [320, 240]}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def _create_tuner(self, **kwargs) -> Autotuner:
+        kwargs = {"image_size": (320, 240), "threads": [1, 2],
+                  "batch_sizes": [1, 4], "num_images": 4, "num_runs": 1,
+                  **kwargs}
+        return Autotuner("face_detector_ultraface", self.params, **kwargs)
+
+    def test_candidates(self):
+        tuner = self._create_tuner()
+        self.assertEqual(tuner.backends, ["onnxruntime", "opencv"])
+        # The OpenCV threads are not a model parameter
+        self.assertEqual(tuner.get_candidates(), [
+            {"backend": "onnxruntime", "intra_op_num_threads": 1},
+            {"backend": "onnxruntime", "intra_op_num_threads": 2},
+            {"backend": "opencv", "intra_op_num_threads": None}
+        ])
+        retinaface = Autotuner("face_detector_retinaface",
+                               {"weights_path": "model.pth"}, threads=[1])
+        self.assertEqual(retinaface.backends, ["torch"])
+
+    def test_tune(self):
+        result = self._create_tuner().tune()
+        params = result["params"]
+        self.assertIn(params["backend"], ("onnxruntime", "opencv"))
+        self.assertIn(params["batch_size"], (1, 4))
+        self.assertEqual(len(result["results"]), 4)
+        self.assertEqual(result["time_per_image"], min(
+            r["time_per_image"] for r in result["results"]))
+
+    def test_cache(self):
+        cache_path = Path(self.tmp_dir.name) / "cache" / "autotune.json"
+        tuner = self._create_tuner(cache_path=cache_path,
+                                   objective="latency")
+        params = tuner.get_params()
+        self.assertEqual(params["model_path"], str(self.model_path))
+        self.assertNotIn("batch_size", params)
+        with open(cache_path) as f:
+            cache = json.load(f)
+        self.assertEqual(cache[tuner.get_key()]["params"]["backend"],
+                         params["backend"])
+        # The next starts reuse the cached parameters
+        with mock.patch.object(Autotuner, "tune") as tune:
+            self.assertEqual(self._create_tuner(
+                cache_path=cache_path, objective="latency").get_params(),
+                params)
+            tune.assert_not_called()
+        # Other settings are tuned again
+        self.assertNotEqual(self._create_tuner(image_size=(640, 480))
+                            .get_key(), tuner.get_key())
+
+    def test_create_model(self):
+        cache_path = Path(self.tmp_dir.name) / "create_model.json"
+        model = create_model("face_detector_ultraface", self.params,
+                             num_replicas=None, autotune={
+                                 "cache_path": cache_path, "threads": [1],
+                                 "backends": ["onnxruntime"],
+                                 "batch_sizes": [2], "num_runs": 1})
+        self.assertEqual(model._batch_size, 2)
+        self.assertTrue(cache_path.is_file())
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Autotuner("detectron2", {})
+        with self.assertRaises(ValueError):
+            self._create_tuner(backends=["torch"])
+        with self.assertRaises(ValueError):
+            self._create_tuner(objective="invalid")
+        with self.assertRaises(ValueError):
+            Autotuner("face_detector_retinaface",
+                      {"weights_path": "model.pth"}, backends=["opencv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
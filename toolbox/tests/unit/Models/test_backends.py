@@ -0,0 +1,126 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+import torch
+
+from toolbox.Models.backends import (InferenceBackend, TensorSpec,
+                                     create_backend)
+
+
+def _create_net() -> torch.nn.Module:
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 4, 3, stride=2),
+        torch.nn.ReLU(),
+        torch.nn.AdaptiveAvgPool2d(1),
+        torch.nn.Flatten()
+    ).eval()
+
+
+class TestBackends(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = Path(cls.tmp_dir.name)
+        cls.net = _create_net()
+        example = torch.zeros((1, 3, 32, 32))
+        cls.onnx_path = tmp_path / "net.onnx"
+        kwargs = dict(input_names=["input"], output_names=["output"],
+                      dynamic_axes={"input": {0: "batch"},
+                                    "output": {0: "batch"}},
+                      opset_version=13)
+        args = (cls.net, example, str(cls.onnx_path))
+        try:
+            torch.onnx.export(*args, dynamo=False, **kwargs)
+        except TypeError:
+            torch.onnx.export(*args, **kwargs)
+        cls.script_path = tmp_path / "net.pt"
+        torch.jit.save(torch.jit.trace(cls.net, example), str(cls.script_path))
+        cls.batch = np.random.RandomState(0).rand(5, 3, 32, 32) \
+            .astype(np.float32)
+        with torch.no_grad():
+            cls.expected = cls.net(torch.from_numpy(cls.batch)).numpy()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_run(self):
+        backends = [
+            create_backend("onnxruntime", self.onnx_path, io_binding=True),
+            create_backend("opencv", self.onnx_path),
+            create_backend("torch", self.script_path),
+            create_backend("torch", module=_create_net())
+        ]
+        for backend in backends:
+            self.assertIsInstance(backend, InferenceBackend)
+            self.assertFalse(backend.is_loaded)
+            outputs = backend.run(self.batch)
+            self.assertTrue(backend.is_loaded)
+            self.assertEqual(len(outputs), 1)
+            self.assertTrue(np.allclose(outputs[0], self.expected,
+                                        atol=1e-5), backend.name)
+
+    def test_specs(self):
+        backend = create_backend("onnxruntime", self.onnx_path)
+        self.assertEqual(backend.model_format, "onnx")
+        self.assertEqual(backend.inputs, [
+            TensorSpec("input", (None, 3, 32, 32), np.dtype("float32"))])
+        self.assertEqual(backend.outputs[0].name, "output")
+        self.assertEqual(backend.outputs[0].shape, (None, 4))
+
+    def test_run_batch(self):
+        backend = create_backend("onnxruntime", self.onnx_path,
+                                 max_batch_size=2)
+        outputs = backend.run_batch(self.batch)
+        self.assertTrue(np.allclose(outputs[0], self.expected, atol=1e-5))
+        outputs = backend.run_batch({"input": self.batch[:1]})
+        self.assertTrue(np.allclose(outputs[0], self.expected[:1],
+                                    atol=1e-5))
+
+    def test_warmup(self):
+        backend = create_backend("onnxruntime", self.onnx_path,
+                                 intra_op_threads=1)
+        self.assertEqual(backend.get_num_threads()[0], 1)
+        backend.warmup(batch_size=2, num_runs=2)
+        self.assertTrue(backend.is_loaded)
+        # The shape of the torch modules inputs is not known
+        with self.assertRaises(ValueError):
+            create_backend("torch", module=_create_net()).warmup()
+        create_backend("torch", module=_create_net()).warmup(
+            shapes={"input": (1, 3, 32, 32)})
+
+    def test_optimized_model(self):
+        for name in ("optimized.onnx", "optimized.ort"):
+            path = Path(self.tmp_dir.name) / "optimized" / name
+            backend = create_backend("onnxruntime", self.onnx_path,
+                                     optimized_model_path=path)
+            outputs = backend.run(self.batch)
+            self.assertTrue(path.is_file())
+            # The next loads read the optimized model
+            backend = create_backend("onnxruntime", self.onnx_path,
+                                     optimized_model_path=path)
+            self.assertEqual(backend._set_optimized_model(
+                ort, ort.SessionOptions()), path)
+            self.assertTrue(np.allclose(backend.run(self.batch)[0],
+                                        outputs[0], atol=1e-5))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            create_backend("invalid", self.onnx_path)
+        with self.assertRaises(ValueError):
+            create_backend("onnxruntime", self.script_path)
+        with self.assertRaises(ValueError):
+            create_backend("onnxruntime", self.onnx_path,
+                           execution_mode="invalid")
+        with self.assertRaises(ValueError):
+            create_backend("tensorflow", "model.ckpt-1",
+                           model_format="checkpoint")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from tensorflow import keras
+
+from toolbox.Models.emotions_hse import EmotionsClassifier
+from toolbox.Structures import Emotion
+from toolbox.tools.convert_emotions_hse import (check_parity, convert_onnx,
+                                                convert_tflite)
+
+
+def _create_model(path: Path):
+    """Save a small Keras classifier with the input and output of the
+    emotions model.
+    """
+    keras.utils.set_random_seed(0)
+    inputs = keras.Input((224, 224, 3))
+    x = keras.layers.Conv2D(8, 7, strides=4, activation="relu")(inputs)
+    x = keras.layers.GlobalAveragePooling2D()(x)
+    outputs = keras.layers.Dense(7, activation="softmax")(x)
+    keras.Model(inputs, outputs).save(str(path))
+
+
+class TestEmotionsClassifier(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = Path(cls.tmp_dir.name)
+        cls.h5_path = tmp_path / "emotions.h5"
+        cls.onnx_path = tmp_path / "emotions.onnx"
+        cls.tflite_path = tmp_path / "emotions.tflite"
+        _create_model(cls.h5_path)
+        cls.keras_classifier = EmotionsClassifier(cls.h5_path,
+                                                  max_batch_size=2)
+        convert_onnx(cls.keras_classifier._model.model, cls.onnx_path)
+        convert_tflite(cls.keras_classifier._model.model, cls.tflite_path)
+        rng = np.random.RandomState(0)
+        cls.images = [
+            rng.randint(0, 255, (h, w, 3), dtype=np.uint8)
+            for h, w in ((100, 80), (300, 250), (224, 224), (50, 60), (90, 90))
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def _assert_equal_instances(self, instances1, instances2):
+        self.assertEqual(len(instances1), len(instances2))
+        for i1, i2 in zip(instances1, instances2):
+            self.assertEqual(i1.emotion, i2.emotion)
+            self.assertAlmostEqual(float(i1.confidence),
+                                   float(i2.confidence), places=4)
+
+    def test_batch(self):
+        instances = self.keras_classifier.predict(self.images)
+        self.assertEqual(len(instances), len(self.images))
+        single = [self.keras_classifier.predict(image)[0]
+                  for image in self.images]
+        self._assert_equal_instances(instances, single)
+        for ins in instances:
+            self.assertIsInstance(ins.emotion, Emotion)
+
+    def test_backends(self):
+        expected = self.keras_classifier.predict(self.images)
+        for path, backend in ((self.onnx_path, "onnxruntime"),
+                              (self.tflite_path, "tflite")):
+            classifier = EmotionsClassifier(path, backend=backend,
+                                            max_batch_size=3, num_threads=1)
+            self._assert_equal_instances(expected,
+                                         classifier.predict(self.images))
+            # Different batch sizes on the same interpreter
+            self._assert_equal_instances(expected[:1],
+                                         classifier.predict(self.images[0]))
+            results = check_parity(self.keras_classifier, classifier,
+                                   self.images)
+            self.assertLess(results["max_abs_diff"], 1e-4)
+            self.assertEqual(results["argmax_agreement"], 1.)
+
+    def test_empty(self):
+        self.assertEqual(self.keras_classifier.predict([]), [])
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            EmotionsClassifier(self.h5_path, backend="invalid")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from toolbox.Models import model_catalog
+from toolbox.Models.face_detector_cascade import FaceDetector
+from toolbox.Structures import BoundingBox, Instance
+
+from .test_face_detector_ultraface import _export
+
+
+def _instance(box: tuple, confidence: float) -> Instance:
+    return Instance().set("bounding_box", BoundingBox(*box)) \
+        .set("confidence", confidence)
+
+
+class _FakeDetector:
+    """Detector that returns the instances stored in the first pixel of the
+    images, and records how many images it predicted.
+    """
+
+    def __init__(self, outputs: dict):
+        self.outputs = outputs
+        self.num_images = 0
+
+    def predict_batch(self, images: list) -> list:
+        self.num_images += len(images)
+        return [list(self.outputs[int(image[0, 0, 0])]) for image in images]
+
+
+class TestFaceDetectorCascade(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.model_path = Path(cls.tmp_dir.name) / "ultraface.onnx"
+        _export(cls.model_path, True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def _create_cascade(self, **kwargs) -> FaceDetector:
+        model = {"model_name": "face_detector_ultraface",
+                 "params": {"model_path": str(self.model_path),
+                            "input_size": [320, 240]}}
+        return FaceDetector(model, model, **kwargs)
+
+    def _set_fakes(self, cascade: FaceDetector):
+        face = (0.1, 0.1, 0.3, 0.3)
+        cascade._light = _FakeDetector({
+            0: [],
+            1: [_instance(face, 0.95)],
+            2: [_instance(face, 0.95), _instance((0.5, 0.5, 0.7, 0.7), 0.5)]
+        })
+        cascade._heavy = _FakeDetector({
+            0: [_instance(face, 0.99)],
+            1: [_instance(face, 0.99), _instance((0.6, 0.1, 0.8, 0.3), 0.9)],
+            2: [_instance(face, 0.99)]
+        })
+
+    @staticmethod
+    def _images(*values) -> list:
+        return [np.full((8, 8, 3), v, np.uint8) for v in values]
+
+    def test_escalation(self):
+        cascade = self._create_cascade(uncertainty_band=(0.3, 0.9),
+                                       stats_interval=3)
+        self._set_fakes(cascade)
+        with self.assertLogs("toolbox.FaceDetectorCascade") as logs:
+            results = cascade.predict_batch(self._images(0, 1, 2))
+        self.assertEqual(len(logs.output), 1)
+        # Only the image with an uncertain detection runs the heavy model
+        self.assertEqual(cascade._heavy.num_images, 1)
+        self.assertEqual(results[0], [])
+        self.assertEqual([i.confidence for i in results[1]], [0.95])
+        self.assertEqual([i.confidence for i in results[2]], [0.99])
+        stats = cascade.get_stats()
+        self.assertEqual(stats["images"], 3)
+        self.assertEqual(stats["light"], 2)
+        self.assertEqual(stats["uncertain"], 1)
+        self.assertAlmostEqual(stats["heavy_rate"], 1 / 3)
+        self.assertIsNone(stats["sampled_miss_rate"])
+
+    def test_sampling(self):
+        cascade = self._create_cascade(sampling_rate=0.5)
+        self._set_fakes(cascade)
+        results = cascade.predict_batch(self._images(0, 1, 0, 1))
+        stats = cascade.get_stats()
+        self.assertEqual(stats["sampled"], 2)
+        self.assertEqual(stats["light"], 2)
+        self.assertEqual(len(results[1]), 2)
+        self.assertEqual(len(results[3]), 2)
+        # The light model missed 1 of the 2 faces of each sampled image
+        self.assertAlmostEqual(stats["sampled_miss_rate"], 0.5)
+        cascade.reset_stats()
+        self.assertEqual(cascade.get_stats()["images"], 0)
+
+    def test_models(self):
+        cascade = self._create_cascade(uncertainty_band=(0.2, 0.8),
+                                       sampling_rate=1.0)
+        self.assertIs(model_catalog["face_detector_cascade"], FaceDetector)
+        self.assertEqual(cascade._light._confidence_thr, 0.2)
+        image = np.random.RandomState(0).randint(
+            0, 255, (240, 320, 3), dtype=np.uint8)
+        instances = cascade.predict(image)
+        self.assertEqual(len(instances), len(cascade._heavy.predict(image)))
+        self.assertEqual(cascade.get_stats()["light"], 0)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self._create_cascade(uncertainty_band=(0.9, 0.3))
+        with self.assertRaises(ValueError):
+            self._create_cascade(sampling_rate=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
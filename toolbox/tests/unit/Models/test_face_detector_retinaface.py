@@ -0,0 +1,134 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from toolbox.Models.face_detector_retinaface import FaceDetector
+from toolbox.Models.face_detector_retinaface.config import cfg_mnet
+from toolbox.Models.face_detector_retinaface.retinaface import RetinaFace
+from toolbox.tools.export_retinaface_onnx import export_onnx
+from toolbox.tools.serialize_weights import serialize_torch
+
+
+def _create_weights(path: Path):
+    """Save the weights of a randomly initialized mobile0.25 RetinaFace.
+    """
+    torch.manual_seed(0)
+    net = RetinaFace(cfg=cfg_mnet, phase="test")
+    # Spread the face scores to get confident detections
+    for head in net.ClassHead:
+        torch.nn.init.normal_(head.conv1x1.weight, std=3000.0)
+    torch.save(net.state_dict(), path)
+
+
+class TestFaceDetectorRetinaFace(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.weights_path = Path(cls.tmp_dir.name) / "mobilenet0.25.pth"
+        cls.onnx_path = Path(cls.tmp_dir.name) / "mobilenet0.25.onnx"
+        _create_weights(cls.weights_path)
+        export_onnx(cls.weights_path, "mobile0.25", cls.onnx_path)
+        rng = np.random.RandomState(0)
+        cls.images = [
+            rng.randint(0, 255, (480, 640, 3), dtype=np.uint8),
+            rng.randint(0, 255, (301, 207, 3), dtype=np.uint8),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def _create_detector(self, **kwargs) -> FaceDetector:
+        params = dict(
+            model_name="mobile0.25",
+            confidence_threshold=0.9,
+            landmarks=True,
+            nms_threshold=0.4
+        )
+        params.update(kwargs)
+        return FaceDetector(**params)
+
+    def test_onnx_raw_outputs(self):
+        det_torch = self._create_detector(weights_path=self.weights_path)
+        det_onnx = self._create_detector(weights_path=self.onnx_path,
+                                         backend="onnx")
+        for image in self.images:
+            batch = det_torch._preprocess_image(image)
+            out_torch = det_torch._run_network(batch)
+            out_onnx = det_onnx._run_network(batch)
+            for t, o in zip(out_torch, out_onnx):
+                self.assertEqual(t.shape, o.shape)
+                self.assertTrue(torch.allclose(t, o, atol=1e-4))
+
+    def test_onnx_parity(self):
+        det_torch = self._create_detector(weights_path=self.weights_path)
+        det_onnx = self._create_detector(weights_path=self.onnx_path,
+                                         backend="onnx")
+        for image in self.images:
+            ins_torch = det_torch.predict(image)
+            ins_onnx = det_onnx.predict(image)
+            self.assertGreater(len(ins_torch), 0)
+            self.assertEqual(len(ins_torch), len(ins_onnx))
+            for t, o in zip(ins_torch, ins_onnx):
+                self.assertTrue(np.allclose(
+                    t.bounding_box.get_xyxy(), o.bounding_box.get_xyxy(),
+                    atol=2e-3))
+                self.assertAlmostEqual(t.confidence, o.confidence, places=4)
+                self.assertTrue(np.allclose(
+                    t.landmarks, o.landmarks, atol=1e-2))
+
+    def test_optimized(self):
+        cache_dir = Path(self.tmp_dir.name) / "cache"
+        det = self._create_detector(weights_path=self.weights_path)
+        det_opt = self._create_detector(weights_path=self.weights_path,
+                                        optimize=True,
+                                        optimized_cache_dir=cache_dir)
+        self.assertEqual(len(list(cache_dir.glob("*.pt"))), 1)
+        det_cached = self._create_detector(weights_path=self.weights_path,
+                                           optimize=True,
+                                           optimized_cache_dir=cache_dir)
+        for image in self.images:
+            batch = det._preprocess_image(image)
+            out = det._run_network(batch)
+            for d in (det_opt, det_cached):
+                for t, o in zip(out, d._run_network(batch)):
+                    self.assertEqual(t.shape, o.shape)
+                    self.assertTrue(torch.allclose(t, o, atol=1e-4))
+            self.assertEqual(len(det.predict(image)),
+                             len(det_cached.predict(image)))
+
+    def test_serialized_weights(self):
+        # A legacy checkpoint of a model trained with DataParallel
+        state_dict = torch.load(self.weights_path)
+        legacy_path = Path(self.tmp_dir.name) / "legacy.pth"
+        torch.save({"state_dict": {f"module.{k}": v
+                                   for k, v in state_dict.items()}},
+                   legacy_path, _use_new_zipfile_serialization=False)
+        serialized_path = Path(self.tmp_dir.name) / "serialized.pth"
+        serialize_torch(legacy_path, serialized_path)
+        det = self._create_detector(weights_path=self.weights_path)
+        batch = det._preprocess_image(self.images[0])
+        out = det._run_network(batch)
+        for path in (legacy_path, serialized_path):
+            d = self._create_detector(weights_path=path)
+            for t, o in zip(out, d._run_network(batch)):
+                self.assertTrue(torch.equal(t, o))
+
+    def test_predict_batch(self):
+        det = self._create_detector(weights_path=self.weights_path)
+        batch = det.predict_batch(self.images)
+        self.assertEqual(len(batch), len(self.images))
+        for image, instances in zip(self.images, batch):
+            for ins in instances:
+                self.assertTrue(ins.has("bounding_box"))
+                self.assertTrue(ins.has("landmarks"))
+                self.assertLessEqual(ins.bounding_box.xmax, 1)
+                self.assertLessEqual(ins.bounding_box.ymax, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import cv2
+import numpy as np
+import torch
+
+from toolbox.Models.backends.OpenCVBackend import OpenCVBackend
+from toolbox.Models.face_detector_ultraface import FaceDetector
+
+
+class _UltraFaceLike(torch.nn.Module):
+    """Small network with the inputs and outputs of UltraFace.
+    """
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.conv = torch.nn.Conv2d(3, 6, 8, stride=8)
+        torch.nn.init.normal_(self.conv.weight, std=0.2)
+
+    def forward(self, x):
+        x = self.conv(x).flatten(2).permute(0, 2, 1)
+        scores = torch.softmax(x[..., :2] * 4, dim=-1)
+        centers = torch.sigmoid(x[..., 2:4])
+        sizes = torch.sigmoid(x[..., 4:]) * 0.2 + 0.05
+        boxes = torch.cat([centers - sizes / 2, centers + sizes / 2], dim=-1)
+        return scores, boxes
+
+
+def _export(path: Path, dynamic_batch: bool):
+    dynamic_axes = {"input": {0: "batch"}} if dynamic_batch else None
+    kwargs = dict(
+        input_names=["input"],
+        output_names=["scores", "boxes"],
+        dynamic_axes=dynamic_axes,
+        opset_version=13
+    )
+    args = (_UltraFaceLike().eval(), torch.zeros((1, 3, 240, 320)), str(path))
+    try:
+        torch.onnx.export(*args, dynamo=False, **kwargs)
+    except TypeError:
+        torch.onnx.export(*args, **kwargs)
+
+
+class TestFaceDetectorUltraFace(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.dynamic_path = Path(cls.tmp_dir.name) / "dynamic.onnx"
+        cls.fixed_path = Path(cls.tmp_dir.name) / "fixed.onnx"
+        _export(cls.dynamic_path, True)
+        _export(cls.fixed_path, False)
+        rng = np.random.RandomState(0)
+        cls.images = [
+            rng.randint(0, 255, (480, 640, 3), dtype=np.uint8),
+            rng.randint(0, 255, (301, 207, 3), dtype=np.uint8),
+            rng.randint(0, 255, (240, 320, 3), dtype=np.uint8),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def _assert_equal_instances(self, instances1, instances2):
+        self.assertEqual(len(instances1), len(instances2))
+        for i1, i2 in zip(instances1, instances2):
+            self.assertTrue(np.array_equal(i1.bounding_box.get_xyxy(),
+                                           i2.bounding_box.get_xyxy()))
+            self.assertAlmostEqual(i1.confidence, i2.confidence, places=5)
+
+    def test_preprocess(self):
+        det = FaceDetector(self.dynamic_path, (320, 240))
+        for image in self.images:
+            # Reference float64 preprocessing
+            ref = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            ref = cv2.resize(ref, (320, 240))
+            ref = (ref - np.array([127, 127, 127])) / 128
+            ref = np.transpose(ref, [2, 0, 1])[None].astype(np.float32)
+            out = det._preprocess_image(image)
+            self.assertEqual(out.dtype, np.float32)
+            self.assertTrue(np.array_equal(out, ref))
+
+    def test_io_binding(self):
+        det = FaceDetector(self.dynamic_path, (320, 240), io_binding=True)
+        det_no_binding = FaceDetector(self.dynamic_path, (320, 240),
+                                      io_binding=False,
+                                      intra_op_num_threads=1,
+                                      graph_optimization_level="basic")
+        for image in self.images:
+            instances = det.predict(image)
+            self.assertGreater(len(instances), 0)
+            self._assert_equal_instances(instances,
+                                         det_no_binding.predict(image))
+
+    def test_predict_batch(self):
+        for path in (self.dynamic_path, self.fixed_path):
+            det = FaceDetector(path, (320, 240), batch_size=2)
+            results = det.predict_batch(self.images)
+            self.assertEqual(len(results), len(self.images))
+            for image, instances in zip(self.images, results):
+                self._assert_equal_instances(instances, det.predict(image))
+        self.assertEqual(
+            FaceDetector(self.fixed_path, (320, 240))._batch_size, 1)
+
+    def test_opencv_batch(self):
+        # OpenCV does not report the batch dimension, it is probed
+        det = FaceDetector(self.dynamic_path, (320, 240), batch_size=2,
+                           backend="opencv")
+        self.assertEqual(det._batch_size, 2)
+        results = det.predict_batch(self.images)
+        for image, instances in zip(self.images, results):
+            self.assertEqual(len(instances), len(det.predict(image)))
+        # Models that can not run a batch of 2 images run them one by one
+        with mock.patch.object(OpenCVBackend, "run",
+                               side_effect=cv2.error("fixed batch")):
+            det = FaceDetector(self.fixed_path, (320, 240), batch_size=2,
+                               backend="opencv")
+        self.assertEqual(det._batch_size, 1)
+        with mock.patch.object(OpenCVBackend, "run",
+                               return_value=[np.zeros((1, 4, 2))]):
+            det = FaceDetector(self.fixed_path, (320, 240), batch_size=2,
+                               backend="opencv")
+        self.assertEqual(det._batch_size, 1)
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            FaceDetector(self.dynamic_path, (320, 240),
+                         execution_mode="invalid")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+from toolbox.Models.face_recognition_facenet import FaceRecognition
+
+
+def _save_checkpoint(path: Path) -> Path:
+    """Save a small graph with the tensors of the FaceNet checkpoints.
+    """
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.compat.v1.set_random_seed(0)
+        images = tf.compat.v1.placeholder(
+            tf.float32, (None, 160, 160, 3), name="input")
+        tf.compat.v1.placeholder(tf.bool, name="phase_train")
+        kernel = tf.compat.v1.get_variable(
+            "kernel", (8, 8, 3, 16),
+            initializer=tf.compat.v1.random_normal_initializer())
+        x = tf.nn.conv2d(images, kernel, strides=8, padding="VALID")
+        x = tf.reduce_mean(tf.nn.relu(x), axis=(1, 2))
+        tf.nn.l2_normalize(x, axis=1, name="embeddings")
+        saver = tf.compat.v1.train.Saver()
+        with tf.compat.v1.Session(graph=graph) as session:
+            session.run(tf.compat.v1.global_variables_initializer())
+            saver.save(session, str(path / "model.ckpt"), global_step=1,
+                       write_meta_graph=False)
+            saver.export_meta_graph(str(path / "model.meta"))
+    return path / "model.ckpt-1"
+
+
+class TestFaceRecognitionFacenet(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        model_path = _save_checkpoint(Path(cls.tmp_dir.name))
+        cls.model = FaceRecognition(model_path=model_path, max_batch_size=2)
+        cls.model.load_model()
+        rng = np.random.RandomState(0)
+        cls.images = [
+            rng.randint(0, 255, (h, w, 3), dtype=np.uint8)
+            for h, w in ((100, 80), (300, 250), (160, 160), (50, 60), (90, 90))
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_preprocess(self):
+        batch = self.model._preprocess_images(self.images)
+        for image, out in zip(self.images, batch):
+            # Reference per-image prewhitening
+            ref = cv2.resize(image, (160, 160))
+            std_adj = np.maximum(np.std(ref), 1.0 / np.sqrt(ref.size))
+            ref = (ref - np.mean(ref)) / std_adj
+            self.assertTrue(np.allclose(out, ref, atol=1e-4))
+
+    def test_predict_features_batch(self):
+        features = self.model.predict_features_batch(self.images)
+        self.assertEqual(features.shape, (len(self.images), 16))
+        for image, f in zip(self.images, features):
+            self.assertTrue(np.allclose(
+                f, self.model.predict_features(image), atol=1e-5))
+
+    def test_empty(self):
+        self.assertEqual(self.model.predict_features_batch([]).shape, (0, 16))
+
+    def test_backend_options(self):
+        model = FaceRecognition(model_path=self.model._model_path,
+                                backend="tensorflow",
+                                backend_options={"intra_op_threads": 1})
+        model.load_model()
+        self.assertEqual(model._model.get_num_threads()[0], 1)
+        self.assertTrue(np.allclose(
+            model.predict_features_batch(self.images),
+            self.model.predict_features_batch(self.images), atol=1e-5))
+        with self.assertRaises(ValueError):
+            FaceRecognition(model_path=self.model._model_path,
+                            backend="unknown").load_model()
+
+    def test_not_loaded(self):
+        with self.assertRaises(ValueError):
+            FaceRecognition().predict_features_batch(self.images)
+
+
+if __name__ == "__main__":
+    unittest.main()
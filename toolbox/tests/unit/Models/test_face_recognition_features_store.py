@@ -0,0 +1,124 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from toolbox.Models.face_recognition_facenet import FaceRecognition
+from toolbox.Models.face_recognition_facenet.FeaturesStore import \
+    FeaturesStore
+from toolbox.Models.face_recognition_facenet.Gallery import Gallery
+
+
+class TestFeaturesStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / "store"
+        rng = np.random.RandomState(0)
+        self.features = rng.normal(size=(20, 8)).astype(np.float32)
+        self.names = [f"urn:ngsi-ld:Person:{i}" for i in range(20)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _assert_content(self, store: FeaturesStore, expected: dict):
+        names, features, sq_norms = store.read()
+        self.assertEqual(sorted(names), sorted(expected))
+        for name, f, n in zip(names, features, sq_norms):
+            self.assertTrue(np.array_equal(f, expected[name]))
+            self.assertAlmostEqual(float(n), float(np.sum(f * f)), places=4)
+
+    def test_write_read(self):
+        store = FeaturesStore(self.path)
+        self.assertEqual(len(store), 0)
+        store.write(self.names, self.features)
+        names, features, _ = FeaturesStore(self.path).read()
+        self.assertEqual(names, self.names)
+        self.assertIsInstance(features, np.memmap)
+        self.assertTrue(np.array_equal(features, self.features))
+
+    def test_append(self):
+        store = FeaturesStore(self.path, max_log_ratio=None)
+        store.append(self.names[:10], self.features[:10])
+        store.append(self.names[10:], self.features[10:])
+        # Replace the features of an existing name
+        store.append(self.names[:1], self.features[1:2])
+        store.append(self.names[:1], self.features[2:3])
+        self.assertEqual(store.log_count, 12)
+        expected = dict(zip(self.names, self.features))
+        expected[self.names[0]] = self.features[2]
+
+        store = FeaturesStore(self.path, max_log_ratio=None)
+        self.assertEqual(len(store), 20)
+        self._assert_content(store, expected)
+
+        store.compact()
+        self.assertEqual(store.log_count, 0)
+        store = FeaturesStore(self.path)
+        self.assertIsInstance(store.read()[1], np.memmap)
+        self._assert_content(store, expected)
+        # Only the files of the current generation are kept
+        self.assertEqual(len(list(self.path.glob("features-*.npy"))), 1)
+
+    def test_interrupted_append(self):
+        store = FeaturesStore(self.path, max_log_ratio=None)
+        store.write(self.names[:10], self.features[:10])
+        store.append(self.names[10:12], self.features[10:12])
+        log_path = next(self.path.glob("log-*.bin"))
+        with open(log_path, "ab") as f:
+            f.write(b"\x05\x00\x00\x00abc")
+        store = FeaturesStore(self.path, max_log_ratio=None)
+        self.assertEqual(store.log_count, 2)
+        store.append(self.names[12:13], self.features[12:13])
+        self._assert_content(
+            FeaturesStore(self.path),
+            dict(zip(self.names[:13], self.features[:13])))
+
+    def test_pickle(self):
+        pkl_path = Path(self.tmp_dir.name) / "features.pkl"
+        store = FeaturesStore(self.path)
+        store.write(self.names, self.features)
+        store.export_pickle(pkl_path)
+        other = FeaturesStore(Path(self.tmp_dir.name) / "other")
+        other.import_pickle(pkl_path)
+        self._assert_content(other, dict(zip(self.names, self.features)))
+
+    def test_gallery_from_arrays(self):
+        store = FeaturesStore(self.path)
+        store.write(self.names, self.features)
+        names, features, sq_norms = store.read()
+        gallery = Gallery.from_arrays(names, features, sq_norms)
+        self.assertTrue(np.shares_memory(gallery.features, features))
+        reference = Gallery.from_dict(dict(zip(self.names, self.features)))
+        self.assertEqual(gallery.search(self.features[:5], 1.),
+                         reference.search(self.features[:5], 1.))
+        # The memory map is copied before being modified
+        gallery.add(self.names[0], self.features[1])
+        self.assertFalse(np.shares_memory(gallery.features, features))
+        self.assertTrue(np.array_equal(features, self.features))
+
+    def test_model(self):
+        model = FaceRecognition(distance_threshold=1.)
+        for name, f in zip(self.names[:10], self.features[:10]):
+            model.add_features(name, f.tolist())
+        model.save_features(self.path)
+
+        model = FaceRecognition(distance_threshold=1.)
+        model.load_features(self.path)
+        model.add_features(self.names[10], self.features[10])
+        model.save_features(self.path)
+        self.assertEqual(FeaturesStore(self.path).log_count, 1)
+
+        pkl_path = Path(self.tmp_dir.name) / "features.pkl"
+        model.save_features(pkl_path)
+        for path in (self.path, pkl_path):
+            model = FaceRecognition(distance_threshold=1.)
+            model.load_features(path)
+            instances = model.recognize_features(self.features[10])
+            self.assertEqual(instances[0].name, self.names[10])
+            self.assertAlmostEqual(instances[0].distance, 0., places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
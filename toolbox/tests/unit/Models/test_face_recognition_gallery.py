@@ -0,0 +1,99 @@
+import unittest
+
+import numpy as np
+
+from toolbox.Models.face_recognition_facenet.Gallery import Gallery
+
+
+def loop_search(features: dict, query: np.ndarray, max_distance: float
+                ) -> list:
+    """Reference search that compares the query with each stored vector.
+    """
+    matches = []
+    for name, f in features.items():
+        dist = np.sum(np.square(query - f))
+        if dist < max_distance:
+            matches.append((name, dist))
+    return sorted(matches, key=lambda x: x[1])
+
+
+def random_features(num: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.RandomState(seed)
+    features = rng.normal(size=(num, dim)).astype(np.float32)
+    return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+class TestGallery(unittest.TestCase):
+
+    def setUp(self):
+        self.features = random_features(500)
+        self.names = [f"person_{i}" for i in range(len(self.features))]
+        self.queries = random_features(100, seed=1)
+        self.queries[:50] = self.features[:50] + 0.05 * self.queries[50:]
+        self.max_distance = 1.5
+
+    def _assert_equal_matches(self, matches1, matches2):
+        self.assertEqual([m[0] for m in matches1], [m[0] for m in matches2])
+        self.assertTrue(np.allclose([m[1] for m in matches1],
+                                    [m[1] for m in matches2], atol=1e-4))
+
+    def test_exact(self):
+        gallery = Gallery()
+        gallery.add_batch(self.names[:200], self.features[:200])
+        for name, f in zip(self.names[200:], self.features[200:]):
+            gallery.add(name, f)
+        self.assertEqual(len(gallery), len(self.names))
+        reference = dict(zip(self.names, self.features))
+        results = gallery.search(self.queries, self.max_distance)
+        for query, matches in zip(self.queries, results):
+            self._assert_equal_matches(
+                matches, loop_search(reference, query, self.max_distance))
+
+    def test_top_k(self):
+        gallery = Gallery.from_dict(dict(zip(self.names, self.features)))
+        results = gallery.search(self.queries, self.max_distance)
+        results_k = gallery.search(self.queries, self.max_distance, top_k=3)
+        for matches, matches_k in zip(results, results_k):
+            self._assert_equal_matches(matches[:3], matches_k)
+
+    def test_replace(self):
+        gallery = Gallery()
+        gallery.add("a", self.features[0])
+        gallery.add("b", self.features[1])
+        gallery.add("a", self.features[2])
+        self.assertEqual(len(gallery), 2)
+        self.assertEqual(gallery.names, ["a", "b"])
+        self.assertTrue(np.array_equal(gallery.to_dict()["a"],
+                                       self.features[2]))
+
+    def test_ivf(self):
+        gallery = Gallery(index="ivf", num_lists=8, num_probes=3,
+                          min_ivf_size=100)
+        gallery.add_batch(self.names[:300], self.features[:300])
+        exact = Gallery.from_dict(dict(zip(self.names, self.features)))
+        # Search once to build the index, then add more vectors
+        gallery.search(self.queries[:1], self.max_distance)
+        gallery.add_batch(self.names[300:], self.features[300:])
+        self.assertEqual(len(gallery), len(self.names))
+        # The vectors of the gallery are always found
+        results = gallery.search(self.queries[:50], 0.5, top_k=1)
+        expected = exact.search(self.queries[:50], 0.5, top_k=1)
+        for matches, expected_matches in zip(results, expected):
+            self.assertEqual(len(matches), 1)
+            self._assert_equal_matches(matches, expected_matches)
+
+    def test_empty(self):
+        gallery = Gallery()
+        self.assertEqual(gallery.search(self.queries[:2], 1.), [[], []])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Gallery(index="invalid")
+        gallery = Gallery()
+        gallery.add("a", self.features[0])
+        with self.assertRaises(ValueError):
+            gallery.add("b", np.zeros(8))
+
+
+if __name__ == "__main__":
+    unittest.main()
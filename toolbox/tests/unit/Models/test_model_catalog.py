@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+import unittest
+
+from toolbox import Models
+from toolbox.Models import model_catalog
+
+
+class TestModelCatalog(unittest.TestCase):
+
+    def test_lazy_import(self):
+        code = (
+            "import json, sys\n"
+            "from toolbox.Models import model_catalog\n"
+            "names = list(model_catalog)\n"
+            "loaded = [p for p in ('tensorflow', 'torch', 'onnxruntime') "
+            "if p in sys.modules]\n"
+            "model_catalog['face_detector_ultraface']\n"
+            "print(json.dumps([names, loaded, "
+            "'toolbox.Models.face_detector_ultraface' in sys.modules, "
+            "'tensorflow' in sys.modules]))\n"
+        )
+        proc = subprocess.run([sys.executable, "-c", code],
+                              capture_output=True, text=True, check=True)
+        names, loaded, model_loaded, tf_loaded = json.loads(
+            proc.stdout.strip().splitlines()[-1])
+        self.assertIn("face_recognition_facenet", names)
+        self.assertEqual(loaded, [])
+        self.assertTrue(model_loaded)
+        self.assertFalse(tf_loaded)
+
+    def test_lookup(self):
+        from toolbox.Models.face_detector_ultraface import FaceDetector
+        self.assertIs(model_catalog["face_detector_ultraface"], FaceDetector)
+        self.assertIn("detectron2", model_catalog)
+        self.assertIs(model_catalog["detectron2"], Models.Detectron2)
+        with self.assertRaises(KeyError):
+            model_catalog["unknown"]
+        with self.assertRaises(AttributeError):
+            Models.unknown
+
+    def test_model_attributes(self):
+        # The attributes of the model names are the model classes, also
+        # after importing their subpackages
+        import toolbox.Models.face_detector_retinaface.FaceDetector
+        from toolbox.Models.age_gender import AgeGenderPredictor
+        from toolbox.Models.face_detector_retinaface import FaceDetector
+        self.assertIs(Models.face_detector_retinaface, FaceDetector)
+        self.assertIs(Models.age_gender, AgeGenderPredictor)
+        from toolbox.Models import face_detector_ultraface
+        self.assertIs(face_detector_ultraface,
+                      model_catalog["face_detector_ultraface"])
+
+
+if __name__ == "__main__":
+    unittest.main()
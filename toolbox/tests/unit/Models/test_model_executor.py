@@ -0,0 +1,122 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from toolbox.Models import create_model
+from toolbox.Models.face_detector_ultraface import FaceDetector
+from toolbox.Models.ModelExecutor import ModelExecutor
+from toolbox.Models.ModelPool import ModelPool
+from toolbox.Structures import Image, Instance
+
+from .test_face_detector_ultraface import _export
+
+
+class TestModelExecutor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        model_path = Path(cls.tmp_dir.name) / "model.onnx"
+        _export(model_path, True)
+        cls.params = {"model_path": str(model_path),
+                      "input_size": [320, 240],
+                      "intra_op_num_threads": 1}
+        cls.model = FaceDetector(**cls.params)
+        cls.executor = ModelExecutor("face_detector_ultraface", cls.params,
+                                     num_workers=2, max_pending=2)
+        rng = np.random.RandomState(0)
+        cls.images = [
+            rng.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+            for _ in range(5)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.close()
+        cls.tmp_dir.cleanup()
+
+    def _assert_equal_instances(self, instances1, instances2):
+        self.assertEqual(len(instances1), len(instances2))
+        for i1, i2 in zip(instances1, instances2):
+            self.assertIsInstance(i1, Instance)
+            self.assertTrue(np.allclose(i1.bounding_box.get_xyxy(),
+                                        i2.bounding_box.get_xyxy()))
+            self.assertAlmostEqual(i1.confidence, i2.confidence, places=5)
+
+    def test_predict(self):
+        for image in self.images[:2]:
+            self._assert_equal_instances(self.executor.predict(image),
+                                         self.model.predict(image))
+
+    def test_submit(self):
+        # More images than shared memory segments, submit waits for them
+        futures = [self.executor.submit(image) for image in self.images]
+        for future, image in zip(futures, self.images):
+            self._assert_equal_instances(future.result(),
+                                         self.model.predict(image))
+        self.assertLessEqual(self.executor._images_pool.num_segments, 2)
+
+    def test_predict_batch(self):
+        images = [Image(image=image) for image in self.images[:3]]
+        results = self.executor.predict_batch(images)
+        self.assertEqual(len(results), 3)
+        for instances, image in zip(results, self.images):
+            self._assert_equal_instances(instances,
+                                         self.model.predict(image))
+
+    def test_submit_call(self):
+        results = self.executor.submit_call(
+            "predict_batch", self.images[:2]).result()
+        for instances, image in zip(results, self.images):
+            self._assert_equal_instances(instances,
+                                         self.model.predict(image))
+        with self.assertRaises(AttributeError):
+            self.executor.unknown_attribute
+
+    def test_larger_than_pool(self):
+        # A single worker has 4 shared memory segments
+        executor = ModelExecutor("face_detector_ultraface", self.params,
+                                 num_workers=1)
+        images = self.images * 2
+        results = {}
+
+        def run():
+            results["batch"] = executor.predict_batch(images)
+            results["call"] = executor.submit_call(
+                "predict_batch", images).result()
+
+        try:
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            thread.join(120)
+            self.assertFalse(thread.is_alive(), "The executor is blocked")
+            for key in ("batch", "call"):
+                self.assertEqual(len(results[key]), len(images))
+                for instances, image in zip(results[key], images):
+                    self._assert_equal_instances(instances,
+                                                 self.model.predict(image))
+            self.assertLessEqual(executor._images_pool.num_segments, 4)
+        finally:
+            executor.close()
+
+    def test_create_model(self):
+        model = create_model("face_detector_ultraface", self.params,
+                             num_workers=1)
+        self.assertIsInstance(model, ModelExecutor)
+        model.close()
+        pool = create_model("face_detector_ultraface", self.params,
+                            num_replicas=2)
+        self.assertIsInstance(pool, ModelPool)
+        self.assertEqual(pool.size, 2)
+        self._assert_equal_instances(pool.predict(self.images[0]),
+                                     self.model.predict(self.images[0]))
+        self.assertIsInstance(create_model("face_detector_ultraface",
+                                           self.params, num_replicas=None),
+                              FaceDetector)
+
+
+if __name__ == "__main__":
+    unittest.main()
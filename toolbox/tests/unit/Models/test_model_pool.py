@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from toolbox.Models.ModelPool import ModelPool
+
+
+class _UnsafeModel:
+    """Model that fails if it is used by several threads at once, like an
+    OpenCV DNN network with ``setInput`` and ``forward``.
+    """
+
+    def __init__(self):
+        self.name = "unsafe"
+        self._input = None
+
+    def set_input(self, value):
+        self._input = value
+
+    def forward(self):
+        time.sleep(0.001)
+        return self._input
+
+    def predict(self, value):
+        self.set_input(value)
+        return self.forward()
+
+
+class TestModelPool(unittest.TestCase):
+
+    def test_thread_safety(self):
+        pool = ModelPool(_UnsafeModel, size=2)
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(pool.predict, range(100)))
+        self.assertEqual(results, list(range(100)))
+        self.assertEqual(pool.num_free, 2)
+
+    def test_checkout(self):
+        pool = ModelPool(_UnsafeModel, size=2)
+        self.assertEqual(pool.size, 2)
+        model1 = pool.checkout()
+        model2 = pool.checkout()
+        self.assertIsNot(model1, model2)
+        self.assertRaises(TimeoutError, lambda: pool.checkout(timeout=0.01))
+
+        # A blocked checkout gets the replica checked in by another thread
+        result = []
+        thread = threading.Thread(target=lambda: result.append(
+            pool.checkout()))
+        thread.start()
+        pool.checkin(model1)
+        thread.join()
+        self.assertIs(result[0], model1)
+
+        pool.checkin(model1)
+        pool.checkin(model2)
+        with pool.use() as model:
+            self.assertEqual(pool.num_free, 1)
+            self.assertIsInstance(model, _UnsafeModel)
+        self.assertEqual(pool.num_free, 2)
+        with self.assertRaises(ValueError):
+            pool.checkin(_UnsafeModel())
+
+    def test_forward_attributes(self):
+        pool = ModelPool(_UnsafeModel)
+        self.assertEqual(pool.name, "unsafe")
+        self.assertEqual(pool.predict(3), 3)
+        with self.assertRaises(AttributeError):
+            pool.unknown
+        with self.assertRaises(AttributeError):
+            pool._input
+        self.assertFalse(hasattr(pool, "predict_batch"))
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            ModelPool(_UnsafeModel, size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
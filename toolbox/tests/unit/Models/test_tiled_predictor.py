@@ -0,0 +1,142 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from toolbox.Models import create_model
+from toolbox.Models.ModelPool import ModelPool
+from toolbox.Models.TiledPredictor import TiledPredictor
+from toolbox.Structures import BoundingBox, Instance, SegmentationMask
+from toolbox.Structures.Keypoints import COCOKeypoints
+
+from .test_face_detector_ultraface import _export
+
+
+class _SquaresDetector:
+    """Detect the white squares of an image, also the ones truncated by the
+    image border.
+    """
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.input_shapes = set()
+
+    def predict(self, image):
+        self.input_shapes.add(image.shape)
+        h, w = image.shape[:2]
+        binary = (image[..., 0] > 0).astype(np.uint8)
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(binary)
+        instances = []
+        for i in range(1, n):
+            x, y, bw, bh, _ = stats[i]
+            center = np.array([[(x + bw / 2) / w, (y + bh / 2) / h, 1.]] * 17)
+            instances.append(Instance().set(
+                "bounding_box", BoundingBox.from_absolute(
+                    x, y, x + bw, y + bh, image_width=w, image_height=h)
+            ).set("confidence", 0.9).set("label_id", 0).set(
+                "mask", SegmentationMask(labels == i)
+            ).set(
+                "keypoints", COCOKeypoints(center)
+            ).set(
+                "landmarks", np.array([x, y] * 5, dtype=np.float32)
+            ))
+        return instances
+
+    def predict_batch(self, images):
+        self.batch_sizes.append(len(images))
+        return [self.predict(image) for image in images]
+
+
+class TestTiledPredictor(unittest.TestCase):
+
+    def setUp(self):
+        self.image = np.zeros((500, 700, 3), np.uint8)
+        self.squares = [(0, 0), (230, 100), (180, 300), (440, 190),
+                        (660, 460), (400, 420)]
+        for x, y in self.squares:
+            self.image[y:y + 40, x:x + 40] = 255
+
+    def _boxes(self, instances, width, height):
+        return sorted(
+            tuple(ins.bounding_box.get_xyxy(True, width, height))
+            for ins in instances
+        )
+
+    def test_tiles(self):
+        model = TiledPredictor(_SquaresDetector(), tile_size=256, overlap=64)
+        tiles = model.get_tiles(500, 700)
+        self.assertEqual({t[2:] for t in tiles}, {(256, 256)})
+        self.assertEqual(sorted({t[0] for t in tiles}), [0, 192, 384, 444])
+        self.assertEqual(sorted({t[1] for t in tiles}), [0, 192, 244])
+        self.assertEqual(model.get_tiles(100, 300),
+                         [(0, 0, 256, 100), (44, 0, 256, 100)])
+        with self.assertRaises(ValueError):
+            TiledPredictor(_SquaresDetector(), tile_size=256, overlap=256)
+
+    def test_predict(self):
+        detector = _SquaresDetector()
+        model = TiledPredictor(detector, tile_size=256, overlap=64,
+                               batch_size=3)
+        instances = model.predict(self.image)
+        height, width = self.image.shape[:2]
+        expected = sorted(
+            (x, y, min(x + 40, width), min(y + 40, height))
+            for x, y in self.squares
+        )
+        self.assertEqual(self._boxes(instances, width, height), expected)
+        # The model only sees tiles, in batches of up to batch_size
+        self.assertEqual(detector.input_shapes, {(256, 256, 3)})
+        self.assertLessEqual(max(detector.batch_sizes), 3)
+
+        for ins in instances:
+            x1, y1, x2, y2 = ins.bounding_box.get_xyxy(True, width, height)
+            expected_mask = np.zeros((height, width), bool)
+            expected_mask[y1:y2, x1:x2] = True
+            self.assertTrue(np.array_equal(ins.mask.mask, expected_mask))
+            center = ins.keypoints.keypoints[0]
+            self.assertAlmostEqual(center[0] * width, (x1 + x2) / 2)
+            self.assertAlmostEqual(center[1] * height, (y1 + y2) / 2)
+            self.assertTrue(np.allclose(ins.landmarks[:2], (x1, y1)))
+
+    def test_predict_batch(self):
+        detector = _SquaresDetector()
+        model = TiledPredictor(detector, tile_size=256, overlap=64)
+        small = self.image[:200, :200]
+        results = model.predict_batch([self.image, small, np.zeros_like(
+            self.image)])
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(results[0]), len(self.squares))
+        self.assertEqual(self._boxes(results[1], 200, 200),
+                         [(0, 0, 40, 40)])
+        self.assertEqual(results[2], [])
+
+    def test_forward_attributes(self):
+        detector = _SquaresDetector()
+        model = TiledPredictor(detector)
+        self.assertIs(model.input_shapes, detector.input_shapes)
+        with self.assertRaises(AttributeError):
+            model._unknown
+
+    def test_create_model(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = Path(tmp_dir) / "model.onnx"
+            _export(model_path, True)
+            params = {"model_path": str(model_path),
+                      "input_size": [320, 240]}
+            model = create_model("face_detector_ultraface", params,
+                                 tiling={"tile_size": 320, "overlap": 32})
+            self.assertIsInstance(model, TiledPredictor)
+            self.assertIsInstance(model._model, ModelPool)
+            image = np.random.RandomState(0).randint(
+                0, 255, (400, 900, 3), dtype=np.uint8)
+            for ins in model.predict(image):
+                self.assertTrue(0 <= ins.bounding_box.xmin <= 1)
+            self.assertNotIsInstance(
+                create_model("face_detector_ultraface", params),
+                TiledPredictor)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from toolbox.Models import create_model, warmup_model
+from toolbox.Models.face_detector_ultraface import FaceDetector
+from toolbox.Models.ModelExecutor import ModelExecutor
+
+from .test_face_detector_ultraface import _export
+
+
+class _RecordingModel:
+    """Model that records the shapes of the predicted images.
+    """
+
+    def __init__(self):
+        self.shapes = []
+
+    def predict(self, image: np.ndarray) -> list:
+        self.shapes.append(image.shape)
+        return []
+
+
+class _RecordingBatchModel(_RecordingModel):
+
+    def predict_batch(self, images: list) -> list:
+        self.shapes.append(tuple(image.shape for image in images))
+        return [[] for _ in images]
+
+
+class TestWarmup(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        model_path = Path(cls.tmp_dir.name) / "model.onnx"
+        _export(model_path, True)
+        cls.params = {"model_path": str(model_path),
+                      "input_size": [320, 240],
+                      "intra_op_num_threads": 1}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_warmup_model(self):
+        model = _RecordingModel()
+        warmup_model(model, image_size=(64, 32), batch_size=2, num_runs=2)
+        self.assertEqual(model.shapes, [(32, 64, 3)] * 4)
+        model = _RecordingBatchModel()
+        warmup_model(model, image_size=(64, 32), batch_size=3)
+        self.assertEqual(model.shapes, [((32, 64, 3),) * 3])
+
+    def test_create_model(self):
+        warmup = {"image_size": [320, 240], "batch_size": 2}
+        with mock.patch.object(FaceDetector, "predict_batch",
+                               autospec=True, return_value=[]) as predict:
+            create_model("face_detector_ultraface", self.params,
+                         num_replicas=None, warmup=warmup)
+            self.assertEqual(predict.call_count, 1)
+            self.assertEqual(len(predict.call_args[0][1]), 2)
+            # Each replica of the pool is warmed up
+            create_model("face_detector_ultraface", self.params,
+                         num_replicas=2, warmup=warmup)
+            self.assertEqual(predict.call_count, 3)
+            create_model("face_detector_ultraface", self.params,
+                         num_replicas=None)
+            self.assertEqual(predict.call_count, 3)
+
+    def test_executor(self):
+        executor = ModelExecutor("face_detector_ultraface", self.params,
+                                 num_workers=2,
+                                 warmup={"image_size": [320, 240]})
+        try:
+            # All the workers are started before the first prediction
+            self.assertEqual(len(executor._executor._processes), 2)
+            image = np.zeros((240, 320, 3), np.uint8)
+            self.assertEqual(len(executor.predict(image)),
+                             len(FaceDetector(**self.params).predict(image)))
+        finally:
+            executor.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
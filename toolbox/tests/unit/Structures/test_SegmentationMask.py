@@ -69,5 +69,45 @@ class TestSegmentationMask(unittest.TestCase):
         seg2 = SegmentationMask(b_mask)
         self.assertNotEqual(seg1, seg2)   
 
+    def test_lazy_rle(self):
+        rle = pycocotools_mask.encode(np.asfortranarray(RAND_MASK))
+        seg = SegmentationMask(rle=rle)
+        self.assertEqual(seg.width, 200)
+        self.assertEqual(seg.height, 100)
+        self.assertEqual(seg.area, RAND_MASK.sum())
+        ser = seg.serialize()
+        self.assertEqual(ser["counts"], rle["counts"].hex())
+        # The mask is not decoded until it is accessed
+        self.assertIsNone(seg._mask)
+        self.assertTrue(np.array_equal(seg.mask, RAND_MASK))
+
+    def test_from_tensors(self):
+        import torch
+        masks = np.random.randint(0, 2, (4, 30, 20), dtype=np.uint8)
+        masks[1] = 0
+        masks[2] = 1
+        masks[3, 0, 0] = 1
+        segs = SegmentationMask.from_tensors(torch.from_numpy(masks))
+        self.assertEqual(len(segs), 4)
+        for seg, mask in zip(segs, masks):
+            coco_rle = pycocotools_mask.encode(np.asfortranarray(mask))
+            self.assertEqual(seg.rle["counts"], coco_rle["counts"])
+            self.assertTrue(np.array_equal(seg.mask, mask))
+        self.assertEqual(
+            SegmentationMask.from_tensors(torch.zeros((0, 30, 20))), [])
+
+    def test_paste(self):
+        for x, y, width, height in [(10, 20, 300, 150), (0, 0, 200, 100),
+                                    (50, 0, 260, 100), (150, 60, 250, 120)]:
+            seg = SegmentationMask(RAND_MASK.copy()).paste(x, y, width,
+                                                           height)
+            expected = np.zeros((height, width), dtype=bool)
+            expected[y:y + 100, x:x + 200] = \
+                RAND_MASK[:height - y, :width - x]
+            self.assertEqual((seg.width, seg.height), (width, height))
+            self.assertTrue(np.array_equal(seg.mask, expected))
+        empty = SegmentationMask(np.zeros((10, 10))).paste(5, 5, 20, 20)
+        self.assertEqual(empty.area, 0)
+
 if __name__ == '__main__':
     unittest.main()
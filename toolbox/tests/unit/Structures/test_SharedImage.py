@@ -0,0 +1,93 @@
+import multiprocessing
+import pickle
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from toolbox.Structures import Image, SharedImage, SharedImagePool
+
+
+def _sum_image(image: SharedImage) -> int:
+    value = int(image.image.sum())
+    image.close()
+    return value
+
+
+class TestSharedImage(unittest.TestCase):
+
+    def test_from_array(self):
+        np_img = np.random.randint(0, 255, (100, 200, 3), dtype=np.uint8)
+        img = SharedImage.from_array(np_img, path="path/to/image.jpg",
+                                     id="urn:ngsi-ld:Image:001")
+        self.assertIsInstance(img, Image)
+        self.assertEqual(img.height, 100)
+        self.assertEqual(img.width, 200)
+        self.assertTrue(np.array_equal(img.image, np_img))
+        self.assertEqual(img.path, Path("path/to/image.jpg"))
+        self.assertEqual(img.id, "urn:ngsi-ld:Image:001")
+        img.close()
+        self.assertTrue(img.closed)
+        self.assertRaises(ValueError, lambda: img.image)
+
+    def test_pickle(self):
+        np_img = np.random.randint(0, 255, (1080, 1920, 3), dtype=np.uint8)
+        img = SharedImage.from_array(np_img, id="urn:ngsi-ld:Image:001")
+        data = pickle.dumps(img)
+        self.assertLess(len(data), 1024)
+        img2 = pickle.loads(data)
+        self.assertEqual(img2.name, img.name)
+        self.assertEqual(img2.id, img.id)
+        self.assertTrue(np.array_equal(img2.image, np_img))
+        # Both objects map the same memory
+        img.image[0, 0] = (1, 2, 3)
+        self.assertTrue(np.array_equal(img2.image[0, 0], (1, 2, 3)))
+        img2.close()
+        img.close()
+
+    def test_refcount(self):
+        img = SharedImage.from_array(np.zeros((10, 10, 3), np.uint8))
+        img.acquire()
+        img.close()
+        self.assertFalse(img.closed)
+        img.close()
+        self.assertTrue(img.closed)
+
+    def test_to_image(self):
+        np_img = np.random.randint(0, 255, (10, 20, 3), dtype=np.uint8)
+        with SharedImage.from_array(np_img) as img:
+            copy = img.to_image()
+        self.assertNotIsInstance(copy, SharedImage)
+        self.assertTrue(np.array_equal(copy.image, np_img))
+
+    def test_pool(self):
+        with SharedImagePool(max_segments=2) as pool:
+            img1 = SharedImage.from_array(
+                np.zeros((10, 10, 3), np.uint8), pool=pool)
+            img2 = SharedImage.from_array(
+                np.zeros((10, 10, 3), np.uint8), pool=pool)
+            self.assertEqual(pool.num_segments, 2)
+            self.assertRaises(TimeoutError, lambda: pool.acquire(300, 0.01))
+            name = img1.name
+            img1.close()
+            self.assertEqual(pool.num_free, 1)
+            img3 = SharedImage.from_array(
+                np.ones((5, 5, 3), np.uint8), pool=pool)
+            self.assertEqual(img3.name, name)
+            self.assertEqual(pool.num_segments, 2)
+            self.assertTrue(np.array_equal(img3.image, np.ones((5, 5, 3))))
+            img2.close()
+            img3.close()
+            self.assertEqual(pool.num_free, 2)
+
+    def test_multiprocess(self):
+        np_img = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+        ctx = multiprocessing.get_context("spawn")
+        with SharedImage.from_array(np_img) as img:
+            with ctx.Pool(1) as p:
+                value = p.apply(_sum_image, (img,))
+        self.assertEqual(value, int(np_img.sum()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import threading
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from toolbox import DataModels
+from toolbox.utils.ApiBase import ApiBase
+
+
+class _Api(ApiBase):
+    """API whose models are loaded when ``loaded`` is set.
+    """
+
+    def __init__(self):
+        super().__init__(DataModels.Face)
+        self.host = "localhost"
+        self.port = 8080
+        self.allowed_origins = []
+        self.local_image_storage = True
+        self.config = {}
+        self.context_cli = mock.Mock()
+        self.loaded = threading.Event()
+
+    def _load_models(self):
+        if not self.loaded.wait(10):
+            raise TimeoutError
+
+    def _predict_entity(self, data_model, post_to_broker):
+        return []
+
+
+class TestApiBase(unittest.TestCase):
+
+    def test_ready(self):
+        api = _Api()
+        client = TestClient(api._server())
+        thread = threading.Thread(target=api._start)
+        thread.start()
+        response = client.get("/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {"ready": False})
+        # The requests are rejected until the models are loaded
+        response = client.post("/predict", json={"entity_id": "id"})
+        self.assertEqual(response.status_code, 503)
+        api.context_cli.get_entity.assert_not_called()
+        api.loaded.set()
+        thread.join()
+        response = client.get("/ready")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"ready": True})
+        response = client.post("/predict", json={"entity_id": "id"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_startup(self):
+        # The models are loaded when the server starts
+        api = _Api()
+        app = api._server()
+        api.loaded.set()
+        self.assertFalse(api._ready.wait(0.1))
+        with TestClient(app) as client:
+            self.assertTrue(api._ready.wait(10))
+            response = client.get("/ready")
+            self.assertEqual(response.json(), {"ready": True})
+
+    def test_load_error(self):
+        api = _Api()
+        api._load_models = mock.Mock(side_effect=RuntimeError)
+        api._uvicorn = mock.Mock(should_exit=False)
+        api._start()
+        self.assertTrue(api._uvicorn.should_exit)
+        self.assertFalse(api._ready.is_set())
+        api.context_cli.subscribe.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+import numpy as np
+import torch
+
+from toolbox.utils.nms import batched_nms, box_iou, nms, soft_nms
+
+
+def _reference_nms(boxes: np.ndarray, scores: np.ndarray,
+                   iou_threshold: float) -> list:
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while len(order) > 0:
+        i = order[0]
+        keep.append(i)
+        iou = box_iou(boxes[i:i + 1], boxes[order[1:]])[0]
+        order = order[1:][iou <= iou_threshold]
+    return keep
+
+
+def _random_boxes(n: int, seed: int = 0):
+    rng = np.random.RandomState(seed)
+    xy = rng.uniform(0, 500, (n, 2))
+    wh = rng.uniform(10, 100, (n, 2))
+    boxes = np.concatenate([xy, xy + wh], axis=1).astype(np.float32)
+    scores = rng.uniform(0, 1, n).astype(np.float32)
+    return boxes, scores
+
+
+class TestNMS(unittest.TestCase):
+
+    def test_box_iou(self):
+        a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+        b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]],
+                     dtype=np.float32)
+        iou = box_iou(a, b)
+        self.assertEqual(iou.shape, (1, 3))
+        self.assertTrue(np.allclose(iou, [[1, 1 / 3, 0]]))
+
+    def test_nms(self):
+        # More boxes than the block size
+        boxes, scores = _random_boxes(3000)
+        keep = nms(boxes, scores, 0.5)
+        self.assertEqual(keep.tolist(), _reference_nms(boxes, scores, 0.5))
+        self.assertTrue(np.all(np.diff(scores[keep]) <= 0))
+
+    def test_nms_top_k(self):
+        boxes, scores = _random_boxes(500)
+        keep = nms(boxes, scores, 0.5)
+        self.assertEqual(nms(boxes, scores, 0.5, top_k=10).tolist(),
+                         keep[:10].tolist())
+        keep = nms(boxes, scores, 0.5, max_candidates=100)
+        self.assertTrue(np.all(scores[keep] >= np.sort(scores)[-100]))
+
+    def test_nms_torchvision(self):
+        boxes, scores = _random_boxes(1000)
+        keep = nms(boxes, scores, 0.4, offset=1.)
+        keep_tv = nms(boxes, scores, 0.4, offset=1., backend="torchvision")
+        self.assertIsInstance(keep_tv, np.ndarray)
+        self.assertEqual(keep.tolist(), keep_tv.tolist())
+        keep_t = nms(torch.from_numpy(boxes), torch.from_numpy(scores), 0.4,
+                     offset=1.)
+        self.assertIsInstance(keep_t, torch.Tensor)
+        self.assertEqual(keep.tolist(), keep_t.tolist())
+
+    def test_empty(self):
+        boxes = np.zeros((0, 4), np.float32)
+        scores = np.zeros(0, np.float32)
+        self.assertEqual(len(nms(boxes, scores, 0.5)), 0)
+        self.assertEqual(len(batched_nms(boxes, scores, np.zeros(0), 0.5)), 0)
+        self.assertEqual(len(soft_nms(boxes, scores)[0]), 0)
+
+    def test_batched_nms(self):
+        boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [0, 0, 10, 10]],
+                         dtype=np.float32)
+        scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+        labels = np.array([0, 0, 1])
+        keep = batched_nms(boxes, scores, labels, 0.5)
+        self.assertEqual(keep.tolist(), [0, 2])
+        self.assertEqual(nms(boxes, scores, 0.5).tolist(), [0])
+
+    def test_soft_nms(self):
+        boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 60, 60]],
+                         dtype=np.float32)
+        scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+        keep, new_scores = soft_nms(boxes, scores, sigma=0.5)
+        self.assertEqual(keep.tolist(), [0, 2, 1])
+        self.assertAlmostEqual(new_scores[0], 0.9)
+        self.assertAlmostEqual(new_scores[1], 0.7)
+        self.assertLess(new_scores[2], 0.8)
+        keep, new_scores = soft_nms(boxes, scores, method="linear",
+                                    iou_threshold=0.9)
+        self.assertTrue(np.allclose(new_scores, [0.9, 0.8, 0.7]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from toolbox import DataModels
+from toolbox.Structures import BoundingBox, Image, SegmentationMask
+from toolbox.utils.prediction_cache import (PredictionCache,
+                                            create_prediction_cache)
+
+
+class TestPredictionCache(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.images = [
+            Image(image=rng.randint(0, 255, (48, 64, 3), dtype=np.uint8),
+                  id=f"urn:ngsi-ld:Image:{i}")
+            for i in range(3)
+        ]
+        self.calls = []
+
+    def _predict(self, image: Image):
+        self.calls.append(image.id)
+        return [DataModels.Face(
+            id="urn:ngsi-ld:Face:1",
+            bounding_box=BoundingBox(0.1, 0.2, 0.3, 0.4),
+            detection_confidence=float(image.image.mean()),
+            image=image.id
+        )]
+
+    def _predict_batch(self, images):
+        return [self._predict(image) for image in images]
+
+    def _copy(self, image: Image, id: str) -> Image:
+        return Image(image=image.image.copy(), id=id)
+
+    def test_hit(self):
+        cache = PredictionCache("model", {"param": 1})
+        face = cache.predict(self.images[0], self._predict)[0]
+        same_image = self._copy(self.images[0], "urn:ngsi-ld:Image:copy")
+        cached_face = cache.predict(same_image, self._predict)[0]
+        self.assertEqual(self.calls, [self.images[0].id])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertIsNone(cached_face.id)
+        self.assertEqual(cached_face.image, "urn:ngsi-ld:Image:copy")
+        self.assertGreaterEqual(cached_face.dateObserved, face.dateObserved)
+        self.assertEqual(cached_face.bounding_box, face.bounding_box)
+        self.assertEqual(cached_face.detection_confidence,
+                         face.detection_confidence)
+        # The cached entry is not modified by the returned data models
+        self.assertEqual(face.id, "urn:ngsi-ld:Face:1")
+        self.assertEqual(face.image, self.images[0].id)
+
+    def test_key(self):
+        cache = PredictionCache("model", {"param": 1})
+        image = self.images[0]
+        self.assertEqual(cache.get_key(image),
+                         cache.get_key(self._copy(image, "other")))
+        self.assertEqual(
+            cache.get_key(image),
+            PredictionCache("model", {"param": 1}).get_key(image))
+        self.assertNotEqual(
+            cache.get_key(image),
+            PredictionCache("model", {"param": 2}).get_key(image))
+        self.assertNotEqual(
+            cache.get_key(image),
+            PredictionCache("model2", {"param": 1}).get_key(image))
+        # Same pixels with another shape
+        reshaped = Image(image=image.image.reshape(64, 48, 3))
+        self.assertNotEqual(cache.get_key(image), cache.get_key(reshaped))
+        # Non contiguous arrays
+        flipped = Image(image=image.image[:, ::-1])
+        self.assertEqual(
+            cache.get_key(flipped),
+            cache.get_key(Image(image=np.ascontiguousarray(flipped.image))))
+        # Other toolbox versions
+        with mock.patch("toolbox.utils.prediction_cache.get_version",
+                        return_value="0.0.0"):
+            other = PredictionCache("model", {"param": 1})
+        self.assertNotEqual(cache.get_key(image), other.get_key(image))
+
+    def test_lru(self):
+        cache = PredictionCache("model", {}, max_entries=2)
+        for image in self.images[:2]:
+            cache.predict(image, self._predict)
+        # The first image is used, so the second one is evicted
+        cache.predict(self.images[0], self._predict)
+        cache.predict(self.images[2], self._predict)
+        self.assertEqual(cache.num_entries, 2)
+        self.assertIsNotNone(cache.get(self.images[0]))
+        self.assertIsNone(cache.get(self.images[1]))
+        self.assertIsNotNone(cache.get(self.images[2]))
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = PredictionCache("model", {}, max_entries=1,
+                                    disk_path=tmp_dir)
+            for image in self.images:
+                cache.predict(image, self._predict)
+            self.assertEqual(cache.num_entries, 1)
+            # Evicted from memory, but read from disk
+            self.assertIsNotNone(cache.get(self.images[0]))
+
+            # Other caches share the disk entries
+            cache2 = PredictionCache("model", {}, disk_path=tmp_dir)
+            faces = cache2.predict(
+                self._copy(self.images[1], "new"), self._predict)
+            self.assertEqual(faces[0].image, "new")
+            self.assertEqual(len(self.calls), 3)
+
+            cache2.clear()
+            self.assertIsNone(cache.get(self.images[2]))
+
+    def test_invalid_disk_entry(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = PredictionCache("model", {}, disk_path=tmp_dir)
+            images = self.images[:3]
+            cache.predict_batch(images, self._predict_batch)
+            # Truncated, foreign and non data model entries
+            keys = [cache.get_key(image) for image in images]
+            cache._disk_file(keys[0]).write_bytes(b"\x80\x05\x95")
+            cache._disk_file(keys[1]).write_bytes(b"not a pickle")
+            cache._disk_file(keys[2]).write_bytes(pickle.dumps([1, 2]))
+
+            cache2 = PredictionCache("model", {}, disk_path=tmp_dir)
+            results = cache2.predict_batch(images, self._predict_batch)
+            self.assertEqual((cache2.hits, cache2.misses), (0, 3))
+            for image, faces in zip(images, results):
+                self.assertEqual(faces[0].image, image.id)
+            # The entries are written again
+            self.assertIsNotNone(
+                PredictionCache("model", {}, disk_path=tmp_dir).get(
+                    images[0]))
+
+    def test_disk_size(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = PredictionCache("model", {}, max_entries=1,
+                                    disk_path=tmp_dir, max_disk_mb=1e-6)
+            for image in self.images:
+                cache.predict(image, self._predict)
+            # Only the entry in memory remains
+            for image in self.images[:2]:
+                self.assertIsNone(cache.get(image))
+            self.assertIsNotNone(cache.get(self.images[2]))
+
+    def test_predict_batch(self):
+        cache = PredictionCache("model", {})
+        cache.predict(self.images[1], self._predict)
+        results = cache.predict_batch(self.images, self._predict_batch)
+        self.assertEqual(len(results), 3)
+        self.assertEqual([r[0].image for r in results],
+                         [image.id for image in self.images])
+        self.assertEqual(self.calls, [self.images[1].id, self.images[0].id,
+                                      self.images[2].id])
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_segmentation_mask(self):
+        cache = PredictionCache("model", {})
+        mask = np.zeros((48, 64), dtype=bool)
+        mask[10:20, 5:30] = True
+        dm = DataModels.InstanceSegmentation(
+            mask=SegmentationMask(mask),
+            bounding_box=BoundingBox(0.1, 0.2, 0.3, 0.4),
+            label="person",
+            label_id=0,
+            confidence=0.9,
+            image=self.images[0].id
+        )
+        cache.put(self.images[0], [dm])
+        cached = cache.get(self.images[0])[0]
+        self.assertTrue(np.array_equal(cached.mask.mask, mask))
+        self.assertEqual(cached.label, "person")
+
+    def test_create_prediction_cache(self):
+        self.assertIsNone(create_prediction_cache({}, "model", {}))
+        cache = create_prediction_cache(
+            {"prediction_cache": {"max_entries": 4}}, "model", {})
+        self.assertEqual(cache.max_entries, 4)
+        with self.assertRaises(ValueError):
+            PredictionCache("model", {}, max_entries=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import unittest
+
+import cv2
+
+from toolbox.utils import runtime
+
+
+class TestRuntime(unittest.TestCase):
+
+    def setUp(self):
+        self._cv2_threads = cv2.getNumThreads()
+
+    def tearDown(self):
+        runtime.configure_runtime(None)
+        cv2.setNumThreads(self._cv2_threads)
+
+    def test_num_threads(self):
+        self.assertEqual(runtime.get_num_threads("torch"), (None, None))
+        runtime.configure_runtime({
+            "intra_op_threads": 4,
+            "inter_op_threads": 1,
+            "onnxruntime": {"intra_op_threads": 2}
+        })
+        self.assertEqual(runtime.get_num_threads("torch"), (4, 1))
+        self.assertEqual(runtime.get_num_threads("onnxruntime"), (2, 1))
+
+    def test_ort_session_options(self):
+        runtime.configure_runtime({"intra_op_threads": 3,
+                                   "inter_op_threads": 2})
+        options = runtime.ort_session_options()
+        self.assertEqual(options.intra_op_num_threads, 3)
+        self.assertEqual(options.inter_op_num_threads, 2)
+        # The parameters of the models take precedence
+        options = runtime.ort_session_options(intra_op_threads=1)
+        self.assertEqual(options.intra_op_num_threads, 1)
+        self.assertEqual(options.inter_op_num_threads, 2)
+
+    def test_opencv_threads(self):
+        runtime.configure_runtime({"opencv_threads": 1})
+        self.assertEqual(cv2.getNumThreads(), 1)
+
+    @unittest.skipUnless(hasattr(os, "sched_setaffinity"),
+                         "CPU affinity not supported")
+    def test_cpu_affinity(self):
+        cpus = os.sched_getaffinity(0)
+        try:
+            cpu = min(cpus)
+            runtime.configure_runtime({"cpu_affinity": [cpu]})
+            self.assertEqual(os.sched_getaffinity(0), {cpu})
+        finally:
+            os.sched_setaffinity(0, cpus)
+
+    def test_unknown_setting(self):
+        with self.assertRaises(ValueError):
+            runtime.configure_runtime({"threads": 4})
+        with self.assertRaises(ValueError):
+            runtime.configure_runtime({"torch": {"threads": 4}})
+
+
+if __name__ == "__main__":
+    unittest.main()
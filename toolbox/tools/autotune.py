@@ -0,0 +1,99 @@
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from toolbox.Models.Autotuner import TUNABLE_MODELS, Autotuner
+from toolbox.utils.config_utils import parse_config
+from toolbox.utils.runtime import configure_runtime
+
+
+def main(config_path: Path, cache_path: Optional[Path] = None,
+         model_keys: Optional[List[str]] = None,
+         image_size: Optional[List[int]] = None,
+         objective: str = "throughput", force: bool = False):
+    # Load the config
+    config = parse_config(config_path)
+    configure_runtime(config.get("runtime"))
+
+    # Tune the given model sections, or all the tunable ones
+    if model_keys is None:
+        model_keys = [
+            key for key, value in config.items()
+            if isinstance(value, dict)
+            and value.get("model_name") in TUNABLE_MODELS
+        ]
+    if not model_keys:
+        raise ValueError(f"{config_path} does not have any model of "
+                         f"{list(TUNABLE_MODELS)}")
+
+    for key in model_keys:
+        section = config[key]
+        kwargs = dict(section.get("autotune") or {})
+        if cache_path is not None:
+            kwargs["cache_path"] = cache_path
+        if image_size is not None:
+            kwargs["image_size"] = image_size
+        kwargs.setdefault("objective", objective)
+        tuner = Autotuner(section["model_name"], section["params"], **kwargs)
+        print(f"Tuning {key} ({section['model_name']}): "
+              f"{len(tuner.get_candidates())} candidates, "
+              f"{len(tuner.batch_sizes)} batch sizes")
+        params = tuner.get_best_params(force)
+        print(f"Best {key} parameters:")
+        for name, value in params.items():
+            print(f"  {name}: {value}")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Find the fastest backend, "
+                                 "threads and batch size of the models of a "
+                                 "config on this host and cache them.")
+    ap.add_argument(
+        "-c",
+        "--config",
+        help="Path to a configuration YAML file with the parameters and model "
+             "name.",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-o",
+        "--cache-path",
+        help="JSON file where the tuned parameters are cached. Defaults to "
+             "the cache_path of the autotune section of each model",
+        type=Path
+    )
+    ap.add_argument(
+        "-k",
+        "--model-key",
+        help="Optional keys on the configuration YAML containing the models "
+             "parameters. Defaults to all the tunable models",
+        nargs="+"
+    )
+    ap.add_argument(
+        "-s",
+        "--image-size",
+        help="Width and height of the synthetic images",
+        type=int,
+        nargs=2
+    )
+    ap.add_argument(
+        "--objective",
+        help="Minimize the time per image of batches or of single images",
+        choices=["throughput", "latency"],
+        default="throughput"
+    )
+    ap.add_argument(
+        "-f",
+        "--force",
+        help="Run the benchmark even if the parameters are cached",
+        action="store_true"
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.config, args.cache_path, args.model_key, args.image_size,
+         args.objective, args.force)
@@ -0,0 +1,110 @@
+import argparse
+import time
+
+import numpy as np
+
+from toolbox.Models.face_recognition_facenet.Gallery import Gallery
+
+
+def loop_search(features: dict, query: np.ndarray, max_distance: float
+                ) -> list:
+    """Reference search that compares the query with each stored vector.
+    """
+    matches = []
+    for name, f in features.items():
+        dist = np.sum(np.square(query - f))
+        if dist < max_distance:
+            matches.append((name, dist))
+    return sorted(matches, key=lambda x: x[1])
+
+
+def random_features(num: int, dim: int, rng: np.random.RandomState
+                    ) -> np.ndarray:
+    features = rng.normal(size=(num, dim)).astype(np.float32)
+    return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def main(gallery_size: int, num_queries: int, dim: int, max_distance: float,
+         num_probes: int):
+    rng = np.random.RandomState(0)
+    features = random_features(gallery_size, dim, rng)
+    names = [f"person_{i}" for i in range(gallery_size)]
+    # Noisy copies of gallery vectors
+    queries = features[rng.randint(0, gallery_size, num_queries)] + \
+        0.02 * random_features(num_queries, dim, rng)
+
+    print(f"{gallery_size} features of size {dim}, {num_queries} queries")
+
+    features_dict = dict(zip(names, features))
+    ti = time.time()
+    expected = [loop_search(features_dict, q, max_distance)[:1]
+                for q in queries[:min(num_queries, 10)]]
+    loop_time = (time.time() - ti) / len(expected)
+    print(f"loop: {loop_time * 1000:.2f} ms/query")
+
+    exact = Gallery.from_dict(features_dict)
+    ti = time.time()
+    results = exact.search(queries, max_distance, top_k=1)
+    print(f"exact: {(time.time() - ti) / num_queries * 1000:.3f} ms/query")
+
+    ivf = Gallery.from_dict(features_dict, index="ivf",
+                            num_probes=num_probes, min_ivf_size=0)
+    ti = time.time()
+    ivf.search(queries[:1], max_distance)
+    print(f"ivf training: {time.time() - ti:.2f} s")
+    ti = time.time()
+    ivf_results = ivf.search(queries, max_distance, top_k=1)
+    print(f"ivf: {(time.time() - ti) / num_queries * 1000:.3f} ms/query")
+
+    found = sum(bool(r2) and r1[0][0] == r2[0][0]
+                for r1, r2 in zip(results, ivf_results) if r1)
+    print(f"ivf recall@1: {found / max(sum(map(bool, results)), 1):.4f}")
+    assert all(r[0][0] == e[0][0] for r, e in zip(results, expected) if e)
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Compute the mean search time "
+                                             "of the face features gallery.")
+    ap.add_argument(
+        "-g",
+        "--gallery-size",
+        help="Number of stored features",
+        type=int,
+        default=200000
+    )
+    ap.add_argument(
+        "-q",
+        "--num-queries",
+        help="Number of searched features",
+        type=int,
+        default=256
+    )
+    ap.add_argument(
+        "-d",
+        "--dim",
+        help="Size of the features vectors",
+        type=int,
+        default=128
+    )
+    ap.add_argument(
+        "-t",
+        "--max-distance",
+        help="Maximum squared distance of the matches",
+        type=float,
+        default=0.75
+    )
+    ap.add_argument(
+        "-p",
+        "--num-probes",
+        help="Number of inverted lists searched by the ivf index",
+        type=int,
+        default=8
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.gallery_size, args.num_queries, args.dim, args.max_distance,
+         args.num_probes)
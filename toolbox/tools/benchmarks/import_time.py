@@ -0,0 +1,174 @@
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_MODULES = [
+    "toolbox.Models",
+    "toolbox.Context",
+    "toolbox.Visualization",
+    "toolbox.Projects.FaceDetection.FaceDetection",
+    "toolbox.Projects.FaceDetection.api",
+]
+
+# Packages reported when they are loaded by an import
+HEAVY_PACKAGES = [
+    "tensorflow",
+    "torch",
+    "torchvision",
+    "onnxruntime",
+    "detectron2",
+    "scipy",
+    "seaborn",
+    "matplotlib",
+    "ngsildclient",
+]
+
+# Code run on a new interpreter to measure the import of a module
+_CHILD_CODE = """
+import json, resource, sys, time
+t = time.perf_counter()
+import {module}
+t = time.perf_counter() - t
+heavy = [p for p in {heavy!r} if p in sys.modules]
+print(json.dumps({{
+    "time": t,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": heavy,
+}}))
+"""
+
+
+def measure(module: str, repeat: int = 3) -> Dict:
+    """Import a module on new interpreters and measure the import time, the
+    peak memory and the heavy packages loaded.
+
+    Args:
+        module (str): Name of the module to import.
+        repeat (int, optional): Number of runs, the fastest one is reported.
+            Defaults to 3.
+
+    Raises:
+        RuntimeError: If the module can not be imported.
+
+    Returns:
+        Dict: The "time" in seconds, the "max_rss_mb" and the list of
+            "heavy" packages loaded.
+    """
+    code = _CHILD_CODE.format(module=module, heavy=HEAVY_PACKAGES)
+    results = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Unable to import {module}:\n{proc.stderr}")
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda r: r["time"])
+
+
+def top_imports(module: str, top: int = 10) -> List[tuple]:
+    """Get the slowest imports of a module using ``python -X importtime``.
+
+    Args:
+        module (str): Name of the module to import.
+        top (int, optional): Number of imports to return. Defaults to 10.
+
+    Returns:
+        List[tuple]: List of (cumulative time in seconds, module name).
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                           f"import {module}"], capture_output=True, text=True)
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(fields[1]) / 1e6
+        except ValueError:
+            continue
+        imports.append((cumulative, fields[2].strip()))
+    # Only the top-level imports of each package
+    imports = [i for i in imports if "." not in i[1]]
+    return sorted(imports, reverse=True)[:top]
+
+
+def main(modules: List[str], repeat: int = 3,
+         output_path: Optional[Path] = None,
+         compare_path: Optional[Path] = None, top: int = 0):
+    baseline = {}
+    if compare_path is not None:
+        baseline = json.loads(compare_path.read_text())
+
+    report = {}
+    for module in modules:
+        report[module] = measure(module, repeat)
+
+    w = max(len(m) for m in modules) + 2
+    print(f"{'Module':<{w}} {'Time (s)':>10} {'RSS (MB)':>10}  Heavy imports")
+    for module, r in report.items():
+        print(f"{module:<{w}} {r['time']:>10.3f} {r['max_rss_mb']:>10.1f}  "
+              f"{', '.join(r['heavy']) or '-'}")
+        if module in baseline:
+            b = baseline[module]
+            print(f"{'  baseline':<{w}} {b['time']:>10.3f} "
+                  f"{b['max_rss_mb']:>10.1f}  {', '.join(b['heavy']) or '-'}")
+        if top > 0:
+            for cumulative, name in top_imports(module, top):
+                print(f"    {name:<{w - 4}} {cumulative:>10.3f}")
+
+    if output_path is not None:
+        output_path.write_text(json.dumps(report, indent=2))
+        print(f"Report saved to {output_path}")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Measure the import time and "
+                                 "memory of the toolbox modules.")
+    ap.add_argument(
+        "-m",
+        "--modules",
+        help="Modules to import (default: %(default)s)",
+        nargs="+",
+        default=DEFAULT_MODULES
+    )
+    ap.add_argument(
+        "-n",
+        "--repeat",
+        help="Number of imports of each module, the fastest one is reported "
+             "(default: %(default)s)",
+        type=int,
+        default=3
+    )
+    ap.add_argument(
+        "-o",
+        "--output",
+        help="Optional path to save the report as a JSON file.",
+        type=Path,
+        default=None
+    )
+    ap.add_argument(
+        "-c",
+        "--compare",
+        help="Optional path to a JSON report to compare with, e.g. saved "
+             "from a previous version.",
+        type=Path,
+        default=None
+    )
+    ap.add_argument(
+        "-t",
+        "--top",
+        help="Show the N slowest packages imported by each module "
+             "(default: %(default)s)",
+        type=int,
+        default=0
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.modules, args.repeat, args.output, args.compare, args.top)
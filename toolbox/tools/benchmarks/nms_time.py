@@ -0,0 +1,117 @@
+import argparse
+import time
+from typing import Callable
+
+import numpy as np
+
+from toolbox.utils.nms import batched_nms, nms, soft_nms
+
+
+def loop_nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float
+             ) -> list:
+    """Reference NMS that computes the IoU of the best remaining box with the
+    rest of boxes on each iteration.
+    """
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+        ovr = inter / (areas[i] + areas[order[1:]] - inter)
+        order = order[1:][ovr <= iou_threshold]
+    return keep
+
+
+def random_boxes(num_boxes: int, num_classes: int, image_size: int = 1000):
+    """Create random boxes clustered around some centers, like the candidates
+    of a detector.
+    """
+    rng = np.random.RandomState(0)
+    centers = rng.uniform(0, image_size, (max(num_boxes // 50, 1), 2))
+    xy = centers[rng.randint(0, len(centers), num_boxes)] + \
+        rng.normal(0, 10, (num_boxes, 2))
+    wh = rng.uniform(20, 100, (num_boxes, 2))
+    boxes = np.concatenate([xy - wh / 2, xy + wh / 2], axis=1)
+    scores = rng.uniform(0, 1, num_boxes)
+    labels = rng.randint(0, num_classes, num_boxes)
+    return boxes.astype(np.float32), scores.astype(np.float32), labels
+
+
+def time_function(f: Callable, repeats: int) -> float:
+    f()
+    ti = time.time()
+    for _ in range(repeats):
+        f()
+    return (time.time() - ti) / repeats
+
+
+def main(num_boxes: int, num_classes: int, iou_threshold: float,
+         repeats: int):
+    boxes, scores, labels = random_boxes(num_boxes, num_classes)
+
+    functions = {
+        "loop": lambda: loop_nms(boxes, scores, iou_threshold),
+        "nms (numpy)": lambda: nms(boxes, scores, iou_threshold),
+        "batched_nms (numpy)": lambda: batched_nms(
+            boxes, scores, labels, iou_threshold),
+        "soft_nms": lambda: soft_nms(boxes, scores),
+    }
+    try:
+        import torchvision
+        functions["nms (torchvision)"] = lambda: nms(
+            boxes, scores, iou_threshold, backend="torchvision")
+        functions["batched_nms (torchvision)"] = lambda: batched_nms(
+            boxes, scores, labels, iou_threshold, backend="torchvision")
+    except ImportError:
+        pass
+
+    print(f"{num_boxes} boxes, {num_classes} classes")
+    for name, f in functions.items():
+        print(f"{name}: {time_function(f, repeats) * 1000:.2f} ms")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Compute the mean time of the "
+                                             "NMS implementations.")
+    ap.add_argument(
+        "-n",
+        "--num-boxes",
+        help="Number of candidate boxes",
+        type=int,
+        default=5000
+    )
+    ap.add_argument(
+        "-c",
+        "--num-classes",
+        help="Number of classes of the batched NMS",
+        type=int,
+        default=1
+    )
+    ap.add_argument(
+        "-t",
+        "--iou-threshold",
+        help="IoU threshold",
+        type=float,
+        default=0.5
+    )
+    ap.add_argument(
+        "-r",
+        "--repeats",
+        help="Number of repetitions",
+        type=int,
+        default=10
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.num_boxes, args.num_classes, args.iou_threshold, args.repeats)
@@ -9,6 +9,7 @@ from tqdm import tqdm
 
 from toolbox.Models import model_catalog
 from toolbox.utils.config_utils import parse_config
+from toolbox.utils.runtime import configure_runtime
 
 
 def get_images_list(images_path: Path) -> List[Path]:
@@ -32,6 +33,7 @@ def get_images_list(images_path: Path) -> List[Path]:
 def main(images_path: Path, config_path: Path, model_key: Optional[str] = None):
     # Load the model config
     config = parse_config(config_path)
+    configure_runtime(config.get("runtime"))
 
     # Create the model
     if model_key is not None:
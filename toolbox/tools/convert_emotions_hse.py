@@ -0,0 +1,181 @@
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from toolbox.Models.emotions_hse import EmotionsClassifier
+from toolbox.tools.benchmarks.predict_image_time import get_images_list
+
+_FORMATS = {
+    "onnx": "onnxruntime",
+    "tflite": "tflite"
+}
+
+
+def convert_onnx(keras_model, output_path: Path, opset: int = 13):
+    """Convert a Keras emotions model to ONNX with a dynamic batch axis.
+
+    Args:
+        keras_model (tf.keras.Model): The loaded Keras model.
+        output_path (Path): Output .onnx file path.
+        opset (int, optional): ONNX opset version. Defaults to 13.
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(
+        keras_model,
+        input_signature=spec,
+        opset=opset,
+        output_path=str(output_path)
+    )
+
+
+def convert_tflite(keras_model, output_path: Path):
+    """Convert a Keras emotions model to TFLite. The batch dimension of the
+    model is kept dynamic and resized by the interpreter.
+
+    Args:
+        keras_model (tf.keras.Model): The loaded Keras model.
+        output_path (Path): Output .tflite file path.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    output_path.write_bytes(converter.convert())
+
+
+def check_parity(keras_classifier: EmotionsClassifier,
+                 classifier: EmotionsClassifier, images: List[np.ndarray]
+                 ) -> Dict[str, float]:
+    """Compare the output probabilities of a converted model with the ones
+    of the Keras model.
+
+    Args:
+        keras_classifier (EmotionsClassifier): Classifier with the "keras"
+            backend.
+        classifier (EmotionsClassifier): Classifier with the converted model.
+        images (List[np.ndarray]): BGR uint8 face images.
+
+    Returns:
+        Dict[str, float]: Maximum and mean absolute difference of the
+            probabilities and fraction of images with the same predicted
+            emotion.
+    """
+    batch = keras_classifier._preprocess_image(images)
+    expected = keras_classifier._run_model(batch)
+    output = classifier._run_model(batch)
+    diff = np.abs(expected - output)
+    return {
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "argmax_agreement": float(np.mean(
+            np.argmax(expected, axis=1) == np.argmax(output, axis=1)))
+    }
+
+
+def main(model_path: Path, output_path: Path, formats: List[str],
+         images_path: Optional[Path] = None, num_images: int = 16,
+         opset: int = 13, tolerance: float = 1e-4):
+    output_path.mkdir(parents=True, exist_ok=True)
+    keras_classifier = EmotionsClassifier(model_path, backend="keras")
+
+    # Parity images
+    if images_path is not None:
+        images = [cv2.imread(str(p))
+                  for p in get_images_list(images_path)[:num_images]]
+    else:
+        rng = np.random.RandomState(0)
+        images = [rng.randint(0, 255, (224, 224, 3), dtype=np.uint8)
+                  for _ in range(num_images)]
+
+    failed = []
+    for fmt in formats:
+        out_path = output_path / f"{model_path.stem}.{fmt}"
+        print(f"Converting {model_path} -> {out_path}")
+        if fmt == "onnx":
+            convert_onnx(keras_classifier._model.model, out_path, opset)
+        else:
+            convert_tflite(keras_classifier._model.model, out_path)
+
+        classifier = EmotionsClassifier(out_path, backend=_FORMATS[fmt])
+        results = check_parity(keras_classifier, classifier, images)
+        print(f"Parity of {fmt} on {len(images)} images:")
+        for key, value in results.items():
+            print(f"  {key}: {value:.6f}")
+        if results["max_abs_diff"] > tolerance:
+            failed.append(fmt)
+        print("Model params:")
+        print(f"  model_path: {out_path}")
+        print(f"  backend: {_FORMATS[fmt]}")
+
+    if failed:
+        raise RuntimeError(f"The outputs of {failed} differ from the Keras "
+                           f"model by more than {tolerance}")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Convert the emotions_hse Keras "
+                                 "model to ONNX and TFLite and check the "
+                                 "parity of their outputs.")
+    ap.add_argument(
+        "-m",
+        "--model-path",
+        help="Path to the .h5 model file.",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-o",
+        "--output-path",
+        help="Output folder of the converted models.",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-f",
+        "--formats",
+        help="Output formats.",
+        nargs="+",
+        choices=list(_FORMATS),
+        default=list(_FORMATS)
+    )
+    ap.add_argument(
+        "-i",
+        "--images-path",
+        help="Root path to face images used to check the parity of the "
+             "outputs. Random images are used if not set.",
+        type=Path,
+        default=None
+    )
+    ap.add_argument(
+        "-n",
+        "--num-images",
+        help="Maximum number of images used to check the parity.",
+        type=int,
+        default=16
+    )
+    ap.add_argument(
+        "--opset",
+        help="ONNX opset version.",
+        type=int,
+        default=13
+    )
+    ap.add_argument(
+        "-t",
+        "--tolerance",
+        help="Maximum absolute difference of the output probabilities.",
+        type=float,
+        default=1e-4
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.model_path, args.output_path, args.formats, args.images_path,
+         args.num_images, args.opset, args.tolerance)
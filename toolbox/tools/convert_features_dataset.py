@@ -0,0 +1,61 @@
+import argparse
+from pathlib import Path
+
+from toolbox.Models.face_recognition_facenet.FeaturesStore import \
+    FeaturesStore
+
+
+def main(input_path: Path, output_path: Path, compact: bool = False):
+    if input_path.suffix == ".pkl":
+        if output_path.suffix == ".pkl":
+            raise ValueError("The input or the output must be a features "
+                             "store folder")
+        FeaturesStore(output_path).import_pickle(input_path)
+        print(f"Imported {input_path} into {output_path}")
+        return
+
+    store = FeaturesStore(input_path)
+    if compact:
+        store.compact()
+        print(f"Compacted {input_path}")
+    if output_path.suffix == ".pkl":
+        store.export_pickle(output_path)
+        print(f"Exported {input_path} to {output_path}")
+    elif output_path.resolve() != input_path.resolve():
+        names, features, _ = store.read()
+        FeaturesStore(output_path).write(names, features)
+        print(f"Copied {input_path} to {output_path}")
+    print(f"{len(store)} features")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Convert a face recognition "
+                                 "dataset between a pickle file and a "
+                                 "features store folder.")
+    ap.add_argument(
+        "-i",
+        "--input",
+        help="Input pickle file (.pkl) or features store folder.",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-o",
+        "--output",
+        help="Output pickle file (.pkl) or features store folder.",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "--compact",
+        help="Merge the append log of the input features store into its "
+             "features matrix.",
+        action="store_true"
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.input, args.output, args.compact)
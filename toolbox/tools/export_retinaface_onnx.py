@@ -0,0 +1,89 @@
+import argparse
+from pathlib import Path
+from typing import Literal, Tuple
+
+import torch
+
+from toolbox.Models.face_detector_retinaface import FaceDetector
+
+
+def export_onnx(
+    weights_path: Path,
+    model_name: Literal["mobile0.25", "resnet50"],
+    output_path: Path,
+    opset: int = 13,
+    input_size: Tuple[int, int] = (640, 640)
+):
+    """Export a RetinaFace model to ONNX with dynamic batch, height and width
+    axes.
+
+    Args:
+        weights_path (Path): Path to the .pth weights file.
+        model_name (Literal["mobile0.25", "resnet50"]): The model backbone
+            name.
+        output_path (Path): Output .onnx file path.
+        opset (int, optional): ONNX opset version. Defaults to 13.
+        input_size (Tuple[int, int], optional): (height, width) of the dummy
+            input used to trace the model. Defaults to (640, 640).
+    """
+    detector = FaceDetector(weights_path, model_name)
+    dummy = torch.zeros((1, 3, *input_size))
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    export_kwargs = dict(
+        input_names=["input"],
+        output_names=["loc", "conf", "landmarks"],
+        dynamic_axes={
+            "input": {0: "batch", 2: "height", 3: "width"},
+            "loc": {0: "batch", 1: "priors"},
+            "conf": {0: "batch", 1: "priors"},
+            "landmarks": {0: "batch", 1: "priors"},
+        },
+        opset_version=opset,
+    )
+    try:
+        torch.onnx.export(detector._net, dummy, str(output_path),
+                          dynamo=False, **export_kwargs)
+    except TypeError:
+        # torch < 2.5 has no dynamo argument
+        torch.onnx.export(detector._net, dummy, str(output_path),
+                          **export_kwargs)
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Export a RetinaFace model to "
+                                             "ONNX.")
+    ap.add_argument(
+        "-w",
+        "--weights",
+        help="Path to the .pth weights file",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-m",
+        "--model-name",
+        help="Model backbone name",
+        choices=["mobile0.25", "resnet50"],
+        required=True
+    )
+    ap.add_argument(
+        "-o",
+        "--output",
+        help="Output .onnx file path",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "--opset",
+        help="ONNX opset version (default 13)",
+        type=int,
+        default=13
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    export_onnx(args.weights, args.model_name, args.output, args.opset)
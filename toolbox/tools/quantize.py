@@ -0,0 +1,370 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+from onnxruntime.quantization import (CalibrationDataReader, QuantFormat,
+                                      QuantType, quantize_dynamic,
+                                      quantize_static)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from toolbox.Models import model_catalog
+from toolbox.tools.benchmarks.predict_image_time import get_images_list
+from toolbox.tools.export_retinaface_onnx import export_onnx
+from toolbox.utils.config_utils import parse_config
+
+
+def _retinaface_inputs(model, image: np.ndarray) -> np.ndarray:
+    image = model._scale_input_image(image)
+    return model._preprocess_image(image).cpu().numpy()
+
+
+def _compare_detections(fp32_instances: List, int8_instances: List,
+                        iou_threshold: float = 0.5) -> Dict[str, float]:
+    """Match the detections of the int8 model with the ones of the fp32
+    model.
+
+    Args:
+        fp32_instances (List): Instances predicted by the fp32 model.
+        int8_instances (List): Instances predicted by the int8 model.
+        iou_threshold (float, optional): Minimum IoU to match two boxes.
+            Defaults to 0.5.
+
+    Returns:
+        Dict[str, float]: Number of fp32 and int8 boxes, number of matched
+            boxes and sum of the absolute confidence differences of the
+            matched boxes.
+    """
+    stats = {
+        "fp32_boxes": len(fp32_instances),
+        "int8_boxes": len(int8_instances),
+        "matched": 0,
+        "confidence_delta": 0.
+    }
+    if not fp32_instances or not int8_instances:
+        return stats
+    a = np.array([i.bounding_box.get_xyxy() for i in fp32_instances])
+    b = np.array([i.bounding_box.get_xyxy() for i in int8_instances])
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    iou = inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+    # Greedy matching from the highest IoU
+    for _ in range(min(len(a), len(b))):
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        stats["matched"] += 1
+        stats["confidence_delta"] += abs(
+            float(fp32_instances[i].confidence) -
+            float(int8_instances[j].confidence)
+        )
+        iou[i, :] = -1
+        iou[:, j] = -1
+    return stats
+
+
+def _detection_report(stats: List[Dict[str, float]]) -> Dict[str, float]:
+    fp32 = sum(s["fp32_boxes"] for s in stats)
+    int8 = sum(s["int8_boxes"] for s in stats)
+    matched = sum(s["matched"] for s in stats)
+    delta = sum(s["confidence_delta"] for s in stats)
+    return {
+        "recall": matched / fp32 if fp32 else 1.,
+        "precision": matched / int8 if int8 else 1.,
+        "mean_confidence_delta": delta / matched if matched else 0.
+    }
+
+
+def _compare_age_gender(fp32_instances: List, int8_instances: List
+                        ) -> Dict[str, float]:
+    stats = {}
+    fp32, int8 = fp32_instances[0], int8_instances[0]
+    if fp32.has("age"):
+        stats["age_error"] = abs(float(fp32.age) - float(int8.age))
+    if fp32.has("gender"):
+        stats["gender_agreement"] = float(fp32.gender == int8.gender)
+    return stats
+
+
+def _age_gender_report(stats: List[Dict[str, float]]) -> Dict[str, float]:
+    report = {}
+    if "age_error" in stats[0]:
+        report["age_mae"] = float(np.mean([s["age_error"] for s in stats]))
+    if "gender_agreement" in stats[0]:
+        report["gender_agreement"] = float(
+            np.mean([s["gender_agreement"] for s in stats]))
+    return report
+
+
+# Supported models. For each model name:
+#   params: parameters of the model with the path to an onnx file.
+#   inputs: function to get the input array of the onnx models from an image.
+#   compare: function to compare the fp32 and int8 predictions of an image.
+#   report: function to aggregate the comparisons of all the images.
+#   quant_format: format of the static quantization. cv2.dnn only supports
+#       the QOperator format.
+QUANTIZABLE_MODELS = {
+    "face_detector_ultraface": {
+        "params": ["model_path"],
+        "inputs": lambda model, image: model._preprocess_image(image),
+        "compare": _compare_detections,
+        "report": _detection_report,
+        "quant_format": QuantFormat.QDQ
+    },
+    "face_detector_retinaface": {
+        "params": ["weights_path"],
+        "inputs": _retinaface_inputs,
+        "compare": _compare_detections,
+        "report": _detection_report,
+        "quant_format": QuantFormat.QDQ
+    },
+    "age_gender": {
+        "params": ["age_model_path", "gender_model_path"],
+        "inputs": lambda model, image: \
+            model._preprocess_image(image).astype(np.float32),
+        "compare": _compare_age_gender,
+        "report": _age_gender_report,
+        "quant_format": QuantFormat.QOperator
+    }
+}
+
+
+class ImagesDataReader(CalibrationDataReader):
+    """Feed the preprocessed calibration images to the onnxruntime
+    calibrator.
+    """
+
+    def __init__(self, images: List[np.ndarray], input_name: str,
+                 preprocess: Callable[[np.ndarray], np.ndarray]):
+        """Create the data reader.
+
+        Args:
+            images (List[np.ndarray]): BGR uint8 calibration images.
+            input_name (str): Name of the input of the onnx model.
+            preprocess (Callable[[np.ndarray], np.ndarray]): Function that
+                converts an image into a model input.
+        """
+        self._images = images
+        self._input_name = input_name
+        self._preprocess = preprocess
+        self._index = 0
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        if self._index >= len(self._images):
+            return None
+        image = self._images[self._index]
+        self._index += 1
+        return {self._input_name: self._preprocess(image)}
+
+
+def quantize_model(model_path: Path, output_path: Path, mode: str,
+                   data_reader: Optional[CalibrationDataReader] = None,
+                   quant_format: QuantFormat = QuantFormat.QDQ,
+                   per_channel: bool = False):
+    """Quantize an onnx model to int8.
+
+    Args:
+        model_path (Path): Path to the fp32 onnx model.
+        output_path (Path): Path of the quantized model.
+        mode (str): "dynamic" or "static".
+        data_reader (Optional[CalibrationDataReader], optional): Calibration
+            data, required by the static quantization. Defaults to None.
+        quant_format (QuantFormat, optional): Format of the static
+            quantization. Defaults to QuantFormat.QDQ.
+        per_channel (bool, optional): Quantize the weights per channel.
+            Defaults to False.
+
+    Raises:
+        ValueError: If ``mode`` is not "dynamic" or "static".
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Shape inference and graph optimization before the quantization
+        prep_path = Path(tmp_dir) / "preprocessed.onnx"
+        quant_pre_process(str(model_path), str(prep_path))
+        if mode == "dynamic":
+            quantize_dynamic(
+                str(prep_path),
+                str(output_path),
+                per_channel=per_channel,
+                weight_type=QuantType.QInt8
+            )
+        elif mode == "static":
+            quantize_static(
+                str(prep_path),
+                str(output_path),
+                data_reader,
+                quant_format=quant_format,
+                per_channel=per_channel,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8
+            )
+        else:
+            raise ValueError("``mode`` should be one of 'dynamic' or "
+                             "'static'")
+
+
+def evaluate(fp32_model, int8_model, images: List[np.ndarray],
+             compare: Callable, report: Callable) -> Dict[str, float]:
+    """Compare the predictions and latency of the fp32 and int8 models.
+
+    Args:
+        fp32_model: The original model.
+        int8_model: The quantized model.
+        images (List[np.ndarray]): BGR uint8 evaluation images.
+        compare (Callable): Function to compare the predictions of an image.
+        report (Callable): Function to aggregate the comparisons.
+
+    Returns:
+        Dict[str, float]: The accuracy metrics and the mean latencies.
+    """
+    stats = []
+    fp32_times, int8_times = [], []
+    for image in images:
+        ti = time.time()
+        fp32_instances = fp32_model.predict(image)
+        fp32_times.append(time.time() - ti)
+        ti = time.time()
+        int8_instances = int8_model.predict(image)
+        int8_times.append(time.time() - ti)
+        stats.append(compare(fp32_instances, int8_instances))
+    results = report(stats)
+    results["fp32_time"] = float(np.mean(fp32_times))
+    results["int8_time"] = float(np.mean(int8_times))
+    results["speedup"] = results["fp32_time"] / results["int8_time"]
+    return results
+
+
+def main(calibration_path: Path, config_path: Path, output_path: Path,
+         mode: str, model_key: Optional[str] = None,
+         eval_path: Optional[Path] = None, max_images: int = 100,
+         per_channel: bool = False):
+    # Load the model config
+    config = parse_config(config_path)
+    if model_key is not None:
+        config = config[model_key]
+    model_name = config["model_name"]
+    model_params = config["params"]
+    if model_name not in QUANTIZABLE_MODELS:
+        raise ValueError(f"Model {model_name} can not be quantized. "
+                         f"Supported models: {list(QUANTIZABLE_MODELS)}")
+    spec = QUANTIZABLE_MODELS[model_name]
+
+    # Load the images
+    calib_images = [cv2.imread(str(p))
+                    for p in get_images_list(calibration_path)[:max_images]]
+    if eval_path is not None:
+        eval_images = [cv2.imread(str(p))
+                       for p in get_images_list(eval_path)[:max_images]]
+    else:
+        eval_images = calib_images
+
+    fp32_model = model_catalog[model_name](**model_params)
+    output_path.mkdir(parents=True, exist_ok=True)
+    int8_params = dict(model_params)
+    for param in spec["params"]:
+        model_path = Path(model_params[param])
+        if model_path.suffix == ".pth":
+            # Torch RetinaFace, quantize its onnx export
+            onnx_path = output_path / f"{model_path.stem}.onnx"
+            export_onnx(model_path, model_params["model_name"], onnx_path)
+            model_path = onnx_path
+            int8_params["backend"] = "onnx"
+        out_path = output_path / f"{model_path.stem}_int8_{mode}.onnx"
+        data_reader = None
+        if mode == "static":
+            data_reader = ImagesDataReader(
+                calib_images,
+                ort.InferenceSession(str(model_path)).get_inputs()[0].name,
+                lambda image: spec["inputs"](fp32_model, image)
+            )
+        print(f"Quantizing {model_path} -> {out_path}")
+        quantize_model(model_path, out_path, mode, data_reader,
+                       spec["quant_format"], per_channel)
+        int8_params[param] = str(out_path)
+
+    int8_model = model_catalog[model_name](**int8_params)
+    results = evaluate(fp32_model, int8_model, eval_images,
+                       spec["compare"], spec["report"])
+
+    print(f"Results on {len(eval_images)} images:")
+    for key, value in results.items():
+        print(f"  {key}: {value:.4f}")
+    print("Quantized model params:")
+    for key, value in int8_params.items():
+        print(f"  {key}: {value}")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Create int8 versions of the "
+                                 "onnx and torch models and compare them "
+                                 "with the fp32 models.")
+    ap.add_argument(
+        "-i",
+        "--calibration-path",
+        help="Root path to the calibration images. Face crops for the "
+             "age_gender model.",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-c",
+        "--config",
+        help="Path to a configuration YAML file with the parameters and model "
+             "name.",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-o",
+        "--output-path",
+        help="Folder where the quantized models are saved",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-m",
+        "--mode",
+        help="Quantization mode",
+        choices=["dynamic", "static"],
+        default="static"
+    )
+    ap.add_argument(
+        "-k",
+        "--model-key",
+        help="Optional key on the configuration YAML containing the model's "
+        "parameters",
+    )
+    ap.add_argument(
+        "-e",
+        "--eval-path",
+        help="Optional root path to the evaluation images. Defaults to the "
+             "calibration images",
+        type=Path
+    )
+    ap.add_argument(
+        "-n",
+        "--max-images",
+        help="Maximum number of calibration and evaluation images",
+        type=int,
+        default=100
+    )
+    ap.add_argument(
+        "--per-channel",
+        help="Quantize the weights per channel",
+        action="store_true"
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.calibration_path, args.config, args.output_path, args.mode,
+         args.model_key, args.eval_path, args.max_images, args.per_channel)
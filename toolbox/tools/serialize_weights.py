@@ -0,0 +1,87 @@
+import argparse
+from pathlib import Path
+
+from toolbox.Models.backends import create_backend
+
+
+def serialize_torch(weights_path: Path, output_path: Path):
+    """Save a PyTorch checkpoint as a plain state dict in the zipfile format,
+    which can be memory-mapped at load time. The "module." prefix of the
+    models trained with ``DataParallel`` is removed and the tensors are made
+    contiguous.
+
+    Args:
+        weights_path (Path): Path to the .pth weights file.
+        output_path (Path): Output .pth file path.
+    """
+    import torch
+
+    state_dict = torch.load(weights_path,
+                            map_location=lambda storage, loc: storage)
+    if "state_dict" in state_dict:
+        state_dict = state_dict["state_dict"]
+    state_dict = {
+        key[len("module."):] if key.startswith("module.") else key:
+        value.contiguous()
+        for key, value in state_dict.items()
+    }
+    torch.save(state_dict, str(output_path),
+               _use_new_zipfile_serialization=True)
+
+
+def serialize_onnx(model_path: Path, output_path: Path):
+    """Save the graph of an ONNX model optimized by ONNX Runtime, so the
+    optimizations are not run again at load time. With a ".ort" suffix the
+    model is saved in the ORT format.
+
+    Args:
+        model_path (Path): Path to the .onnx file.
+        output_path (Path): Output .onnx or .ort file path.
+    """
+    create_backend("onnxruntime", model_path,
+                   optimized_model_path=output_path).load()
+
+
+def main(weights_path: Path, output_path: Path):
+    output_path = Path(output_path)
+    if output_path.resolve() == Path(weights_path).resolve():
+        raise ValueError("The output path should not be the weights path")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    suffix = Path(weights_path).suffix
+    if suffix == ".pth":
+        serialize_torch(weights_path, output_path)
+    elif suffix == ".onnx":
+        serialize_onnx(weights_path, output_path)
+    else:
+        raise ValueError(f"Can not serialize '{suffix}' files, the weights "
+                         "should be a .pth or .onnx file")
+    print(f"Saved {output_path}")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Serialize model weights in a "
+                                 "format that loads faster: PyTorch state "
+                                 "dicts that can be memory-mapped, or ONNX "
+                                 "graphs already optimized by ONNX Runtime.")
+    ap.add_argument(
+        "-w",
+        "--weights",
+        help="Path to the .pth or .onnx weights file",
+        type=Path,
+        required=True
+    )
+    ap.add_argument(
+        "-o",
+        "--output",
+        help="Output file path. For ONNX models, a .ort suffix saves the "
+             "model in the ORT format",
+        type=Path,
+        required=True
+    )
+    args = ap.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.weights, args.output)
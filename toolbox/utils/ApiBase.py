@@ -1,5 +1,7 @@
 import argparse
 import logging
+import sys
+import threading
 from pathlib import Path
 from typing import Any, List, Optional, Type, Union
 
@@ -14,6 +16,7 @@ from toolbox import DataModels, Structures
 from toolbox.Context import ContextCli, entity_parser
 from toolbox.DataModels import BaseModel, Notification
 from toolbox.utils.config_utils import parse_config
+from toolbox.utils.runtime import configure_runtime
 from toolbox.utils.utils import get_logger, get_version
 
 logger = get_logger("toolbox.Api")
@@ -39,6 +42,10 @@ class ApiBase:
 
     Methods to be implemented:
         - _predict_entity(data_model, post_to_broker) -> List[Type[BaseModel]]
+
+    Methods that can be overridden:
+        - _load_models(): Load the models. It is run in the background once
+            the server has started, and the API is ready when it ends.
     """
 
     VERSION = get_version()
@@ -58,6 +65,9 @@ class ApiBase:
         self.context_cli: ContextCli
         self.config: dict
         self.base_dm = base_dm
+        self._ready = threading.Event()
+        self._uvicorn: Optional[uvicorn.Server] = None
+        self._start_failed = False
 
     def _parse_args(self) -> argparse.Namespace:
         """Parse the command-line arguments.
@@ -98,13 +108,56 @@ class ApiBase:
             args (argparse.Namespace): The parsed command-line arguments.
         """
         self.config = parse_config(args.config)
+        configure_runtime(self.config.get("runtime"))
         self.port = self.config["api"]["port"]
         self.host = self.config["api"]["host"]
         self.allowed_origins = self.config["api"]["allowed_origins"]
         self.local_image_storage = self.config["api"]["local_image_storage"]
         self.context_cli = ContextCli(**self.config["context_broker"])
         logging.getLogger("toolbox").setLevel(args.log_level)
-        self._set_subscriptions()
+
+    def _load_models(self):
+        """Load the models of the API. It is called in a background thread
+        once the server has started, before the subscriptions are created.
+        The models should be warmed up here, so the API is only ready when
+        they can answer at full speed.
+        """
+        pass
+
+    def _start_loading(self):
+        """Start loading the models in a background thread. It is run on
+        the startup of the server, so a loading error can always stop it.
+        """
+        threading.Thread(target=self._start, daemon=True).start()
+
+    def _start(self):
+        """Load the models, create the subscriptions and set the API as
+        ready. If the models can not be loaded the server is stopped.
+        """
+        try:
+            self._load_models()
+            self._set_subscriptions()
+        except Exception:
+            logger.critical("Unable to start the API", exc_info=True)
+            self._start_failed = True
+            if self._uvicorn is not None:
+                # Shut down gracefully, ``run`` then calls ``_end``
+                self._uvicorn.should_exit = True
+            return
+        self._ready.set()
+        logger.info("The API is ready")
+
+    def _check_ready(self):
+        """Check that the API is ready to process requests.
+
+        Raises:
+            HTTPException: If the models are still being loaded.
+        """
+        if not self._ready.is_set():
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "The API is starting, the models are not loaded yet"
+            )
 
     def _end(self):
         """Method called at the end of the execution
@@ -123,11 +176,7 @@ class ApiBase:
         if subscription_id not in self.context_cli.subscription_ids:
             logger.warning(f"Received a notification from a foreign "
                            f"subscription: {subscription_id}")
-        for dm in data_models:
-            try:
-                self._predict_entity(dm, post_to_broker=True)
-            except HTTPException as e:
-                logger.error(str(e))
+        self._predict_entities(data_models, post_to_broker=True)
 
     def _get_image_from_dm(self, image_dm: DataModels.Image) -> Structures.Image:
         """Get an Image structure from an Image data model.
@@ -207,6 +256,31 @@ class ApiBase:
             }
         return app
 
+    def _set_route_get_ready(self, app: FastAPI) -> FastAPI:
+        """Set the get-ready route, which answers 200 once the models are
+        loaded and warmed up and 503 before.
+
+        Args:
+            app (FastAPI)
+
+        Returns:
+            FastAPI
+        """
+        @app.get(
+            "/ready",
+            responses={
+                503: {"description": "The models are not loaded yet"}
+            }
+        )
+        def get_ready():
+            """Readiness of the API.
+            """
+            if not self._ready.is_set():
+                return JSONResponse({"ready": False},
+                                    status.HTTP_503_SERVICE_UNAVAILABLE)
+            return {"ready": True}
+        return app
+
     def _set_route_post_notification(self, app: FastAPI) -> FastAPI:
         """Set the post-notification route. 
 
@@ -225,6 +299,7 @@ class ApiBase:
         ):
             """Notify the activation of a subscription.
             """
+            self._check_ready()
             data_models = [
                 entity_parser.json_to_data_model(entity)
                 for entity in notification.data
@@ -250,6 +325,29 @@ class ApiBase:
         """
         raise NotImplementedError
 
+    def _predict_entities(self, data_models: List[Type[BaseModel]],
+                          post_to_broker: bool) -> List[Type[BaseModel]]:
+        """Predict the data models received together, e.g. in the same
+        notification. By default it calls ``_predict_entity`` for each data
+        model, override it to predict them as a batch. Errors are logged and
+        do not stop the processing of the remaining data models.
+
+        Args:
+            data_models (List[Type[BaseModel]]): The data models to predict.
+            post_to_broker (bool): Post the predicted data models to the
+                context broker.
+
+        Returns:
+            List[Type[BaseModel]]: The predicted data models.
+        """
+        predicted = []
+        for dm in data_models:
+            try:
+                predicted += self._predict_entity(dm, post_to_broker)
+            except HTTPException as e:
+                logger.error(str(e))
+        return predicted
+
     def _get_default_ok_response(self) -> dict:
         return {
             "content": {
@@ -305,6 +403,7 @@ class ApiBase:
             post_to_broker: bool = Body(True, description="Post the predicted "
                                         "entity to the context broker"),
         ) -> Union[List[self.base_dm], Any]:
+            self._check_ready()
             accept = request.headers.get("accept", "application/json")
             try:
                 data_model = self.context_cli.get_entity(entity_id)
@@ -337,6 +436,7 @@ class ApiBase:
             FastAPI.
         """
         app = self._set_route_get_root(app)
+        app = self._set_route_get_ready(app)
         app = self._set_route_post_notification(app)
         app = self._set_route_post_predict(app)
         return app
@@ -355,14 +455,23 @@ class ApiBase:
             app.add_middleware(
                 Middleware(CORSMiddleware, allow_origins=self.allowed_origins)
             )
+        app.add_event_handler("startup", self._start_loading)
         app = self._set_routes(app)
         return app
 
     def run(self):
-        """Parse the command-line arguments and run the API server.
+        """Parse the command-line arguments and run the API server. The
+        models are loaded in the background, see ``_load_models``. The
+        process exits with an error if they can not be loaded.
         """
         args = self._parse_args()
         self._initialize(args)
         self.api = self._server()
-        uvicorn.run(self.api, host=self.host, port=self.port)
-        self._end()
+        self._uvicorn = uvicorn.Server(
+            uvicorn.Config(self.api, host=self.host, port=self.port))
+        try:
+            self._uvicorn.run()
+        finally:
+            self._end()
+        if self._start_failed:
+            sys.exit(1)
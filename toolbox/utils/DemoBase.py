@@ -2,7 +2,7 @@ import argparse
 import json
 import os
 from pathlib import Path
-from typing import List, Optional, Type, Union
+from typing import Iterator, List, Optional, Tuple, Type, Union
 
 import cv2
 import numpy as np
@@ -11,6 +11,7 @@ from toolbox.Context import ContextCli, entity_parser
 from toolbox.DataModels import BaseModel
 from toolbox.Structures import Image
 from toolbox.utils.config_utils import parse_config
+from toolbox.utils.runtime import configure_runtime
 from toolbox.utils.simple_http_server import create_http_server
 from toolbox.utils.utils import is_url
 from toolbox.Visualization import DataModelVisualizer
@@ -74,6 +75,14 @@ class DemoBase:
             type=Path,
             default=None
         )
+        local_ap.add_argument(
+            "-b",
+            "--batch-size",
+            help="Number of images of a folder processed at once "
+            "(default 1)",
+            type=int,
+            default=1
+        )
         return local_ap
 
     def _get_parser_producer(self, sub_parser: argparse.ArgumentParser
@@ -97,6 +106,14 @@ class DemoBase:
             help="Path or URL to an image or folder with images",
             required=True
         )
+        prod_ap.add_argument(
+            "-b",
+            "--batch-size",
+            help="Number of images of a folder processed at once "
+            "(default 1)",
+            type=int,
+            default=1
+        )
         return prod_ap
 
     def _get_parser_consumer(self, sub_parser: argparse.ArgumentParser
@@ -191,6 +208,7 @@ class DemoBase:
         """
         args = self._get_args()
         config = parse_config(args.config)
+        configure_runtime(config.get("runtime"))
         self._load_model(config, args.task)
 
         self.visualizer = DataModelVisualizer(config.get("visualization", {}))
@@ -199,9 +217,9 @@ class DemoBase:
             self.context_cli = ContextCli(**config["context_broker"])
 
         if args.task == "local":
-            self._run_local(args.image, args.output)
+            self._run_local(args.image, args.output, args.batch_size)
         elif args.task == "producer":
-            self._run_producer(args.image)
+            self._run_producer(args.image, args.batch_size)
         elif args.task == "consumer":
             self._run_consumer(
                 args.id, config, args.subscribe, args.post_to_broker)
@@ -234,13 +252,57 @@ class DemoBase:
         """
         raise NotImplementedError
 
-    def _run_local(self, image_path: str, output: Optional[Path] = None):
+    def _process_images(self, images: List[Image]
+                        ) -> List[List[Type[BaseModel]]]:
+        """Run the project on multiple images. By default it calls
+        ``_process_image`` for each image, override it to predict the images
+        as a batch.
+
+        Args:
+            images (List[Image]): A list of image objects.
+
+        Returns:
+            List[List[Type[BaseModel]]]: A list of data model objects for
+                each image.
+        """
+        return [self._process_image(image) for image in images]
+
+    def _iterate_batches(self, image_paths: List[Union[str, Path]],
+                         batch_size: int
+                         ) -> Iterator[Tuple[Union[str, Path], Image,
+                                             List[Type[BaseModel]]]]:
+        """Process the images in batches.
+
+        Args:
+            image_paths (List[Union[str, Path]]): List of paths or URLs to
+                images.
+            batch_size (int): Number of images processed at once.
+
+        Yields:
+            Iterator[Tuple[Union[str, Path], Image, List[Type[BaseModel]]]]:
+                The path, the Image object and the predicted data models of
+                each image.
+        """
+        batch_size = max(batch_size, 1)
+        for i in range(0, len(image_paths), batch_size):
+            paths = image_paths[i:i + batch_size]
+            images = [Image(path) for path in paths]
+            if len(images) == 1:
+                batch_dms = [self._process_image(images[0])]
+            else:
+                batch_dms = self._process_images(images)
+            yield from zip(paths, images, batch_dms)
+
+    def _run_local(self, image_path: str, output: Optional[Path] = None,
+                   batch_size: int = 1):
         """Run the project locally on images.
 
         Args:
             image_path (str): Path or URL to an image or folder with images.
             output (Optional[Path], optional): Output image or folder path.
                 Defaults to None.
+            batch_size (int, optional): Number of images processed at once.
+                Defaults to 1.
         """
         if image_path == output:
             raise FileExistsError("Output path can not be the same as "
@@ -252,9 +314,8 @@ class DemoBase:
             image_paths = [image_path]
             is_dir = False
 
-        for path in image_paths:
-            image = Image(path)
-            data_models = self._process_image(image)
+        for path, image, data_models in self._iterate_batches(
+                image_paths, batch_size):
             self._print_data_models(data_models)
             if output is not None:
                 out_image = self.visualizer.visualize_data_models(
@@ -266,19 +327,21 @@ class DemoBase:
                     output.parent.mkdir(parents=True, exist_ok=True)
                     cv2.imwrite(str(output), out_image)
 
-    def _run_producer(self, image_path: str):
+    def _run_producer(self, image_path: str, batch_size: int = 1):
         """Run the project on images, upload the results to a context broker
         and print the generated entities.
 
         Args:
             image_path (Path): Path or URL to an image or folder with images.
+            batch_size (int, optional): Number of images processed at once.
+                Defaults to 1.
         """
         if not is_url(image_path) and os.path.isdir(image_path):
             image_paths = list(Path(image_path).iterdir())
         else:
             image_paths = [image_path]
-        for path in image_paths:
-            for dm in self._process_image(Image(path)):
+        for _, _, data_models in self._iterate_batches(image_paths, batch_size):
+            for dm in data_models:
                 entity = self.context_cli.post_data_model(dm)
                 print(json.dumps(entity, indent=4))
 
@@ -0,0 +1,248 @@
+from typing import Literal, Optional, Tuple
+
+import numpy as np
+
+# Number of boxes resolved at once by the block NMS
+_BLOCK_SIZE = 64
+
+
+def box_iou(boxes1: np.ndarray, boxes2: np.ndarray, offset: float = 0.
+            ) -> np.ndarray:
+    """Compute the intersection over union of every pair of boxes.
+
+    Args:
+        boxes1 (np.ndarray): Boxes in corner form (x1, y1, x2, y2) of
+            shape (N, 4).
+        boxes2 (np.ndarray): Boxes in corner form (x1, y1, x2, y2) of
+            shape (M, 4).
+        offset (float, optional): Value added to the width and height of the
+            boxes, e.g. 1 to use inclusive pixel coordinates. Defaults to 0.
+
+    Returns:
+        np.ndarray: The IoU matrix of shape (N, M).
+    """
+    x11, y11, x12, y12 = (boxes1[:, i:i + 1] for i in range(4))
+    x21, y21, x22, y22 = (boxes2[:, i] for i in range(4))
+    area1 = (x12 - x11 + offset) * (y12 - y11 + offset)
+    area2 = (x22 - x21 + offset) * (y22 - y21 + offset)
+    w = np.minimum(x12, x22) - np.maximum(x11, x21) + offset
+    h = np.minimum(y12, y22) - np.maximum(y11, y21) + offset
+    inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+    union = area1 + area2 - inter
+    return inter / np.maximum(union, np.finfo(np.float32).eps)
+
+
+def _sort_candidates(scores: np.ndarray, max_candidates: Optional[int]
+                     ) -> np.ndarray:
+    """Return the indices of the boxes sorted by descending score, keeping
+    only the ``max_candidates`` best ones.
+    """
+    if max_candidates is not None and 0 < max_candidates < len(scores):
+        order = np.argpartition(-scores, max_candidates - 1)[:max_candidates]
+        return order[np.argsort(-scores[order], kind="stable")]
+    return np.argsort(-scores, kind="stable")
+
+
+def _nms_numpy(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float,
+               offset: float, max_candidates: Optional[int]) -> np.ndarray:
+    """Block-wise hard NMS. The boxes are processed by descending score in
+    blocks of ``_BLOCK_SIZE``. The kept boxes of a block are resolved with
+    the upper-triangular suppression matrix of the block (as in Cluster-NMS,
+    "Enhancing Geometric Factors in Model Learning and Inference for Object
+    Detection and Instance Segmentation", Zheng et al.), which gives the same
+    result as the sequential NMS. Then the boxes suppressed by them are
+    removed before processing the next block.
+    """
+    order = _sort_candidates(scores, max_candidates)
+    boxes = boxes[order]
+    remaining = np.arange(len(boxes))
+    keep = []
+    while len(remaining) > 0:
+        block = remaining[:_BLOCK_SIZE]
+        n = len(block)
+        suppress = box_iou(boxes[block], boxes[remaining], offset) \
+            > iou_threshold
+        # A box can only be suppressed by boxes with a higher score
+        block_suppress = np.triu(suppress[:, :n], k=1)
+        block_keep = np.ones(n, dtype=bool)
+        while True:
+            new_keep = ~np.any(block_suppress[block_keep], axis=0)
+            if np.array_equal(new_keep, block_keep):
+                break
+            block_keep = new_keep
+        keep.append(block[block_keep])
+        suppressed = np.any(suppress[block_keep, n:], axis=0)
+        remaining = remaining[n:][~suppressed]
+    if not keep:
+        return order[:0]
+    return order[np.concatenate(keep)]
+
+
+def nms(boxes, scores, iou_threshold: float, top_k: Optional[int] = None,
+        max_candidates: Optional[int] = None, offset: float = 0.,
+        backend: Literal["numpy", "torchvision"] = "numpy"):
+    """Hard non-maximum suppression. Remove the boxes that overlap with a
+    higher scoring box by more than ``iou_threshold``.
+
+    Args:
+        boxes (np.ndarray | torch.Tensor): Boxes in corner form
+            (x1, y1, x2, y2) of shape (N, 4).
+        scores (np.ndarray | torch.Tensor): Scores of the boxes of shape (N).
+        iou_threshold (float): Boxes with an IoU greater than this value
+            are suppressed.
+        top_k (Optional[int], optional): Maximum number of kept boxes. None
+            to keep all of them. Defaults to None.
+        max_candidates (Optional[int], optional): Only consider the
+            ``max_candidates`` boxes with the highest scores. None to
+            consider all of them. Defaults to None.
+        offset (float, optional): Value added to the width and height of the
+            boxes, e.g. 1 to use inclusive pixel coordinates. Defaults to 0.
+        backend (Literal["numpy", "torchvision"], optional): Run the NMS
+            with numpy or with ``torchvision.ops.nms``. Defaults to "numpy".
+
+    Raises:
+        ValueError: If ``backend`` is not "numpy" or "torchvision".
+
+    Returns:
+        np.ndarray | torch.Tensor: Indices of the kept boxes sorted by
+            descending score, of the same type as ``boxes``.
+    """
+    is_numpy = isinstance(boxes, np.ndarray)
+    if backend == "numpy":
+        if is_numpy:
+            keep = _nms_numpy(np.asarray(boxes), np.asarray(scores),
+                              iou_threshold, offset, max_candidates)
+        else:
+            import torch
+            keep = _nms_numpy(boxes.detach().cpu().numpy(),
+                              scores.detach().cpu().numpy(),
+                              iou_threshold, offset, max_candidates)
+            keep = torch.from_numpy(keep).to(boxes.device)
+    elif backend == "torchvision":
+        import torch
+        from torchvision.ops import nms as tv_nms
+        t_boxes = torch.from_numpy(boxes) if is_numpy else boxes
+        t_scores = torch.from_numpy(scores) if is_numpy else scores
+        order = None
+        if max_candidates is not None and 0 < max_candidates < len(t_scores):
+            order = torch.topk(t_scores, max_candidates).indices
+            t_boxes = t_boxes[order]
+            t_scores = t_scores[order]
+        if offset:
+            t_boxes = t_boxes.clone()
+            t_boxes[:, 2:] += offset
+        keep = tv_nms(t_boxes.float(), t_scores.float(), iou_threshold)
+        if order is not None:
+            keep = order[keep]
+        if is_numpy:
+            keep = keep.numpy()
+    else:
+        raise ValueError("``backend`` should be one of 'numpy' or "
+                         "'torchvision'")
+    if top_k is not None and top_k > 0:
+        keep = keep[:top_k]
+    return keep
+
+
+def batched_nms(boxes, scores, labels, iou_threshold: float,
+                top_k: Optional[int] = None,
+                max_candidates: Optional[int] = None, offset: float = 0.,
+                backend: Literal["numpy", "torchvision"] = "numpy"):
+    """Class-aware hard non-maximum suppression. Boxes of different classes
+    do not suppress each other.
+
+    The boxes of each class are shifted to a disjoint region so that all the
+    classes are processed in a single ``nms`` call.
+
+    Args:
+        boxes (np.ndarray | torch.Tensor): Boxes in corner form
+            (x1, y1, x2, y2) of shape (N, 4).
+        scores (np.ndarray | torch.Tensor): Scores of the boxes of shape (N).
+        labels (np.ndarray | torch.Tensor): Integer class of the boxes of
+            shape (N).
+        iou_threshold (float): Boxes with an IoU greater than this value
+            are suppressed.
+        top_k (Optional[int], optional): Maximum number of kept boxes. None
+            to keep all of them. Defaults to None.
+        max_candidates (Optional[int], optional): Only consider the
+            ``max_candidates`` boxes with the highest scores. None to
+            consider all of them. Defaults to None.
+        offset (float, optional): Value added to the width and height of the
+            boxes. Defaults to 0.
+        backend (Literal["numpy", "torchvision"], optional): Run the NMS
+            with numpy or with ``torchvision.ops.nms``. Defaults to "numpy".
+
+    Returns:
+        np.ndarray | torch.Tensor: Indices of the kept boxes sorted by
+            descending score, of the same type as ``boxes``.
+    """
+    if len(boxes) == 0:
+        return nms(boxes, scores, iou_threshold, top_k, max_candidates,
+                   offset, backend)
+    max_coordinate = boxes.max() - boxes.min() + offset + 1
+    shift = labels * max_coordinate
+    if isinstance(boxes, np.ndarray):
+        shift = shift.astype(boxes.dtype)
+    else:
+        shift = shift.to(boxes)
+    shifted = boxes + shift[:, None]
+    return nms(shifted, scores, iou_threshold, top_k, max_candidates,
+               offset, backend)
+
+
+def soft_nms(boxes: np.ndarray, scores: np.ndarray, sigma: float = 0.5,
+             score_threshold: float = 0.001,
+             method: Literal["gaussian", "linear"] = "gaussian",
+             iou_threshold: float = 0.3, offset: float = 0.
+             ) -> Tuple[np.ndarray, np.ndarray]:
+    """Soft non-maximum suppression. Instead of removing the overlapping
+    boxes, their scores are decayed depending on their IoU with the higher
+    scoring boxes ("Soft-NMS -- Improving Object Detection With One Line of
+    Code", Bodla et al.).
+
+    Args:
+        boxes (np.ndarray): Boxes in corner form (x1, y1, x2, y2) of
+            shape (N, 4).
+        scores (np.ndarray): Scores of the boxes of shape (N).
+        sigma (float, optional): Sigma of the gaussian decay.
+            Defaults to 0.5.
+        score_threshold (float, optional): Boxes whose decayed score falls
+            below this value are removed. Defaults to 0.001.
+        method (Literal["gaussian", "linear"], optional): Decay function.
+            "gaussian" multiplies the scores by exp(-iou^2 / sigma) and
+            "linear" by (1 - iou) if the IoU is greater than
+            ``iou_threshold``. Defaults to "gaussian".
+        iou_threshold (float, optional): IoU threshold of the linear
+            method. Defaults to 0.3.
+        offset (float, optional): Value added to the width and height of the
+            boxes. Defaults to 0.
+
+    Raises:
+        ValueError: If ``method`` is not "gaussian" or "linear".
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Indices of the kept boxes sorted by
+            descending decayed score and their decayed scores.
+    """
+    if method not in ("gaussian", "linear"):
+        raise ValueError("``method`` should be one of 'gaussian' or 'linear'")
+    scores = np.array(scores, dtype=np.float32)
+    remaining = np.flatnonzero(scores > score_threshold)
+    keep, keep_scores = [], []
+    while len(remaining) > 0:
+        best = np.argmax(scores[remaining])
+        i = remaining[best]
+        keep.append(i)
+        keep_scores.append(scores[i])
+        remaining = np.delete(remaining, best)
+        if len(remaining) == 0:
+            break
+        iou = box_iou(boxes[i:i + 1], boxes[remaining], offset)[0]
+        if method == "gaussian":
+            decay = np.exp(-(iou * iou) / sigma)
+        else:
+            decay = np.where(iou > iou_threshold, 1 - iou, 1)
+        scores[remaining] *= decay
+        remaining = remaining[scores[remaining] > score_threshold]
+    return np.asarray(keep, dtype=np.int64), \
+        np.asarray(keep_scores, dtype=np.float32)
@@ -0,0 +1,326 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+
+from toolbox.DataModels import BaseModel
+from toolbox.Structures import Image
+from toolbox.utils.utils import get_logger, get_version
+
+logger = get_logger("toolbox.PredictionCache")
+
+
+class PredictionCache:
+    """Cache of the data models predicted from images, keyed by the content
+    of the image, the model name and the model config.
+
+    The same image is often predicted several times, e.g. when the Context
+    Broker notifies an Image entity that is upserted again or a camera
+    uploads identical frames. Identical images are only predicted once: the
+    next ones return a copy of the cached data models, with a new
+    ``dateObserved``, no ``id`` and the ``image`` attribute set to the id of
+    the new image.
+
+    The entries are kept in memory up to ``max_entries`` and, optionally,
+    on disk, so they can be shared by several processes and survive a
+    restart. The least recently used entries are removed first. The
+    entries are pickled, so the on-disk folder must only be writable by
+    trusted processes: loading a crafted entry can run arbitrary code.
+
+    Example:
+
+    .. code-block:: python
+
+        cache = PredictionCache("face_detector_retinaface", params)
+        data_models = cache.predict(image, project.predict)
+    """
+
+    def __init__(self, model_name: str, model_config: dict,
+                 max_entries: int = 256,
+                 disk_path: Optional[Union[str, Path]] = None,
+                 max_disk_mb: Optional[float] = None):
+        """Create the cache.
+
+        Args:
+            model_name (str): Name of the model, part of the key.
+            model_config (dict): Config of the model, part of the key.
+            max_entries (int, optional): Maximum number of entries kept in
+                memory. Defaults to 256.
+            disk_path (Optional[Union[str, Path]], optional): Folder of the
+                on-disk cache, which must be a trusted folder. None to only
+                use the memory. Defaults to None.
+            max_disk_mb (Optional[float], optional): Maximum size in MB of the
+                on-disk cache. None for no limit. Defaults to None.
+
+        Raises:
+            ValueError: If ``max_entries`` is lower than 1.
+        """
+        if max_entries < 1:
+            raise ValueError("``max_entries`` must be greater than 0")
+        config_json = json.dumps(model_config, sort_keys=True, default=str)
+        # The data models of other toolbox versions may not be unpickled
+        self._prefix = \
+            f"{get_version()}\0{model_name}\0{config_json}".encode()
+        self.max_entries = max_entries
+        self.disk_path = Path(disk_path) if disk_path is not None else None
+        self.max_disk_mb = max_disk_mb
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if self.disk_path is not None:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+
+    def get_key(self, image: Image) -> str:
+        """Get the cache key of an image.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+
+        Returns:
+            str: The hex digest of the image pixels, shape and type, the
+                toolbox version, the model name and the model config.
+        """
+        pixels = image.image
+        h = hashlib.blake2b(self._prefix, digest_size=20)
+        h.update(f"{pixels.shape}{pixels.dtype}".encode())
+        h.update(np.ascontiguousarray(pixels))
+        return h.hexdigest()
+
+    def _disk_file(self, key: str) -> Path:
+        return self.disk_path / key[:2] / f"{key}.pkl"
+
+    def _read(self, key: str) -> Optional[bytes]:
+        """Get the serialized data models of a key from memory or disk.
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        if self.disk_path is None:
+            return None
+        path = self._disk_file(key)
+        try:
+            data = path.read_bytes()
+            # Keep the modification time as the last access for the eviction
+            os.utime(path)
+        except OSError:
+            return None
+        self._store_memory(key, data)
+        return data
+
+    def _remove(self, key: str):
+        """Remove an entry from memory and disk.
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.disk_path is not None:
+            try:
+                self._disk_file(key).unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def _store_memory(self, key: str, data: bytes):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _store_disk(self, key: str, data: bytes):
+        path = self._disk_file(key)
+        path.parent.mkdir(exist_ok=True)
+        # Write to a temporary file first, so that other processes never
+        # read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.max_disk_mb is not None:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Remove the least recently used files of the on-disk cache until
+        it fits in ``max_disk_mb``.
+        """
+        files = []
+        for path in self.disk_path.glob("*/*.pkl"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        size = sum(f[1] for f in files)
+        max_size = self.max_disk_mb * 1024 ** 2
+        for _, file_size, path in sorted(files):
+            if size <= max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            size -= file_size
+
+    def get(self, image: Image) -> Optional[List[BaseModel]]:
+        """Get the cached data models of an image.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+
+        Returns:
+            Optional[List[BaseModel]]: A copy of the data models, referencing
+                the given image, or None if the image is not cached.
+        """
+        return self._get(self.get_key(image), image)
+
+    def _get(self, key: str, image: Image) -> Optional[List[BaseModel]]:
+        data = self._read(key)
+        if data is None:
+            return None
+        now = datetime.now()
+        try:
+            data_models = pickle.loads(data)
+            for dm in data_models:
+                dm.id = None
+                dm.dateObserved = now
+                if "image" in dm.__fields__:
+                    dm.image = image.id
+        except Exception as e:
+            # Truncated or foreign entries are predicted again
+            logger.warning(f"Unable to load the prediction cache entry "
+                           f"{key}: {e}")
+            self._remove(key)
+            return None
+        return data_models
+
+    def put(self, image: Image, data_models: List[BaseModel]):
+        """Cache the data models predicted from an image.
+
+        Args:
+            image (toolbox.Structures.Image): The predicted Image object.
+            data_models (List[BaseModel]): The predicted data models.
+        """
+        self._put(self.get_key(image), data_models)
+
+    def _put(self, key: str, data_models: List[BaseModel]):
+        data = pickle.dumps(data_models, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store_memory(key, data)
+        if self.disk_path is not None:
+            try:
+                self._store_disk(key, data)
+            except OSError as e:
+                logger.warning(f"Unable to write the prediction cache: {e}")
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def predict(self, image: Image,
+                predict_fn: Callable[[Image], List[BaseModel]]
+                ) -> List[BaseModel]:
+        """Get the data models of an image from the cache or predict and
+        cache them.
+
+        Args:
+            image (toolbox.Structures.Image): An Image object.
+            predict_fn (Callable[[Image], List[BaseModel]]): Function that
+                predicts the data models of an image.
+
+        Returns:
+            List[BaseModel]: The data models of the image.
+        """
+        key = self.get_key(image)
+        data_models = self._get(key, image)
+        self._count(data_models is not None)
+        if data_models is not None:
+            return data_models
+        data_models = predict_fn(image)
+        self._put(key, data_models)
+        return data_models
+
+    def predict_batch(self, images: List[Image],
+                      predict_batch_fn: Callable[[List[Image]],
+                                                 List[List[BaseModel]]]
+                      ) -> List[List[BaseModel]]:
+        """Get the data models of multiple images from the cache and predict
+        the images that are not cached in a single batch.
+
+        Args:
+            images (List[toolbox.Structures.Image]): A list of Image objects.
+            predict_batch_fn (Callable[[List[Image]], List[List[BaseModel]]]):
+                Function that predicts the data models of multiple images.
+
+        Returns:
+            List[List[BaseModel]]: The data models of each image.
+        """
+        keys = [self.get_key(image) for image in images]
+        results = [self._get(k, image) for k, image in zip(keys, images)]
+        missing = [i for i, r in enumerate(results) if r is None]
+        for r in results:
+            self._count(r is not None)
+        if missing:
+            predicted = predict_batch_fn([images[i] for i in missing])
+            for i, data_models in zip(missing, predicted):
+                self._put(keys[i], data_models)
+                results[i] = data_models
+        return results
+
+    @property
+    def num_entries(self) -> int:
+        """Number of entries kept in memory.
+        """
+        return len(self._memory)
+
+    def clear(self):
+        """Remove all the entries, also from disk.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.disk_path is not None:
+            for path in self.disk_path.glob("*/*.pkl"):
+                path.unlink(missing_ok=True)
+
+
+def create_prediction_cache(config: dict, model_name: str, model_config: dict
+                            ) -> Optional[PredictionCache]:
+    """Create the prediction cache of a project from the optional
+    ``prediction_cache`` section of its config, e.g.:
+
+    .. code-block:: yaml
+
+        prediction_cache:
+          max_entries: 256
+          # Optional on-disk cache
+          disk_path: /tmp/prediction_cache
+          max_disk_mb: 1024
+
+    Args:
+        config (dict): The project config.
+        model_name (str): Name of the model, part of the key.
+        model_config (dict): Config of the model, part of the key.
+
+    Returns:
+        Optional[PredictionCache]: The cache or None if the config has no
+            ``prediction_cache`` section.
+    """
+    cache_config = config.get("prediction_cache")
+    if cache_config is None:
+        return None
+    logger.info(f"Using a prediction cache: {cache_config}")
+    return PredictionCache(model_name, model_config, **cache_config)
@@ -0,0 +1,174 @@
+import os
+from typing import List, Optional, Tuple
+
+from toolbox.utils.utils import get_logger
+
+logger = get_logger("toolbox.runtime")
+
+# Backends with their own intra-op and inter-op threads settings
+_BACKENDS = ("onnxruntime", "torch", "tensorflow")
+_THREADS_KEYS = ("intra_op_threads", "inter_op_threads")
+_KEYS = _THREADS_KEYS + ("opencv_threads", "cpu_affinity") + _BACKENDS
+
+# The configured settings, shared by all the models of the process
+_config: dict = {}
+# Backends whose global settings have already been applied
+_applied = set()
+
+
+def configure_runtime(config: Optional[dict] = None):
+    """Set the CPU threading settings of the process from the ``runtime``
+    section of a config, e.g.:
+
+    .. code-block:: yaml
+
+        runtime:
+          # Default threads of all the backends, null to use their default
+          intra_op_threads: 4
+          inter_op_threads: 1
+          # Threads of OpenCV (resizes, cv2.dnn...)
+          opencv_threads: 1
+          # Optional list of CPU ids where the process can run (Linux only)
+          cpu_affinity: [0, 1, 2, 3]
+          # Optional settings of a specific backend
+          onnxruntime:
+            intra_op_threads: 2
+
+    The OpenCV threads and the CPU affinity are applied immediately, so it
+    should be called before the models are created. The settings of the
+    other backends are read by the models when they are loaded. Explicit
+    threads parameters of a model take precedence over this config.
+
+    Args:
+        config (Optional[dict], optional): The ``runtime`` config section.
+            None to reset the settings to the backends defaults.
+            Defaults to None.
+
+    Raises:
+        ValueError: If the config has an unknown key.
+    """
+    config = dict(config or {})
+    for key, value in config.items():
+        if key not in _KEYS:
+            raise ValueError(f"Unknown runtime setting '{key}', it should be "
+                             f"one of {list(_KEYS)}")
+        if key in _BACKENDS:
+            for k in value or {}:
+                if k not in _THREADS_KEYS:
+                    raise ValueError(f"Unknown {key} runtime setting '{k}', "
+                                     f"it should be one of "
+                                     f"{list(_THREADS_KEYS)}")
+    _config.clear()
+    _config.update(config)
+    _applied.clear()
+
+    if config.get("opencv_threads") is not None:
+        import cv2
+        cv2.setNumThreads(config["opencv_threads"])
+    if config.get("cpu_affinity") is not None:
+        _set_cpu_affinity(config["cpu_affinity"])
+    logger.debug(f"Runtime settings: {_config}")
+
+
+def get_runtime_config() -> dict:
+    """Get the current runtime settings, e.g. to configure other processes.
+
+    Returns:
+        dict: A copy of the ``runtime`` config section.
+    """
+    return dict(_config)
+
+
+def _set_cpu_affinity(cpus: List[int]):
+    """Restrict the process to a set of CPUs. Only the threads created
+    afterwards and the calling thread are affected.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        logger.warning("CPU affinity is not supported on this platform")
+        return
+    os.sched_setaffinity(0, cpus)
+
+
+def get_num_threads(backend: str) -> Tuple[Optional[int], Optional[int]]:
+    """Get the configured intra-op and inter-op threads of a backend.
+
+    Args:
+        backend (str): One of "onnxruntime", "torch" or "tensorflow".
+
+    Returns:
+        Tuple[Optional[int], Optional[int]]: The number of intra-op and
+            inter-op threads, None to use the backend default.
+    """
+    backend_config = _config.get(backend) or {}
+    return tuple(
+        backend_config.get(k, _config.get(k)) for k in _THREADS_KEYS
+    )
+
+
+def ort_session_options(intra_op_threads: Optional[int] = None,
+                        inter_op_threads: Optional[int] = None):
+    """Create ONNX Runtime session options with the configured threads.
+
+    Args:
+        intra_op_threads (Optional[int], optional): Number of intra-op
+            threads, None to use the runtime config. Defaults to None.
+        inter_op_threads (Optional[int], optional): Number of inter-op
+            threads, None to use the runtime config. Defaults to None.
+
+    Returns:
+        onnxruntime.SessionOptions: The session options.
+    """
+    import onnxruntime as ort
+
+    intra, inter = get_num_threads("onnxruntime")
+    intra = intra_op_threads if intra_op_threads is not None else intra
+    inter = inter_op_threads if inter_op_threads is not None else inter
+    options = ort.SessionOptions()
+    if intra is not None:
+        options.intra_op_num_threads = intra
+    if inter is not None:
+        options.inter_op_num_threads = inter
+    return options
+
+
+def configure_torch():
+    """Set the configured threads of PyTorch. They are global to the
+    process, so they are only set once.
+    """
+    if "torch" in _applied:
+        return
+    _applied.add("torch")
+    intra, inter = get_num_threads("torch")
+    if intra is None and inter is None:
+        return
+
+    import torch
+
+    if intra is not None:
+        torch.set_num_threads(intra)
+    if inter is not None:
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError:
+            # It can only be set before any inter-op parallel work
+            logger.warning("Unable to set the inter-op threads of torch, "
+                           "they are already in use")
+
+
+def tf_session_config(**kwargs):
+    """Create a TensorFlow v1 session config with the configured threads.
+
+    Args:
+        **kwargs: Other arguments of the ``ConfigProto``.
+
+    Returns:
+        tf.compat.v1.ConfigProto: The session config.
+    """
+    import tensorflow as tf
+
+    intra, inter = get_num_threads("tensorflow")
+    if intra is not None:
+        kwargs.setdefault("intra_op_parallelism_threads", intra)
+    if inter is not None:
+        kwargs.setdefault("inter_op_parallelism_threads", inter)
+    return tf.compat.v1.ConfigProto(**kwargs)